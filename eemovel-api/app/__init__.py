@@ -1,21 +1,78 @@
 from flask import Flask
 from flask_restx import Api
+from flask_restx.representations import output_json
+from app.config import Config
 from app.extensions import db, bcrypt, jwt
 from app.namespaces.item_ns import item_ns
 from app.namespaces.auth_ns import auth_ns
+from app.services.optimize_jobs import optimization_jobs
+from app.services.partitioning import partition_pool
+from app.services.result_cache import optimize_cache
+from app.services.auth_service import login_service
+from app.services.tile_service import tile_cache
+from app.services.cluster_service import cluster_cache
+from app.services.listing_cache import listing_cache
+from app.services.read_model import read_model
+from app.utils.distance_providers import road_network
+from app.utils.metrics import metrics, timed, gauge
 
-def create_app():
+def _optimization_gauges():
+    cache = optimize_cache.stats()
+    jobs = optimization_jobs.stats()
+    distances = road_network.stats()
+    return [
+        *gauge('optimize_cache_hits', 'Acertos do cache do /items/optimize', cache['hits']),
+        *gauge('optimize_cache_misses', 'Falhas do cache do /items/optimize', cache['misses']),
+        *gauge('optimize_cache_entries', 'Resultados guardados no cache do /items/optimize', cache['entradas']),
+        *gauge('tiles_cache_hits', 'Tiles servidos do cache', tile_cache.hits),
+        *gauge('tiles_cache_misses', 'Tiles gerados no banco', tile_cache.misses),
+        *gauge('listing_cache_hits', 'Listagens de itens servidas do cache', listing_cache.hits),
+        *gauge('listing_cache_misses', 'Listagens de itens lidas do banco', listing_cache.misses),
+        *gauge('optimize_jobs_pending', 'Jobs de otimização na fila', jobs['pendentes']),
+        *gauge('optimize_jobs_running', 'Jobs de otimização em execução', jobs['executando']),
+        *gauge('road_matrix_cache_hits', 'Matrizes de distância viária servidas do disco', distances['hits']),
+        *gauge('road_matrix_cache_misses', 'Matrizes de distância viária com pares calculados', distances['misses'])
+    ]
+
+def _login_gauges():
+    stats = login_service.stats()
+    return [
+        *gauge('login_cache_hits', 'Logins atendidos pelo cache de verificações', stats['hits']),
+        *gauge('login_cache_misses', 'Logins que precisaram do bcrypt', stats['misses'])
+    ]
+
+def _read_model_gauges():
+    stats = read_model.stats()
+    return [
+        *gauge('read_model_items', 'Itens no modelo de leitura em memória', stats['itens']),
+        *gauge('read_model_bytes', 'Memória ocupada pelo modelo de leitura', stats['bytes']),
+        *gauge('read_model_hits', 'Leituras atendidas pelo modelo em memória', stats['hits']),
+        *gauge('read_model_fallbacks', 'Leituras que foram ao banco com o modelo ativo', stats['fallbacks'])
+    ]
+
+def create_app(config_object=Config):
     app = Flask(__name__)
     
-    # Configurações
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://admin:admin_password@db:5432/geodb'
-    app.config['JWT_SECRET_KEY'] = 'super-secret-key'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False # Boa prática adicionar
+    # Configurações (URI do banco, pool de conexões, JWT...) vêm de app/config.py e das variáveis de ambiente
+    app.config.from_object(config_object)
     
     # Inicializa extensões
     db.init_app(app)
     bcrypt.init_app(app)
     jwt.init_app(app)
+    optimization_jobs.init_app(app)
+    partition_pool.init_app(app)
+    optimize_cache.init_app(app)
+    tile_cache.init_app(app)
+    cluster_cache.init_app(app)
+    listing_cache.init_app(app)
+    read_model.init_app(app)
+    metrics.init_app(app)
+    login_service.init_app(app)
+    road_network.init_app(app)
+    metrics.register_collector(_optimization_gauges)
+    metrics.register_collector(_login_gauges)
+    metrics.register_collector(_read_model_gauges)
 
     # 1. CONFIGURAÇÃO DE SEGURANÇA PARA O SWAGGER
     # Isso define como o Swagger deve enviar o token (no Header, como Authorization)
@@ -39,6 +96,12 @@ def create_app():
         security='apikey'              # Aplica o cadeado globalmente na interface
     )
 
+    # Mede a serialização JSON das respostas como uma fase da requisição
+    @api.representation('application/json')
+    def timed_output_json(data, code, headers=None):
+        with timed('serializacao'):
+            return output_json(data, code, headers)
+
     # Registra os Namespaces
     api.add_namespace(item_ns, path='/items')
     api.add_namespace(auth_ns, path='/auth')
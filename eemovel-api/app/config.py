@@ -1,7 +1,90 @@
 import os
+from datetime import timedelta
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev_key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://admin:admin_password@db:5432/geodb')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Tokens: o access token é curto; o cliente renova com o refresh token em /auth/refresh
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_DAYS', 30)))
+    # Sem isso o Flask-RESTx intercepta os erros do JWT (token expirado, tipo errado) e responde 500
+    PROPAGATE_EXCEPTIONS = True
+
+    # Login: cache de verificações, executor do bcrypt e limite de falhas
+    LOGIN_CACHE_TTL = float(os.getenv('LOGIN_CACHE_TTL', 300))
+    LOGIN_CACHE_SIZE = int(os.getenv('LOGIN_CACHE_SIZE', 1024))
+    LOGIN_BCRYPT_WORKERS = int(os.getenv('LOGIN_BCRYPT_WORKERS', 2))
+    LOGIN_BCRYPT_MAX_PENDING = int(os.getenv('LOGIN_BCRYPT_MAX_PENDING', 32))
+    LOGIN_MAX_FAILURES = int(os.getenv('LOGIN_MAX_FAILURES', 10))
+    LOGIN_FAILURE_WINDOW = float(os.getenv('LOGIN_FAILURE_WINDOW', 60))
+
+    # Pool de conexões, por processo: com WEB_THREADS threads, pool_size + max_overflow deve cobrir as threads
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        # Conexões são recicladas antes de timeouts do servidor/proxy
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        # Descarta conexões mortas (ex.: reinício do banco) antes de usá-las
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1'
+    }
+
+    # Servidor de produção (python manage.py serve, via gunicorn)
+    WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5000')
+    # Os jobs de /items/optimize/jobs ficam na memória do processo: com mais de um
+    # worker, a consulta de um job pode cair em outro processo
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 1))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 8))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 120))
+    WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+    WEB_KEEPALIVE = int(os.getenv('WEB_KEEPALIVE', 5))
+    # Reciclagem de workers após N requisições (0 desliga); o jitter evita reinícios simultâneos
+    WEB_MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', 0))
+    WEB_MAX_REQUESTS_JITTER = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 100))
+
+    # Otimizações assíncronas (/items/optimize/jobs)
+    OPTIMIZE_MAX_WORKERS = int(os.getenv('OPTIMIZE_MAX_WORKERS', 2))
+    OPTIMIZE_MAX_PENDING = int(os.getenv('OPTIMIZE_MAX_PENDING', 20))
+    OPTIMIZE_JOB_TIMEOUT = float(os.getenv('OPTIMIZE_JOB_TIMEOUT', 300))
+    OPTIMIZE_JOB_RETENTION = float(os.getenv('OPTIMIZE_JOB_RETENTION', 3600))
+    # Processos do solve particionado (partitions > 1); 0 usa todos os núcleos
+    OPTIMIZE_PARTITION_WORKERS = int(os.getenv('OPTIMIZE_PARTITION_WORKERS', 0))
+
+    # Cache de resultados do /items/optimize (CACHE_REDIS_URL: backend compartilhado)
+    OPTIMIZE_CACHE_ENABLED = os.getenv('OPTIMIZE_CACHE_ENABLED', '1') == '1'
+    OPTIMIZE_CACHE_SIZE = int(os.getenv('OPTIMIZE_CACHE_SIZE', 128))
+    OPTIMIZE_CACHE_TTL = float(os.getenv('OPTIMIZE_CACHE_TTL', 300))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+
+    # Cache de vector tiles (/items/tiles), sempre no processo
+    TILES_CACHE_ENABLED = os.getenv('TILES_CACHE_ENABLED', '1') == '1'
+    TILES_CACHE_SIZE = int(os.getenv('TILES_CACHE_SIZE', 2048))
+    TILES_CACHE_TTL = float(os.getenv('TILES_CACHE_TTL', 600))
+
+    # Cache das listagens (GET /items/), com ETag; respostas maiores que MAX_ROWS itens não são guardadas
+    LISTING_CACHE_ENABLED = os.getenv('LISTING_CACHE_ENABLED', '1') == '1'
+    LISTING_CACHE_SIZE = int(os.getenv('LISTING_CACHE_SIZE', 512))
+    LISTING_CACHE_TTL = float(os.getenv('LISTING_CACHE_TTL', 60))
+    LISTING_CACHE_MAX_ROWS = int(os.getenv('LISTING_CACHE_MAX_ROWS', 5000))
+
+    # Cache da grade de clusters por zoom (/items/clusters)
+    CLUSTERS_CACHE_ENABLED = os.getenv('CLUSTERS_CACHE_ENABLED', '1') == '1'
+    CLUSTERS_CACHE_SIZE = int(os.getenv('CLUSTERS_CACHE_SIZE', 64))
+    CLUSTERS_CACHE_TTL = float(os.getenv('CLUSTERS_CACHE_TTL', 600))
+
+    # Distâncias pela malha viária (distance=road): grafo gerado por `manage.py build_road_graph`
+    # e matriz de distâncias entre itens em disco, reaproveitada entre solves
+    ROAD_GRAPH_PATH = os.getenv('ROAD_GRAPH_PATH', 'data/road_graph.npz')
+    DISTANCE_CACHE_DIR = os.getenv('DISTANCE_CACHE_DIR', 'data/distance_cache')
+    DISTANCE_CACHE_MAX_ITEMS = int(os.getenv('DISTANCE_CACHE_MAX_ITEMS', 20000))
+
+    # Modelo de leitura em memória (listagem por raio/bbox, vizinhos e entrada da otimização), por processo.
+    # Sincronizado pelas escritas da API e pelo LISTEN no canal dos triggers criados no init_db
+    READ_MODEL_ENABLED = os.getenv('READ_MODEL_ENABLED', '0') == '1'
+    READ_MODEL_CHANNEL = os.getenv('READ_MODEL_CHANNEL', 'items_changed')
+
+    # Fração das requisições com detalhamento de tempo (SQL, fases, Server-Timing)
+    METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.1))
\ No newline at end of file
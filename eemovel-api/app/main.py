@@ -2,7 +2,7 @@ from flask import Flask, request
 from flask_restx import Api, Resource, fields
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required
 from app.models import db, User, Item
-from geoalchemy2.functions import ST_Distance_Sphere, ST_MakePoint
+from app.services.item_service import buscar_por_raio
 import os
 
 app = Flask(__name__)
@@ -66,8 +66,7 @@ class ItemList(Resource):
         radius = request.args.get('radius', type=float)
 
         if all([lat, lng, radius]):
-            ponto = ST_MakePoint(lng, lat)
-            itens = Item.query.filter(ST_Distance_Sphere(Item.localizacao, ponto) <= radius).all()
+            itens = buscar_por_raio(lat, lng, radius)
         else:
             itens = Item.query.all()
         return [i.to_dict() for i in itens]
@@ -1,2 +1,3 @@
 from .user import User
-from .item import Item
\ No newline at end of file
+from .item import Item
+from .route_solution import RouteSolution
\ No newline at end of file
@@ -1,7 +1,56 @@
+import struct
 from app.extensions import db
 from geoalchemy2 import Geometry
+from geoalchemy2.elements import WKBElement
 from geoalchemy2.shape import to_shape
 
+# Flag de SRID no tipo geométrico do EWKB (PostGIS)
+_EWKB_SRID_FLAG = 0x20000000
+_WKB_POINT = 1
+
+
+def decode_point_wkb(data):
+    """
+    Lê (x, y) de um POINT em WKB/EWKB sem passar pelo Shapely.
+    Aceita bytes, memoryview ou string hexadecimal.
+    """
+    if isinstance(data, str):
+        data = bytes.fromhex(data)
+    data = bytes(data)
+
+    endian = '<' if data[0] == 1 else '>'
+    (geom_type,) = struct.unpack_from(endian + 'I', data, 1)
+    offset = 5
+    if geom_type & _EWKB_SRID_FLAG:
+        offset += 4
+    if geom_type & 0xFF != _WKB_POINT:
+        raise ValueError("WKB não é um POINT")
+    return struct.unpack_from(endian + 'dd', data, offset)
+
+
+class ItemRow:
+    """Representação somente-leitura e leve de um item, sem hidratação ORM."""
+    __slots__ = ('id', 'nome', 'descricao', 'latitude', 'longitude', 'peso')
+
+    def __init__(self, id, nome, descricao, latitude, longitude, peso):
+        self.id = id
+        self.nome = nome
+        self.descricao = descricao
+        self.latitude = latitude
+        self.longitude = longitude
+        self.peso = peso
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'descricao': self.descricao,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'peso': self.peso
+        }
+
+
 class Item(db.Model):
     __tablename__ = 'items'
 
@@ -9,13 +58,54 @@ class Item(db.Model):
     nome = db.Column(db.String(128), nullable=False)
     descricao = db.Column(db.Text)
     localizacao = db.Column(Geometry(geometry_type='POINT', srid=4326))
+    # Peso/demanda do item, em unidades de capacidade do veículo
+    peso = db.Column(db.Float, nullable=False, default=1.0, server_default='1')
+
+    # O Geometry já cria o índice GiST da coluna (usado por && e bbox); este
+    # índice de expressão atende as buscas por raio em metros (ST_DWithin em geography)
+    __table_args__ = (
+        db.Index(
+            'idx_items_localizacao_geog',
+            db.func.geography(localizacao),
+            postgresql_using='gist'
+        ),
+    )
+
+    @classmethod
+    def read_columns(cls):
+        """Expressões SQL de cada campo de leitura; as coordenadas saem prontas via ST_X/ST_Y"""
+        return {
+            'id': cls.id,
+            'nome': cls.nome,
+            'descricao': cls.descricao,
+            'latitude': db.func.ST_Y(cls.localizacao),
+            'longitude': db.func.ST_X(cls.localizacao),
+            'peso': cls.peso
+        }
+
+    @classmethod
+    def read_query(cls, query=None, fields=None):
+        """Consulta somente-leitura que devolve tuplas nomeadas em vez de objetos ORM"""
+        columns = cls.read_columns()
+        query = cls.query if query is None else query
+        return query.with_entities(*[columns[name].label(name) for name in fields or columns])
+
+    @classmethod
+    def read_rows(cls, query=None):
+        """Lista de ItemRow para consultas somente-leitura (ex.: otimização)"""
+        return [ItemRow(*row) for row in cls.read_query(query)]
 
     def to_dict(self):
-        point = to_shape(self.localizacao)
+        if isinstance(self.localizacao, WKBElement):
+            lng, lat = decode_point_wkb(self.localizacao.data)
+        else:
+            point = to_shape(self.localizacao)
+            lng, lat = point.x, point.y
         return {
             'id': self.id,
             'nome': self.nome,
             'descricao': self.descricao,
-            'latitude': point.y,
-            'longitude': point.x
-        }
\ No newline at end of file
+            'latitude': lat,
+            'longitude': lng,
+            'peso': self.peso
+        }
@@ -0,0 +1,16 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class RouteSolution(db.Model):
+    """Última solução do /items/optimize para um conjunto de parâmetros (base do modo incremental)."""
+    __tablename__ = 'route_solutions'
+
+    # Hash dos parâmetros da otimização (engine, capacidade, depósito...)
+    chave = db.Column(db.String(64), primary_key=True)
+    parametros = db.Column(db.JSON, nullable=False)
+    # Viagens (listas de ids), estado dos itens e depósito (ver optimization.snapshot_solution)
+    solucao = db.Column(db.JSON, nullable=False)
+    atualizado_em = db.Column(db.DateTime(timezone=True), nullable=False,
+                              default=lambda: datetime.now(timezone.utc),
+                              onupdate=lambda: datetime.now(timezone.utc))
@@ -1,8 +1,9 @@
 from flask import request
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from app.models.user import User
 from app.extensions import db
+from app.services.auth_service import login_service, LoginThrottledError, VerifierBusyError
 
 auth_ns = Namespace('auth', description='Autenticação')
 
@@ -28,13 +29,30 @@ class Register(Resource):
 @auth_ns.route('/login')
 class Login(Resource):
     @auth_ns.expect(user_model)
+    @auth_ns.doc(responses={200: 'Access token e refresh token', 401: 'Credenciais inválidas', 429: 'Muitas tentativas', 503: 'Logins demais em andamento'})
     def post(self):
         data = request.json
-        user = User.query.filter_by(email=data['email']).first()
-        
-        if user and user.check_password(data['password']):
-            token = create_access_token(identity=str(user.id))
-            
-            return {"access_token": token}, 200
+        try:
+            user_id = login_service.authenticate(data['email'], data['password'], client=request.remote_addr)
+        except LoginThrottledError as e:
+            return {"message": str(e)}, 429, {'Retry-After': str(e.retry_after)}
+        except VerifierBusyError as e:
+            return {"message": str(e)}, 503, {'Retry-After': '1'}
+
+        if user_id is not None:
+            identity = str(user_id)
+            # O refresh token evita novos logins (e novas verificações bcrypt) a cada expiração
+            return {
+                "access_token": create_access_token(identity=identity),
+                "refresh_token": create_refresh_token(identity=identity)
+            }, 200
             
-        return {"message": "Credenciais inválidas"}, 401
\ No newline at end of file
+        return {"message": "Credenciais inválidas"}, 401
+
+@auth_ns.route('/refresh')
+class Refresh(Resource):
+    @jwt_required(refresh=True)
+    @auth_ns.doc(security='apikey', responses={200: 'Novo access token', 401: 'Refresh token inválido ou expirado'})
+    def post(self):
+        """Gera um novo access token a partir do refresh token (Authorization: Bearer <refresh_token>)"""
+        return {"access_token": create_access_token(identity=get_jwt_identity())}, 200
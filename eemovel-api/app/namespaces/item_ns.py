@@ -1,11 +1,42 @@
-from flask import request
+from flask import Response, current_app, request, stream_with_context
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.item import Item
 from app.extensions import db
-from geoalchemy2 import Geography
-from geoalchemy2.shape import to_shape
-from sqlalchemy import cast
+from app.services.item_service import (
+    DEFAULT_K, MAX_K, MAX_NEAREST_BATCH, filtered_item_query, parse_point, parse_nearest_params, buscar_mais_proximos
+)
+from app.services.bulk_loader import (
+    FORMATS as BULK_FORMATS, METHODS as BULK_METHODS, DEFAULT_CHUNK_SIZE, MAX_BATCH_CHANGES,
+    detect_format, load_items, update_items, delete_items, parse_peso
+)
+from app.services.optimization import (
+    OverweightItemError, parse_optimize_params, parse_optimize_mode, load_items_for_optimization, solve_optimization,
+    reoptimize, load_solution, save_solution, snapshot_solution, check_item_weights
+)
+from app.services.optimize_jobs import optimization_jobs, QueueFullError
+from app.services.result_cache import optimize_cache, invalidate_item_caches
+from app.services.listing_cache import listing_version, make_etag, normalize_listing_args, get_listing
+from app.services.read_model import read_model
+from app.services.geofence_service import (
+    GEOFENCE_MODES, MAX_GEOFENCE_ZONES, parse_geofence, parse_geofence_mode, assign_items, geofence_rows
+)
+from app.services.export_service import EXPORT_FORMATS, EXPORT_EXTENSIONS, detect_export_format, iter_export
+from app.services.tile_service import MVT_MIMETYPE, get_tile, validate_tile
+from app.services.cluster_service import (
+    DEFAULT_CELL_PIXELS, MAX_ZOOM as CLUSTER_MAX_ZOOM, MAX_WORLD_ZOOM as CLUSTER_MAX_WORLD_ZOOM, get_clusters, parse_cluster_params
+)
+from app.utils.route_engines import ENGINES, DEFAULT_ENGINE
+from app.utils.cvrp import DEFAULT_TIME_BUDGET, MAX_TIME_BUDGET
+from app.utils.distance_providers import PROVIDERS, DEFAULT_PROVIDER
+from app.utils.partition import PARTITIONERS, DEFAULT_METHOD, MAX_PARTITIONS
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE, encode_cursor, parse_bbox
+)
+from app.utils.streaming import STREAM_CHUNK_SIZE, wants_stream, stream_response
+from urllib.parse import urlencode
+import io
+import itertools
 import logging
 
 item_ns = Namespace('items', description='Operações Geoespaciais e Logística', security='apikey')
@@ -15,41 +46,109 @@ item_model = item_ns.model('Item', {
     'nome': fields.String(required=True, example='Ponto A'),
     'descricao': fields.String(example='Descrição do Ponto'),
     'latitude': fields.Float(required=True, example=-24.9554),
-    'longitude': fields.Float(required=True, example=-53.4552)
+    'longitude': fields.Float(required=True, example=-53.4552),
+    'peso': fields.Float(description='Peso/demanda em unidades de capacidade', example=1.0)
 })
 
+# Campos aceitos em `fields=` e a expressão SQL de cada um
+ITEM_FIELDS = Item.read_columns()
+
+def _next_page_headers(last_id):
+    """Headers com o cursor da próxima página (X-Next-Cursor e Link)"""
+    token = encode_cursor(last_id)
+    args = request.args.to_dict()
+    args['cursor'] = token
+    return {
+        'X-Next-Cursor': token,
+        'Link': f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    }
+
+def _listing_query(params):
+    """Consulta de leitura e serializador da listagem, conforme os parâmetros normalizados"""
+    query = filtered_item_query(params)
+    requested = params['fields']
+
+    # Projeção: só as colunas pedidas entram no SELECT (o id sempre, para o cursor).
+    # As linhas saem como tuplas com ST_X/ST_Y, sem objetos ORM nem decodificação WKB
+    if requested:
+        selected = requested if 'id' in requested else ['id'] + requested
+        query = Item.read_query(query, selected)
+        serialize = lambda row: {name: getattr(row, name) for name in requested}
+    else:
+        query = Item.read_query(query)
+        serialize = lambda row: row._asdict()
+
+    # Paginação keyset: WHERE id > cursor ORDER BY id, latência constante em qualquer página.
+    # Sem paginação a ordem por id também vale: o corpo é o mesmo para a mesma ETag
+    if params['limit'] and params['cursor'] is not None:
+        query = query.filter(Item.id > params['cursor'])
+    return query.order_by(Item.id), serialize
+
+def _list_items(params):
+    """(corpo, headers) da listagem, lidos do modelo em memória (se ativo e atual) ou do banco"""
+    snapshot = read_model.snapshot()
+    if snapshot is not None:
+        itens, next_id = snapshot.listing(params)
+        return itens, _next_page_headers(next_id) if next_id is not None else {}
+
+    query, serialize = _listing_query(params)
+    limit = params['limit']
+    # Um item a mais indica se existe próxima página
+    if limit:
+        query = query.limit(limit + 1)
+    itens = query.all()
+    if limit and len(itens) > limit:
+        itens = itens[:limit]
+        return [serialize(i) for i in itens], _next_page_headers(itens[-1].id)
+    return [serialize(i) for i in itens], {}
+
 @item_ns.route('/')
 class ItemList(Resource):
     @jwt_required()
     @item_ns.doc(
-        responses={200: 'Sucesso', 400: 'Erro de validação'},
         params={
             'lat': {'description': 'Latitude central para a busca', 'type': 'float', 'example': -24.9554},
             'lng': {'description': 'Longitude central para a busca', 'type': 'float', 'example': -53.4552},
-            'radius': {'description': 'Raio de busca em metros', 'type': 'float', 'example': 5000}
-        }
+            'radius': {'description': 'Raio de busca em metros', 'type': 'float', 'example': 5000},
+            'bbox': {'description': 'Filtro por retângulo: minx,miny,maxx,maxy (lon/lat)', 'type': 'string', 'example': '-53.47,-24.97,-53.43,-24.94'},
+            'fields': {'description': f"Campos retornados, separados por vírgula ({', '.join(ITEM_FIELDS)})", 'type': 'string', 'example': 'id,latitude,longitude'},
+            'limit': {'description': f'Tamanho da página (ativa a paginação por cursor, padrão {DEFAULT_PAGE_SIZE})', 'type': 'int', 'example': DEFAULT_PAGE_SIZE},
+            'cursor': {'description': 'Cursor da próxima página (header X-Next-Cursor da resposta anterior)', 'type': 'string'},
+            'stream': {'description': 'Use 1 para resposta em streaming (NDJSON com Accept: application/x-ndjson)', 'type': 'int', 'example': 0}
+        },
+        responses={200: 'Sucesso (com ETag)', 304: 'Não modificado (If-None-Match igual à ETag atual)', 400: 'Erro de validação'}
     )
     def get(self):
         """Lista itens com busca geoespacial opcional por raio"""
         try:
-            # Captura os parâmetros da URL
-            lat = request.args.get('lat', type=float)
-            lng = request.args.get('lng', type=float)
-            radius = request.args.get('radius', type=float)
-            
-            query = Item.query
-            # Só aplica o filtro se os TRÊS parâmetros forem enviados
-            if all(v is not None for v in [lat, lng, radius]):
-                query = query.filter(
-                    db.func.ST_DWithin(
-                        cast(Item.localizacao, Geography),
-                        db.func.ST_MakePoint(lng, lat),
-                        radius
-                    )
-                )
-            
-            itens = query.all()
-            return [i.to_dict() for i in itens], 200
+            try:
+                params = normalize_listing_args(request.args, ITEM_FIELDS)
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            # Streaming: lê do cursor do servidor em lotes e escreve conforme chega (sem cache)
+            if wants_stream(request):
+                query, serialize = _listing_query(params)
+                if params['limit']:
+                    query = query.limit(params['limit'])
+                return stream_response(request, query.yield_per(STREAM_CHUNK_SIZE), serialize)
+
+            # A ETag sai da versão do dataset e dos parâmetros: o 304 só lê o contador do banco
+            version = listing_version()
+            etag = make_etag(version, params)
+            headers = {
+                'ETag': f'"{etag}"',
+                # Com JWT a resposta é do usuário; no-cache: o cliente revalida com If-None-Match
+                'Cache-Control': 'private, no-cache'
+            }
+            if request.if_none_match.contains_weak(etag):
+                return Response(status=304, headers={**headers, 'X-Cache': 'HIT'})
+
+            entry, hit = get_listing(
+                params, lambda: _list_items(params), current_app.config.get('LISTING_CACHE_MAX_ROWS'), version
+            )
+            headers['X-Cache'] = 'HIT' if hit else 'MISS'
+            return entry['body'], 200, {**entry['headers'], **headers}
             
         except Exception as e:
             return {"message": "Erro ao buscar itens", "error": str(e)}, 500
@@ -64,15 +163,21 @@ class ItemList(Resource):
             # Validação simples
             if not data.get('nome') or data.get('latitude') is None:
                 return {"message": "Campos obrigatórios ausentes"}, 400
+            try:
+                peso = parse_peso(data.get('peso'))
+            except ValueError as e:
+                return {"message": str(e)}, 400
 
             point = f'SRID=4326;POINT({data["longitude"]} {data["latitude"]})'
             new_item = Item(
                 nome=data['nome'], 
                 descricao=data.get('descricao'), 
-                localizacao=point
+                localizacao=point,
+                peso=peso
             )
             db.session.add(new_item)
             db.session.commit()
+            invalidate_item_caches([new_item.id])
             
             return {
                 "message": "Item criado com sucesso",
@@ -82,6 +187,314 @@ class ItemList(Resource):
             db.session.rollback()
             return {"message": "Erro ao criar item", "error": str(e)}, 500
 
+bulk_update_model = item_ns.model('BulkUpdate', {
+    'itens': fields.List(fields.Raw, required=True,
+                         description='Alterações parciais: id e os campos a mudar (nome, descricao, peso, latitude + longitude)',
+                         example=[{'id': 1, 'peso': 2}, {'id': 2, 'latitude': -24.95, 'longitude': -53.45}])
+})
+
+bulk_delete_model = item_ns.model('BulkDelete', {
+    'ids': fields.List(fields.Integer, required=True, example=[1, 2, 3])
+})
+
+@item_ns.route('/bulk')
+class ItemBulk(Resource):
+    @jwt_required()
+    @item_ns.doc(
+        responses={201: 'Carga concluída (ver relatório)', 400: 'Parâmetros inválidos'},
+        params={
+            'format': {'description': f"Formato do corpo ({', '.join(BULK_FORMATS)}); padrão pelo Content-Type", 'type': 'string'},
+            'chunk_size': {'description': 'Itens por lote/transação', 'type': 'int', 'example': DEFAULT_CHUNK_SIZE},
+            'method': {'description': f"Método de escrita ({', '.join(BULK_METHODS)})", 'type': 'string', 'example': 'copy'}
+        }
+    )
+    def post(self):
+        """Carga em massa de itens: GeoJSON FeatureCollection, CSV ou NDJSON (Requer JWT)"""
+        try:
+            upload = next(iter(request.files.values()), None)
+            try:
+                fmt = detect_format(
+                    request.args.get('format'),
+                    content_type=None if upload else request.content_type,
+                    filename=upload.filename if upload else None
+                )
+                chunk_size = request.args.get('chunk_size', type=int, default=DEFAULT_CHUNK_SIZE)
+                method = request.args.get('method', default='copy')
+                if method not in BULK_METHODS:
+                    raise ValueError(f"Método desconhecido: '{method}'. Opções: {', '.join(BULK_METHODS)}")
+                if chunk_size < 1:
+                    raise ValueError("'chunk_size' deve ser maior que zero")
+                # Sem os índices espaciais as buscas dos outros clientes varrem a tabela
+                if request.args.get('defer_index', type=int):
+                    raise ValueError("'defer_index' só está disponível na linha de comando (manage.py load_items --defer-index)")
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            # O corpo é lido em streaming, sem carregar o arquivo inteiro na memória
+            raw = upload.stream if upload else request.stream
+            stream = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            report = load_items(
+                stream, fmt,
+                chunk_size=chunk_size,
+                method=method
+            )
+            if report['inseridos']:
+                invalidate_item_caches()
+            return report, 201
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro na carga em massa", "error": str(e)}, 500
+
+    @jwt_required()
+    @item_ns.expect(bulk_update_model)
+    @item_ns.doc(
+        responses={200: 'Lote processado (ver resultado por item)', 400: 'Corpo inválido',
+                   422: 'Lote atômico desfeito (nenhuma alteração gravada)'},
+        params={'atomic': {'description': 'Use 1 para desfazer o lote inteiro se algum item falhar', 'type': 'int', 'example': 0}}
+    )
+    def patch(self):
+        """Atualização parcial de vários itens num único UPDATE, em uma transação (Requer JWT)"""
+        try:
+            data = request.get_json(silent=True)
+            changes = data.get('itens') if isinstance(data, dict) else data
+            if not isinstance(changes, list) or not changes:
+                return {"message": "Envie 'itens' como uma lista não vazia de alterações"}, 400
+            if len(changes) > MAX_BATCH_CHANGES:
+                return {"message": f"Máximo de {MAX_BATCH_CHANGES} alterações por requisição"}, 400
+
+            report = update_items(changes, atomic=bool(request.args.get('atomic', type=int)))
+            if report['atualizados']:
+                invalidate_item_caches([r['id'] for r in report['resultados'] if r['status'] == 'atualizado'])
+            return report, 422 if report.get('desfeito') else 200
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro na atualização em lote", "error": str(e)}, 500
+
+    @jwt_required()
+    @item_ns.expect(bulk_delete_model)
+    @item_ns.doc(
+        responses={200: 'Lote processado (ver resultado por id)', 400: 'Corpo inválido',
+                   422: 'Lote atômico desfeito (nenhum item removido)'},
+        params={
+            'ids': {'description': 'Ids separados por vírgula (alternativa ao corpo JSON)', 'type': 'string', 'example': '1,2,3'},
+            'atomic': {'description': 'Use 1 para desfazer o lote inteiro se algum id falhar', 'type': 'int', 'example': 0}
+        }
+    )
+    def delete(self):
+        """Remove vários itens num único DELETE, em uma transação (Requer JWT)"""
+        try:
+            data = request.get_json(silent=True)
+            ids = data.get('ids') if isinstance(data, dict) else data
+            if ids is None and request.args.get('ids'):
+                ids = [value for value in request.args['ids'].split(',') if value.strip()]
+            if not isinstance(ids, list) or not ids:
+                return {"message": "Envie 'ids' como uma lista não vazia"}, 400
+            if len(ids) > MAX_BATCH_CHANGES:
+                return {"message": f"Máximo de {MAX_BATCH_CHANGES} ids por requisição"}, 400
+
+            report = delete_items(ids, atomic=bool(request.args.get('atomic', type=int)))
+            if report['removidos']:
+                invalidate_item_caches([r['id'] for r in report['resultados'] if r['status'] == 'removido'])
+            return report, 422 if report.get('desfeito') else 200
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro na remoção em lote", "error": str(e)}, 500
+
+nearest_batch_model = item_ns.model('NearestBatch', {
+    'pontos': fields.List(fields.Raw, required=True, description=f'Até {MAX_NEAREST_BATCH} pontos {{"lat": ..., "lng": ...}}',
+                          example=[{'lat': -24.9554, 'lng': -53.4552}, {'lat': -24.96, 'lng': -53.47}]),
+    'k': fields.Integer(example=DEFAULT_K),
+    'max_distance': fields.Float(description='Distância máxima em metros'),
+    'rerank': fields.Boolean(default=True, description='Ordena pela distância geodésica')
+})
+
+@item_ns.route('/nearest')
+class ItemNearest(Resource):
+    @jwt_required()
+    @item_ns.doc(
+        responses={200: 'Itens mais próximos, do mais perto ao mais longe', 400: 'Parâmetros inválidos'},
+        params={
+            'lat': {'description': 'Latitude do ponto de consulta', 'type': 'float', 'example': -24.9554, 'required': True},
+            'lng': {'description': 'Longitude do ponto de consulta', 'type': 'float', 'example': -53.4552, 'required': True},
+            'k': {'description': f'Quantidade de itens (até {MAX_K})', 'type': 'int', 'example': DEFAULT_K},
+            'max_distance': {'description': 'Distância máxima em metros', 'type': 'float'},
+            'rerank': {'description': 'Use 0 para buscar só k candidatos no índice (mais rápido; os k itens podem ser aproximados)', 'type': 'int', 'example': 1}
+        }
+    )
+    def get(self):
+        """Os k itens mais próximos de um ponto (operador KNN <-> do PostGIS)"""
+        try:
+            try:
+                point = parse_point(request.args)
+                params = parse_nearest_params(request.args)
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            itens = buscar_mais_proximos([point], **params)[0]
+            return {'ponto': {'lat': point[0], 'lng': point[1]}, 'itens': itens}, 200
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro na busca por proximidade", "error": str(e)}, 500
+
+    @jwt_required()
+    @item_ns.expect(nearest_batch_model)
+    @item_ns.doc(responses={200: 'Resultados na ordem dos pontos enviados', 400: 'Parâmetros inválidos'})
+    def post(self):
+        """Versão em lote: os k itens mais próximos de cada ponto, numa única consulta"""
+        try:
+            data = request.get_json(silent=True) or {}
+            try:
+                pontos = data.get('pontos')
+                if not isinstance(pontos, list) or not pontos:
+                    raise ValueError("Envie 'pontos' como uma lista não vazia")
+                if len(pontos) > MAX_NEAREST_BATCH:
+                    raise ValueError(f"Máximo de {MAX_NEAREST_BATCH} pontos por requisição")
+                points = [parse_point(p) for p in pontos]
+                params = parse_nearest_params(data)
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            resultados = buscar_mais_proximos(points, **params)
+            return {
+                'resultados': [
+                    {'ponto': {'lat': lat, 'lng': lng}, 'itens': itens}
+                    for (lat, lng), itens in zip(points, resultados)
+                ]
+            }, 200
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro na busca por proximidade", "error": str(e)}, 500
+
+geofence_model = item_ns.model('Geofence', {
+    'type': fields.String(required=True, example='FeatureCollection'),
+    'features': fields.List(fields.Raw, required=True,
+                            description=f'Até {MAX_GEOFENCE_ZONES} features Polygon/MultiPolygon (lon/lat); o id da zona é o id da feature',
+                            example=[{'type': 'Feature', 'id': 'centro', 'properties': {}, 'geometry': {
+                                'type': 'Polygon',
+                                'coordinates': [[[-53.47, -24.97], [-53.43, -24.97], [-53.43, -24.94], [-53.47, -24.94], [-53.47, -24.97]]]
+                            }}])
+})
+
+@item_ns.route('/geofence')
+class ItemGeofence(Resource):
+    @jwt_required()
+    @item_ns.expect(geofence_model)
+    @item_ns.doc(
+        responses={200: 'Resultado por zona, na ordem recebida', 400: 'Polígonos inválidos'},
+        params={
+            'mode': {'description': f"Resultado por zona ({', '.join(GEOFENCE_MODES)})", 'type': 'string', 'example': 'ids'},
+            'stream': {'description': 'Use 1 para resposta em streaming: um par zona/item (ou zona/total) por linha', 'type': 'int', 'example': 0}
+        }
+    )
+    def post(self):
+        """Itens dentro de cada polígono (ids ou contagem), num único comando SQL"""
+        try:
+            try:
+                mode = parse_geofence_mode(request.args)
+                zones = parse_geofence(request.get_json(silent=True))
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            # Streaming: pares lidos do cursor do servidor em lotes; zonas sem itens não aparecem
+            if wants_stream(request):
+                if mode == 'ids':
+                    serialize = lambda row: {'zona': zones[row.idx - 1][0], 'item': row.id}
+                else:
+                    serialize = lambda row: {'zona': zones[row.idx - 1][0], 'total': row.total}
+                return stream_response(request, geofence_rows(zones, mode, yield_per=STREAM_CHUNK_SIZE), serialize)
+
+            return {'zonas': assign_items(zones, mode)}, 200
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro na busca por polígonos", "error": str(e)}, 500
+
+@item_ns.route('/clusters')
+class ItemClusters(Resource):
+    @jwt_required()
+    @item_ns.doc(
+        responses={200: 'Clusters da área', 400: 'Parâmetros inválidos'},
+        params={
+            'zoom': {'description': f'Nível de zoom do mapa (0 a {CLUSTER_MAX_ZOOM})', 'type': 'int', 'example': 12, 'required': True},
+            'bbox': {'description': f'Área visível: minx,miny,maxx,maxy (lon/lat); obrigatório acima do zoom {CLUSTER_MAX_WORLD_ZOOM}', 'type': 'string', 'example': '-53.55,-25.05,-53.35,-24.85'},
+            'grid': {'description': 'Lado da célula em pixels de tela', 'type': 'int', 'example': DEFAULT_CELL_PIXELS}
+        }
+    )
+    def get(self):
+        """Agrega os itens em células de grade (contagem e centroide), para zooms baixos"""
+        try:
+            try:
+                zoom, cell_pixels = parse_cluster_params(request.args)
+                bbox = parse_bbox(request.args.get('bbox'))
+                clusters, hit = get_clusters(zoom, bbox, cell_pixels)
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            return {
+                'zoom': zoom,
+                'total_itens': sum(c['quantidade'] for c in clusters),
+                'total_clusters': len(clusters),
+                'clusters': clusters
+            }, 200, {'X-Cache': 'HIT' if hit else 'MISS'}
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro ao agregar itens", "error": str(e)}, 500
+
+@item_ns.route('/export')
+class ItemExport(Resource):
+    @jwt_required()
+    @item_ns.doc(
+        responses={200: 'Arquivo com os itens (streaming)', 400: 'Parâmetros inválidos'},
+        params={
+            'format': {'description': "arrow (Arrow IPC stream), parquet (GeoParquet) ou fgb (FlatGeobuf com índice espacial)", 'type': 'string', 'enum': list(EXPORT_FORMATS), 'example': 'parquet'},
+            'lat': {'description': 'Latitude central para a busca', 'type': 'float', 'example': -24.9554},
+            'lng': {'description': 'Longitude central para a busca', 'type': 'float', 'example': -53.4552},
+            'radius': {'description': 'Raio de busca em metros', 'type': 'float', 'example': 5000},
+            'bbox': {'description': 'Filtro por retângulo: minx,miny,maxx,maxy (lon/lat)', 'type': 'string', 'example': '-53.47,-24.97,-53.43,-24.94'},
+            'fields': {'description': f"Colunas exportadas além da geometria ({', '.join(ITEM_FIELDS)})", 'type': 'string', 'example': 'id,nome,peso'}
+        }
+    )
+    def get(self):
+        """Exporta os itens em formato colunar binário, com os mesmos filtros da listagem (Requer JWT)"""
+        try:
+            params = normalize_listing_args(request.args, ITEM_FIELDS)
+            fmt = detect_export_format(request.args.get('format') or 'arrow')
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            body = iter_export(params, fmt)
+            # O primeiro pedaço (primeiro lote do COPY, ou o arquivo FlatGeobuf inteiro) é lido
+            # aqui: erros de banco ainda viram 500, antes de os headers do 200 serem enviados
+            first = next(body, b'')
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro ao exportar itens", "error": str(e)}, 500
+        return Response(stream_with_context(itertools.chain([first], body)), mimetype=EXPORT_FORMATS[fmt], headers={
+            'Content-Disposition': f'attachment; filename=items.{EXPORT_EXTENSIONS[fmt]}'
+        })
+
+@item_ns.route('/tiles/<int:z>/<int:x>/<int:y>.mvt')
+class ItemTile(Resource):
+    @item_ns.doc(security=None, responses={200: 'Tile MVT (camada "items")', 400: 'Tile inválido'})
+    def get(self, z, x, y):
+        """Vector tile (MVT) dos itens para o mapa; público, só com id, peso e quantidade"""
+        try:
+            validate_tile(z, x, y)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            tile, hit = get_tile(z, x, y)
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Erro ao gerar tile", "error": str(e)}, 500
+
+        return Response(tile, mimetype=MVT_MIMETYPE, headers={
+            # Curto: o cache do servidor é invalidado a cada escrita, o do navegador não
+            'Cache-Control': 'public, max-age=60',
+            'X-Cache': 'HIT' if hit else 'MISS'
+        })
+
 @item_ns.route('/<int:id>')
 @item_ns.param('id', 'O identificador único do item')
 class ItemResource(Resource):
@@ -100,13 +513,21 @@ class ItemResource(Resource):
             if not data:
                 return {"message": "Nenhum dado enviado para atualização"}, 400
 
+            # Peso nulo ou vazio mantém o atual, como no PATCH /items/bulk
+            try:
+                peso = parse_peso(data['peso']) if data.get('peso') not in ('', None) else item.peso
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
             item.nome = data.get('nome', item.nome)
             item.descricao = data.get('descricao', item.descricao)
+            item.peso = peso
             
             if 'latitude' in data and 'longitude' in data:
                 item.localizacao = f'SRID=4326;POINT({data["longitude"]} {data["latitude"]})'
                 
             db.session.commit()
+            invalidate_item_caches([id])
             return {
                 "message": "Item atualizado com sucesso",
                 "item": item.to_dict()
@@ -125,6 +546,7 @@ class ItemResource(Resource):
             
             db.session.delete(item)
             db.session.commit()
+            invalidate_item_caches([id])
             
             # Alterado de 204 para 200 para que o corpo da mensagem apareça
             return {
@@ -135,67 +557,121 @@ class ItemResource(Resource):
             db.session.rollback()
             return {"message": "Erro ao deletar item", "error": str(e)}, 500
 
+optimize_params = {
+    'capacity': {'description': 'Capacidade do veículo (itens por viagem; na engine cvrp, em unidades de peso)', 'type': 'float', 'example': 3},
+    'engine': {'description': f"Engine de roteirização ({', '.join(sorted(ENGINES))})", 'type': 'string', 'example': DEFAULT_ENGINE},
+    'depot_lat': {'description': 'Latitude do depósito (cvrp; padrão: centro dos itens)', 'type': 'float', 'example': -24.9554},
+    'depot_lng': {'description': 'Longitude do depósito (cvrp; padrão: centro dos itens)', 'type': 'float', 'example': -53.4552},
+    'time_budget': {'description': f'Tempo máximo de melhoria em segundos (cvrp, até {MAX_TIME_BUDGET})', 'type': 'float', 'example': DEFAULT_TIME_BUDGET},
+    'distance': {'description': f"Distâncias usadas na otimização ({', '.join(sorted(PROVIDERS))}; road exige o grafo viário)", 'type': 'string', 'example': DEFAULT_PROVIDER},
+    'partitions': {'description': f'Regiões resolvidas em paralelo, para muitos itens (1 desliga, até {MAX_PARTITIONS})', 'type': 'integer', 'example': 1},
+    'partition_method': {'description': f"Divisão em regiões ({', '.join(sorted(PARTITIONERS))})", 'type': 'string', 'example': DEFAULT_METHOD}
+}
+
+def _solve_and_save(params):
+    items = load_items_for_optimization()
+    result = solve_optimization(items, **params)
+    save_solution(params, snapshot_solution(items, result))
+    return result
+
 @item_ns.route('/optimize')
 class OptimizeRoute(Resource):
     @jwt_required()
-    @item_ns.doc(security='apikey')
+    @item_ns.doc(security='apikey', params=dict(optimize_params, mode={
+        'description': "full refaz todas as viagens; incremental parte da última solução com os mesmos parâmetros "
+                       "e só insere/remove os itens que mudaram",
+        'type': 'string', 'enum': ['full', 'incremental'], 'example': 'full'
+    }))
     def get(self):
-        """Algoritmo de Vizinho Mais Próximo para Logística (Requer JWT)"""
+        """Roteirização com capacidade: Vizinho Mais Próximo ou CVRP (Requer JWT)"""
         try:
-            capacity = request.args.get('capacity', type=int, default=3)
-            items_db = Item.query.all()
-            
-            # Inicializamos a variável aqui para evitar o erro "not defined"
-            all_trips = []
-            
-            if not items_db:
-                return {
-                    'message': 'Nenhum item encontrado no banco para otimização',
-                    'resumo': {'total_itens': 0, 'viagens_geradas': 0},
-                    'trips': []
-                }, 200
-
-            # Prepara a lista de itens não visitados
-            unvisited = []
-            for item in items_db:
-                unvisited.append({
-                    'data': item.to_dict(),
-                    'geom': to_shape(item.localizacao)
-                })
-            
-            # Algoritmo de Otimização (Vizinho mais próximo)
-            while unvisited:
-                current_trip = []
-                # Pega o primeiro item disponível para começar a viagem
-                current = unvisited.pop(0)
-                current_trip.append(current['data'])
-                
-                while len(current_trip) < capacity and unvisited:
-                    # Busca o item mais próximo do ponto atual
-                    closest_node = min(
-                        unvisited, 
-                        key=lambda x: current['geom'].distance(x['geom'])
-                    )
-                    unvisited.remove(closest_node)
-                    current_trip.append(closest_node['data'])
-                    current = closest_node
-                
-                all_trips.append(current_trip)
+            try:
+                params = parse_optimize_params(request.args)
+                mode = parse_optimize_mode(request.args)
+            except ValueError as e:
+                return {"message": str(e)}, 400
 
-            return {
-                'status': 'sucesso',
-                'resumo': {
-                    'total_itens': len(items_db),
-                    'capacidade': capacity,
-                    'viagens_geradas': len(all_trips)
-                },
-                'trips': all_trips
-            }, 200
+            try:
+                if mode == 'incremental':
+                    items = load_items_for_optimization()
+                    result = reoptimize(items, load_solution(params), **params)
+                    save_solution(params, snapshot_solution(items, result))
+                    return result, 200
+
+                # Enquanto os itens não mudarem, a mesma consulta é servida do cache
+                result, hit = optimize_cache.get_or_compute(params, lambda: _solve_and_save(params))
+            except OverweightItemError as e:
+                return {"message": str(e)}, 400
+            return result, 200, {'X-Cache': 'HIT' if hit else 'MISS'}
 
         except Exception as e:
-            # Log do erro no console para facilitar o debug
-            print(f"Erro detalhado na otimização: {str(e)}")
+            logging.exception("Erro na otimização")
             return {
                 "message": "Erro no algoritmo de otimização",
                 "error": str(e)
-            }, 500
\ No newline at end of file
+            }, 500
+
+@item_ns.route('/optimize/jobs')
+class OptimizeJobList(Resource):
+    @jwt_required()
+    @item_ns.doc(
+        security='apikey',
+        params=dict(optimize_params, timeout={'description': 'Tempo máximo do job em segundos', 'type': 'float'}),
+        responses={202: 'Job enfileirado', 400: 'Parâmetros inválidos', 503: 'Fila cheia'}
+    )
+    def post(self):
+        """Enfileira uma otimização assíncrona e retorna o id do job (Requer JWT)"""
+        try:
+            # Parâmetros pela query string ou no corpo JSON
+            args = dict(request.args.items())
+            args.update(request.get_json(silent=True) or {})
+            try:
+                params = parse_optimize_params(args)
+                timeout = float(args['timeout']) if args.get('timeout') not in (None, '') else None
+                if timeout is not None and timeout <= 0:
+                    raise ValueError("'timeout' deve ser maior que zero")
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            # Os itens são lidos aqui; o processo de otimização não acessa o banco
+            params['items'] = load_items_for_optimization()
+            try:
+                check_item_weights(params['items'], params['engine'], params['capacity'])
+            except OverweightItemError as e:
+                return {"message": str(e)}, 400
+            try:
+                job = optimization_jobs.submit(params, owner=get_jwt_identity(), timeout=timeout)
+            except QueueFullError as e:
+                return {"message": str(e)}, 503
+
+            return job.to_dict(), 202, {'Location': f'{request.base_url}/{job.id}'}
+        except Exception as e:
+            return {"message": "Erro ao enfileirar otimização", "error": str(e)}, 500
+
+@item_ns.route('/optimize/jobs/<string:job_id>')
+@item_ns.param('job_id', 'Identificador do job de otimização')
+class OptimizeJobResource(Resource):
+    def _job_or_404(self, job_id):
+        job = optimization_jobs.get(job_id)
+        if job is None or job.owner != get_jwt_identity():
+            return None
+        return job
+
+    @jwt_required()
+    @item_ns.doc(security='apikey', responses={200: 'Estado do job (com resultado quando concluído)', 404: 'Job não encontrado'})
+    def get(self, job_id):
+        """Consulta o andamento e o resultado de um job (Requer JWT)"""
+        job = self._job_or_404(job_id)
+        if job is None:
+            return {"message": f"Job {job_id} não encontrado"}, 404
+        return job.to_dict(), 200
+
+    @jwt_required()
+    @item_ns.doc(security='apikey', responses={200: 'Job cancelado', 404: 'Job não encontrado'})
+    def delete(self, job_id):
+        """Cancela um job pendente ou em execução (Requer JWT)"""
+        job = self._job_or_404(job_id)
+        if job is None:
+            return {"message": f"Job {job_id} não encontrado"}, 404
+        job = optimization_jobs.cancel(job_id)
+        return job.to_dict(include_result=False), 200
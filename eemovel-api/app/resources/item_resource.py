@@ -3,7 +3,7 @@ from flask_restx import Resource, Namespace, fields
 from flask_jwt_extended import jwt_required
 from app.models.item import Item
 from app import db
-from geoalchemy2.functions import ST_Distance_Sphere, ST_MakePoint
+from app.services.item_service import buscar_por_raio
 
 item_ns = Namespace('items', description='Operações de Itens')
 
@@ -17,11 +17,8 @@ class ItemList(Resource):
         radius = request.args.get('radius', type=float) # em metros
 
         if lat and lng and radius:
-            # Busca geoespacial eficiente
-            ponto_ref = ST_MakePoint(lng, lat)
-            items = Item.query.filter(
-                ST_Distance_Sphere(Item.localizacao, ponto_ref) <= radius
-            ).all()
+            # Busca geoespacial eficiente (usa o índice geography)
+            items = buscar_por_raio(lat, lng, radius)
             return [it.to_dict() for it in items]
         
         return [it.to_dict() for it in Item.query.all()]
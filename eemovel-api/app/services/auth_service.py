@@ -0,0 +1,191 @@
+import hashlib
+import hmac
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from app.extensions import bcrypt
+from app.models.user import User
+
+
+class LoginThrottledError(Exception):
+    """Falhas demais de login para o mesmo e-mail, vindas do mesmo cliente, dentro da janela."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class VerifierBusyError(Exception):
+    """A fila de verificações bcrypt está cheia."""
+
+
+def _load_user(email):
+    user = User.query.filter_by(email=email).first()
+    return (user.id, user.password_hash) if user else None
+
+
+class LoginService:
+    """
+    Autenticação por e-mail e senha com o bcrypt fora do caminho crítico.
+
+    * Verificações bem-sucedidas ficam em cache por `LOGIN_CACHE_TTL` segundos,
+      indexadas por um HMAC-SHA256 de e-mail e senha (a senha nunca é guardada);
+      um login repetido dentro do TTL não consulta o banco nem roda o bcrypt.
+    * O bcrypt roda num executor de `LOGIN_BCRYPT_WORKERS` threads, com no
+      máximo `LOGIN_BCRYPT_MAX_PENDING` verificações em andamento; acima disso
+      o login é recusado em vez de ocupar os workers da API.
+    * Após `LOGIN_MAX_FAILURES` falhas em `LOGIN_FAILURE_WINDOW` segundos, o
+      e-mail fica bloqueado para aquele cliente (endereço IP) até o fim da
+      janela, sem custo de bcrypt. Outros clientes e logins já no cache não
+      são afetados: falhas enviadas por terceiros não bloqueiam o dono da conta.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 300
+        self.max_entries = 1024
+        self.workers = 2
+        self.max_pending = 32
+        self.timeout = 10
+        self.max_failures = 10
+        self.failure_window = 60
+        self.hits = 0
+        self.misses = 0
+        self._secret = b''
+        self._cache = OrderedDict()
+        self._failures = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('LOGIN_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('LOGIN_CACHE_SIZE', self.max_entries)
+        self.workers = app.config.get('LOGIN_BCRYPT_WORKERS', self.workers)
+        self.max_pending = app.config.get('LOGIN_BCRYPT_MAX_PENDING', self.max_pending)
+        self.max_failures = app.config.get('LOGIN_MAX_FAILURES', self.max_failures)
+        self.failure_window = app.config.get('LOGIN_FAILURE_WINDOW', self.failure_window)
+        self._secret = (app.config.get('SECRET_KEY') or '').encode()
+        app.extensions['login_service'] = self
+
+    def authenticate(self, email, password, load_user=_load_user, client=None):
+        """Id do usuário, ou None se as credenciais forem inválidas. `client` é o endereço de quem tenta."""
+        # Credenciais já verificadas passam antes do limite de falhas
+        key = self._digest(email, password)
+        user_id = self._cached(key)
+        if user_id is not None:
+            return user_id
+
+        throttle_key = (email, client)
+        self._check_throttle(throttle_key)
+
+        # Logins simultâneos com as mesmas credenciais esperam a mesma verificação
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return pending.result(timeout=self.timeout)
+
+        try:
+            user_id = self._verify(email, password, load_user, throttle_key)
+            if user_id is not None:
+                self._remember(key, user_id)
+            pending.set_result(user_id)
+            return user_id
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _verify(self, email, password, load_user, throttle_key):
+        user = load_user(email)
+        if user and user[1] and self.check_password(user[1], password):
+            with self._lock:
+                self._failures.pop(throttle_key, None)
+            return user[0]
+
+        self._register_failure(throttle_key)
+        return None
+
+    def check_password(self, password_hash, password):
+        """Roda o bcrypt no executor limitado e espera o resultado."""
+        if self._executor is None:
+            with self._lock:
+                # Criado no primeiro uso: cada worker do gunicorn tem o seu
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='bcrypt')
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+        if not self._slots.acquire(blocking=False):
+            raise VerifierBusyError("Muitos logins simultâneos, tente novamente em instantes")
+        future = self._executor.submit(bcrypt.check_password_hash, password_hash, password)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.timeout)
+
+    def stats(self):
+        with self._lock:
+            return {'entradas': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+    # --- Cache ------------------------------------------------------------
+
+    def _digest(self, email, password):
+        message = email.encode() + b'\0' + password.encode()
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def _cached(self, key):
+        if not self.ttl:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._cache.pop(key, None)
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _remember(self, key, user_id):
+        if not self.ttl:
+            return
+        with self._lock:
+            self._cache[key] = (user_id, time.monotonic() + self.ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    # --- Limite de falhas -------------------------------------------------
+
+    def _check_throttle(self, key):
+        with self._lock:
+            entry = self._failures.get(key)
+            if entry is None:
+                return
+            count, started = entry
+            remaining = started + self.failure_window - time.monotonic()
+            if remaining <= 0:
+                del self._failures[key]
+            elif count >= self.max_failures:
+                raise LoginThrottledError("Muitas tentativas de login, aguarde antes de tentar novamente",
+                                          math.ceil(remaining))
+
+    def _register_failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= self.max_entries:
+                # Descarta janelas vencidas para o dicionário não crescer sem limite
+                self._failures = {k: v for k, v in self._failures.items() if v[1] + self.failure_window > now}
+            count, started = self._failures.get(key, (0, now))
+            self._failures[key] = (count + 1, started)
+
+
+login_service = LoginService()
@@ -0,0 +1,512 @@
+import csv
+import io
+import json
+import math
+from sqlalchemy import insert, text
+from app.extensions import db
+from app.models.item import Item
+
+FORMATS = ('geojson', 'csv', 'ndjson')
+METHODS = ('copy', 'executemany')
+
+DEFAULT_CHUNK_SIZE = 5000
+# Limite de erros detalhados no relatório (o total é sempre contado)
+MAX_REPORTED_ERRORS = 1000
+# Alterações/remoções por requisição em PATCH e DELETE /items/bulk
+MAX_BATCH_CHANGES = 100000
+# Maior id aceito pela coluna integer
+_MAX_ID = 2 ** 31 - 1
+
+_CONTENT_TYPES = {
+    'application/geo+json': 'geojson',
+    'application/json': 'geojson',
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson'
+}
+
+
+def detect_format(fmt=None, content_type=None, filename=None):
+    """Resolve o formato pelo parâmetro explícito, Content-Type ou extensão do arquivo."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato desconhecido: '{fmt}'. Opções: {', '.join(FORMATS)}")
+        return fmt
+    if content_type:
+        mimetype = content_type.split(';')[0].strip().lower()
+        if mimetype in _CONTENT_TYPES:
+            return _CONTENT_TYPES[mimetype]
+    if filename:
+        ext = filename.rsplit('.', 1)[-1].lower()
+        if ext in ('geojson', 'json'):
+            return 'geojson'
+        if ext in ('csv', 'ndjson'):
+            return ext
+    raise ValueError(f"Não foi possível identificar o formato. Informe 'format' ({', '.join(FORMATS)})")
+
+
+# --- Leitura em streaming -------------------------------------------------
+
+def iter_csv(stream):
+    """Linhas de um CSV com cabeçalho nome,descricao,latitude,longitude[,peso]."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        # A linha 1 é o cabeçalho
+        yield reader.line_num, record
+
+
+def iter_ndjson(stream):
+    """Um objeto JSON (item ou Feature) por linha."""
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"JSON inválido: {e}")
+
+
+def iter_geojson(stream, read_size=65536):
+    """
+    Features de um FeatureCollection lidas incrementalmente: o arquivo é
+    consumido em blocos e cada Feature é decodificada assim que termina,
+    sem carregar o documento inteiro.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        chunk = stream.read(read_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    # Avança até o início do array "features"
+    while True:
+        pos = buffer.find('"features"')
+        if pos >= 0:
+            bracket = buffer.find('[', pos)
+            if bracket >= 0:
+                buffer = buffer[bracket + 1:]
+                break
+        if eof:
+            raise ValueError("GeoJSON inválido: FeatureCollection sem 'features'")
+        fill()
+
+    feature_no = 0
+    pos = 0
+    while True:
+        # Pula espaços e vírgulas entre as features
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            if pos >= len(buffer):
+                raise ValueError
+            feature, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            # Feature incompleta no fim do bloco: lê mais e tenta de novo
+            if eof:
+                raise ValueError(f"GeoJSON inválido após a feature {feature_no}")
+            buffer = buffer[pos:]
+            pos = 0
+            fill()
+            continue
+        feature_no += 1
+        yield feature_no, feature
+
+
+_READERS = {'geojson': iter_geojson, 'csv': iter_csv, 'ndjson': iter_ndjson}
+
+
+# --- Validação ------------------------------------------------------------
+
+def _coordinate(value, name, limit):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' ausente ou não numérico")
+    if not math.isfinite(number) or abs(number) > limit:
+        raise ValueError(f"'{name}' fora do intervalo [-{limit}, {limit}]")
+    return number
+
+
+def parse_peso(value):
+    """Peso de um item (padrão 1 quando ausente). Levanta ValueError."""
+    if value in ('', None):
+        return 1.0
+    try:
+        peso = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("'peso' não numérico")
+    if not math.isfinite(peso) or peso < 0:
+        raise ValueError("'peso' deve ser um número não negativo")
+    return peso
+
+
+def normalize_record(record):
+    """
+    Converte um item (dict plano ou Feature GeoJSON) em (nome, descricao, lng, lat, peso).
+    Levanta ValueError com a descrição do problema.
+    """
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Registro deve ser um objeto")
+
+    if record.get('type') == 'Feature':
+        geometry = record.get('geometry') or {}
+        if geometry.get('type') != 'Point':
+            raise ValueError("Geometria deve ser do tipo Point")
+        coords = geometry.get('coordinates') or []
+        if len(coords) < 2:
+            raise ValueError("Point sem coordenadas")
+        props = record.get('properties') or {}
+        lng, lat = coords[0], coords[1]
+    else:
+        props = record
+        lng, lat = record.get('longitude'), record.get('latitude')
+
+    nome = str(props.get('nome') or '').strip()
+    if not nome:
+        raise ValueError("'nome' é obrigatório")
+    if len(nome) > Item.nome.type.length:
+        raise ValueError(f"'nome' excede {Item.nome.type.length} caracteres")
+
+    descricao = props.get('descricao')
+    return (
+        nome,
+        descricao if descricao not in ('', None) else None,
+        _coordinate(lng, 'longitude', 180),
+        _coordinate(lat, 'latitude', 90),
+        parse_peso(props.get('peso'))
+    )
+
+
+# --- Escrita --------------------------------------------------------------
+
+def _ewkt(lng, lat):
+    return f'SRID=4326;POINT({lng!r} {lat!r})'
+
+
+# Marcador de NULL do COPY: só vale sem aspas, então um texto "\N" continua sendo texto
+COPY_NULL = '\\N'
+
+
+def _copy_field(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, str):
+        # Texto sempre entre aspas: a string vazia ("") não vira NULL
+        return '"' + value.replace('"', '""') + '"'
+    return repr(value)
+
+
+def copy_buffer(rows):
+    """Linhas (nome, descricao, lng, lat, peso) no CSV lido pelo COPY (NULL explícito, ver COPY_NULL)."""
+    buffer = io.StringIO()
+    for nome, descricao, lng, lat, peso in rows:
+        buffer.write(','.join(_copy_field(value) for value in (nome, descricao, _ewkt(lng, lat), peso)) + '\n')
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_chunk(rows):
+    """Carrega o lote via COPY ... FROM STDIN (CSV) pela conexão DBAPI da sessão."""
+    buffer = copy_buffer(rows)
+    sql = (f"COPY {Item.__tablename__} (nome, descricao, localizacao, peso) "
+           f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')")
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def _executemany_chunk(rows):
+    db.session.execute(
+        insert(Item.__table__),
+        [
+            {'nome': nome, 'descricao': descricao, 'localizacao': _ewkt(lng, lat), 'peso': peso}
+            for nome, descricao, lng, lat, peso in rows
+        ]
+    )
+
+
+_WRITERS = {'copy': _copy_chunk, 'executemany': _executemany_chunk}
+
+
+def _spatial_indexes():
+    return [index for index in Item.__table__.indexes if index.kwargs.get('postgresql_using') == 'gist']
+
+
+def load_items(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, method='copy', defer_index=False):
+    """
+    Carrega itens de `stream` (arquivo texto) em lotes de `chunk_size`.
+
+    Cada lote é gravado e confirmado numa transação própria; linhas inválidas
+    são puladas e reportadas com o número da linha (ou da feature). Com
+    `defer_index=True` os índices espaciais são removidos antes da carga e
+    recriados ao final (mesmo se a carga falhar), o que é bem mais rápido
+    para cargas grandes. Enquanto isso as buscas espaciais varrem a tabela,
+    por isso a opção fica só na linha de comando (manage.py load_items).
+    """
+    if method not in _WRITERS:
+        raise ValueError(f"Método desconhecido: '{method}'. Opções: {', '.join(METHODS)}")
+    if chunk_size < 1:
+        raise ValueError("'chunk_size' deve ser maior que zero")
+
+    reader = _READERS[fmt]
+    write = _WRITERS[method]
+    report = {'formato': fmt, 'metodo': method, 'inseridos': 0, 'rejeitados': 0, 'lotes': 0, 'erros': []}
+
+    def reject(position, message):
+        report['rejeitados'] += 1
+        if len(report['erros']) < MAX_REPORTED_ERRORS:
+            report['erros'].append({'linha': position, 'erro': message})
+
+    def flush(rows, positions):
+        try:
+            write(rows)
+            db.session.commit()
+            report['inseridos'] += len(rows)
+        except Exception as e:
+            db.session.rollback()
+            for position in positions:
+                reject(position, f"Falha ao gravar o lote: {e}")
+        report['lotes'] += 1
+
+    indexes = _spatial_indexes() if defer_index else []
+    for index in indexes:
+        db.session.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+    db.session.commit()
+
+    try:
+        rows, positions = [], []
+        try:
+            for position, record in reader(stream):
+                try:
+                    rows.append(normalize_record(record))
+                    positions.append(position)
+                except ValueError as e:
+                    reject(position, str(e))
+                    continue
+                if len(rows) >= chunk_size:
+                    flush(rows, positions)
+                    rows, positions = [], []
+        except ValueError as e:
+            # Erro estrutural no arquivo: o que já foi lido continua valendo
+            report['erro_arquivo'] = str(e)
+
+        if rows:
+            flush(rows, positions)
+    finally:
+        # Os índices voltam mesmo se a carga for interrompida (conexão caída, erro no banco)
+        if indexes:
+            _recreate_indexes(indexes)
+            report['indices_recriados'] = [index.name for index in indexes]
+
+    return report
+
+
+def _recreate_indexes(indexes):
+    db.session.rollback()
+    for index in indexes:
+        index.create(bind=db.session.connection(), checkfirst=True)
+    db.session.execute(text(f'ANALYZE {Item.__tablename__}'))
+    db.session.commit()
+
+
+# --- Atualização e remoção em lote -------------------------------------------
+
+# Um único UPDATE para o lote inteiro: as alterações chegam como arrays
+# paralelos (unnest), e campos ausentes (NULL) mantêm o valor atual
+_UPDATE_SQL = text(f"""
+UPDATE {Item.__tablename__} AS i SET
+    nome = COALESCE(v.nome, i.nome),
+    descricao = CASE WHEN v.set_descricao THEN v.descricao ELSE i.descricao END,
+    peso = COALESCE(v.peso, i.peso),
+    localizacao = CASE WHEN v.lng IS NULL THEN i.localizacao
+                       ELSE ST_SetSRID(ST_MakePoint(v.lng, v.lat), 4326) END
+FROM unnest(
+    CAST(:ids AS integer[]), CAST(:nomes AS text[]), CAST(:descricoes AS text[]),
+    CAST(:set_descricao AS boolean[]), CAST(:pesos AS double precision[]),
+    CAST(:lngs AS double precision[]), CAST(:lats AS double precision[])
+) AS v(id, nome, descricao, set_descricao, peso, lng, lat)
+WHERE i.id = v.id
+RETURNING i.id, i.nome, i.descricao, ST_Y(i.localizacao) AS latitude, ST_X(i.localizacao) AS longitude, i.peso
+""")
+
+_DELETE_SQL = text(f"""
+DELETE FROM {Item.__tablename__} WHERE id = ANY(CAST(:ids AS integer[])) RETURNING id
+""")
+
+
+def _item_id(value):
+    if isinstance(value, bool):
+        raise ValueError("'id' deve ser um inteiro positivo")
+    try:
+        item_id = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("'id' deve ser um inteiro positivo")
+    if item_id != value and str(item_id) != str(value).strip():
+        raise ValueError("'id' deve ser um inteiro positivo")
+    if not 1 <= item_id <= _MAX_ID:
+        raise ValueError("'id' fora do intervalo")
+    return item_id
+
+
+def normalize_change(change):
+    """
+    Valida uma alteração parcial {'id', 'nome'?, 'descricao'?, 'peso'?, 'latitude'?, 'longitude'?}.
+    Retorna (id, nome, descricao, altera_descricao, peso, lng, lat), com None nos
+    campos que não mudam. Levanta ValueError com a descrição do problema.
+    """
+    if not isinstance(change, dict):
+        raise ValueError("Alteração deve ser um objeto")
+    item_id = _item_id(change.get('id'))
+
+    nome = None
+    if 'nome' in change:
+        nome = str(change['nome'] or '').strip()
+        if not nome:
+            raise ValueError("'nome' não pode ser vazio")
+        if len(nome) > Item.nome.type.length:
+            raise ValueError(f"'nome' excede {Item.nome.type.length} caracteres")
+
+    set_descricao = 'descricao' in change
+    descricao = change.get('descricao')
+    descricao = descricao if descricao not in ('', None) else None
+
+    peso = parse_peso(change['peso']) if change.get('peso') not in ('', None) else None
+
+    if ('latitude' in change) != ('longitude' in change):
+        raise ValueError("Informe 'latitude' e 'longitude' juntos")
+    lng = lat = None
+    if 'latitude' in change:
+        lng = _coordinate(change['longitude'], 'longitude', 180)
+        lat = _coordinate(change['latitude'], 'latitude', 90)
+
+    if nome is None and not set_descricao and peso is None and lng is None:
+        raise ValueError("Nenhum campo para alterar")
+    return item_id, nome, descricao, set_descricao, peso, lng, lat
+
+
+def _batch_report(key):
+    return {key: 0, 'nao_encontrados': 0, 'rejeitados': 0, 'resultados': []}
+
+
+def update_items(changes, atomic=False):
+    """
+    Aplica alterações parciais a vários itens com um único UPDATE ... FROM
+    e RETURNING, numa transação. O relatório traz o resultado de cada
+    alteração, na ordem recebida: 'atualizado' (com o item), 'nao_encontrado'
+    ou 'erro'. Com `atomic=True` qualquer erro ou id inexistente desfaz o lote.
+    """
+    report = _batch_report('atualizados')
+    results = report['resultados']
+    rows = []
+    seen = set()
+    for position, change in enumerate(changes):
+        try:
+            row = normalize_change(change)
+            if row[0] in seen:
+                raise ValueError("'id' repetido no lote")
+        except ValueError as e:
+            report['rejeitados'] += 1
+            item_id = change.get('id') if isinstance(change, dict) else None
+            results.append({'posicao': position, 'id': item_id, 'status': 'erro', 'erro': str(e)})
+            continue
+        seen.add(row[0])
+        rows.append(row)
+        results.append({'posicao': position, 'id': row[0], 'status': None})
+
+    if atomic and report['rejeitados']:
+        return _rejected_batch(report)
+
+    updated = {}
+    if rows:
+        columns = list(zip(*rows))
+        params = dict(zip(('ids', 'nomes', 'descricoes', 'set_descricao', 'pesos', 'lngs', 'lats'),
+                          (list(column) for column in columns)))
+        updated = {row.id: dict(row._mapping) for row in db.session.execute(_UPDATE_SQL, params)}
+
+    for result in results:
+        if result['status'] is None:
+            if result['id'] in updated:
+                result['status'] = 'atualizado'
+                result['item'] = updated[result['id']]
+            else:
+                result['status'] = 'nao_encontrado'
+                report['nao_encontrados'] += 1
+    report['atualizados'] = len(updated)
+
+    if atomic and report['nao_encontrados']:
+        db.session.rollback()
+        return _rejected_batch(report)
+    db.session.commit()
+    return report
+
+
+def delete_items(ids, atomic=False):
+    """
+    Remove vários itens com um único DELETE ... WHERE id = ANY(...) RETURNING,
+    numa transação. Resultado por id: 'removido', 'nao_encontrado' ou 'erro'.
+    Com `atomic=True` qualquer erro ou id inexistente desfaz o lote.
+    """
+    report = _batch_report('removidos')
+    results = report['resultados']
+    valid = []
+    for position, value in enumerate(ids):
+        try:
+            item_id = _item_id(value)
+        except ValueError as e:
+            report['rejeitados'] += 1
+            results.append({'posicao': position, 'id': value, 'status': 'erro', 'erro': str(e)})
+            continue
+        valid.append(item_id)
+        results.append({'posicao': position, 'id': item_id, 'status': None})
+
+    if atomic and report['rejeitados']:
+        return _rejected_batch(report)
+
+    deleted = set()
+    if valid:
+        deleted = {row.id for row in db.session.execute(_DELETE_SQL, {'ids': sorted(set(valid))})}
+
+    for result in results:
+        if result['status'] is None:
+            if result['id'] in deleted:
+                result['status'] = 'removido'
+            else:
+                result['status'] = 'nao_encontrado'
+                report['nao_encontrados'] += 1
+    report['removidos'] = len(deleted)
+
+    if atomic and report['nao_encontrados']:
+        db.session.rollback()
+        return _rejected_batch(report)
+    db.session.commit()
+    return report
+
+
+def _rejected_batch(report):
+    # Lote atômico com problemas: nada foi gravado
+    for key in ('atualizados', 'removidos'):
+        if key in report:
+            report[key] = 0
+    for result in report['resultados']:
+        if result['status'] in (None, 'atualizado', 'removido'):
+            result['status'] = 'nao_aplicado'
+            result.pop('item', None)
+    report['desfeito'] = True
+    return report
@@ -0,0 +1,154 @@
+import math
+from app.extensions import db
+from app.models.item import Item
+from app.services.result_cache import ResultCache
+
+MAX_ZOOM = 20
+# Lado da célula em pixels de tela (tiles de 256 px)
+DEFAULT_CELL_PIXELS = 64
+MIN_CELL_PIXELS = 16
+MAX_CELL_PIXELS = 256
+# Sem bbox, a grade do mundo inteiro só é aceita até este zoom
+MAX_WORLD_ZOOM = 4
+# Zooms com cache: acima disso quase toda célula tem um item e o cache guardaria a tabela inteira
+CACHE_MAX_ZOOM = 10
+# O cache guarda blocos de N x N células, reaproveitados por qualquer recorte que os toque
+CACHE_BLOCK_CELLS = 16
+# Recortes que tocam mais blocos que isso são agregados direto, sem cache
+MAX_CACHE_BLOCKS = 64
+WORLD_BBOX = (-180.0, -90.0, 180.0, 90.0)
+
+cluster_cache = ResultCache('clusters')
+
+
+def cell_size(zoom, cell_pixels=DEFAULT_CELL_PIXELS):
+    """Lado da célula em graus: `cell_pixels` pixels de tela no zoom informado."""
+    return 360.0 / (2 ** zoom) * cell_pixels / 256
+
+
+def parse_cluster_params(args):
+    """Valida zoom e grid da query string. Levanta ValueError."""
+    try:
+        zoom = int(args.get('zoom'))
+        cell_pixels = int(args.get('grid', DEFAULT_CELL_PIXELS))
+    except (TypeError, ValueError):
+        raise ValueError("'zoom' é obrigatório e deve ser inteiro")
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"'zoom' deve estar entre 0 e {MAX_ZOOM}")
+    if not MIN_CELL_PIXELS <= cell_pixels <= MAX_CELL_PIXELS:
+        raise ValueError(f"'grid' deve estar entre {MIN_CELL_PIXELS} e {MAX_CELL_PIXELS} pixels")
+    return zoom, cell_pixels
+
+
+def cell_range(bbox, size):
+    """
+    Colunas e linhas (c0, r0, c1, r1) das células da grade de `size` graus
+    que tocam o bbox. A célula k é a do ponto de grade k * size, para onde o
+    ST_SnapToGrid leva os pontos de [(k - 0,5) * size, (k + 0,5) * size).
+    """
+    minx, miny, maxx, maxy = bbox
+    return tuple(math.floor(v / size + 0.5) for v in (minx, miny, maxx, maxy))
+
+
+def cell_envelope(cells, size):
+    """Retângulo (minx, miny, maxx, maxy) coberto pelas células inteiras de `cells`."""
+    c0, r0, c1, r1 = cells
+    return ((c0 - 0.5) * size, (r0 - 0.5) * size, (c1 + 0.5) * size, (r1 + 0.5) * size)
+
+
+def _inside(cluster, cells):
+    col, row = cluster['celula']
+    return cells[0] <= col <= cells[2] and cells[1] <= row <= cells[3]
+
+
+def aggregate_grid(size, cells):
+    """
+    Agrega os itens das células `cells` (ver `cell_range`) numa grade regular
+    de `size` graus (ST_SnapToGrid), alinhada à origem. O filtro && usa o
+    índice espacial e cobre as células inteiras, então cada célula sai igual
+    em qualquer recorte.
+    """
+    snapped = db.func.ST_SnapToGrid(Item.localizacao, size)
+    x = db.func.ST_X(Item.localizacao)
+    y = db.func.ST_Y(Item.localizacao)
+    count = db.func.count(Item.id)
+    envelope = db.func.ST_MakeEnvelope(*cell_envelope(cells, size), 4326)
+    rows = db.session.query(
+        db.func.ST_X(snapped).label('cell_x'),
+        db.func.ST_Y(snapped).label('cell_y'),
+        count.label('quantidade'),
+        db.func.avg(x).label('longitude'),
+        db.func.avg(y).label('latitude'),
+        db.func.sum(Item.peso).label('peso'),
+        db.func.min(x).label('minx'),
+        db.func.min(y).label('miny'),
+        db.func.max(x).label('maxx'),
+        db.func.max(y).label('maxy'),
+        db.func.min(Item.id).label('id'),
+        db.func.mode().within_group(Item.descricao).label('descricao')
+    ).filter(Item.localizacao.op('&&')(envelope)).group_by(snapped).all()
+
+    clusters = [
+        {
+            # Coluna e linha da célula na grade do zoom (identificador estável)
+            'celula': [round(row.cell_x / size), round(row.cell_y / size)],
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'quantidade': row.quantidade,
+            'peso': row.peso,
+            # Descrição mais frequente na célula (ex.: a região)
+            'descricao': row.descricao,
+            'bbox': [row.minx, row.miny, row.maxx, row.maxy],
+            # Célula com um único item: o cliente pode abrir o item direto
+            'id': row.id if row.quantidade == 1 else None
+        }
+        for row in rows
+    ]
+    # Um ponto exatamente na borda do envelope pode cair na célula vizinha, que ficou incompleta
+    return [cluster for cluster in clusters if _inside(cluster, cells)]
+
+
+def get_clusters(zoom, bbox=None, cell_pixels=DEFAULT_CELL_PIXELS):
+    """
+    Clusters do zoom (centroide, contagem, peso e extensão por célula) das
+    células que tocam `bbox` (minx, miny, maxx, maxy). Retorna (clusters, hit).
+
+    A consulta só lê os itens do recorte, então o tamanho da resposta depende
+    da área e do zoom, não do número de itens. Até CACHE_MAX_ZOOM o cache
+    guarda blocos de CACHE_BLOCK_CELLS x CACHE_BLOCK_CELLS células até a
+    próxima escrita em itens; os blocos que faltam são lidos numa consulta só.
+    """
+    if bbox is None and zoom > MAX_WORLD_ZOOM:
+        raise ValueError(f"'bbox' é obrigatório acima do zoom {MAX_WORLD_ZOOM}")
+    size = cell_size(zoom, cell_pixels)
+    cells = cell_range(bbox or WORLD_BBOX, size)
+    block = CACHE_BLOCK_CELLS
+    blocks = [
+        (bx, by)
+        for bx in range(cells[0] // block, cells[2] // block + 1)
+        for by in range(cells[1] // block, cells[3] // block + 1)
+    ]
+    if zoom > CACHE_MAX_ZOOM or len(blocks) > MAX_CACHE_BLOCKS:
+        return aggregate_grid(size, cells), False
+
+    version = cluster_cache.version()
+    keys = {b: cluster_cache.make_key({'zoom': zoom, 'cell_pixels': cell_pixels, 'block': list(b)}, version)
+            for b in blocks}
+    found = {b: cluster_cache.get(key) for b, key in keys.items()}
+    missing = {b for b, value in found.items() if value is None}
+    if missing:
+        hull = (
+            min(bx for bx, _ in missing) * block, min(by for _, by in missing) * block,
+            max(bx for bx, _ in missing) * block + block - 1, max(by for _, by in missing) * block + block - 1
+        )
+        for b in missing:
+            found[b] = []
+        for cluster in aggregate_grid(size, hull):
+            b = (cluster['celula'][0] // block, cluster['celula'][1] // block)
+            if b in missing:
+                found[b].append(cluster)
+        for b in missing:
+            cluster_cache.set(keys[b], found[b])
+
+    clusters = [cluster for b in blocks for cluster in found[b] if _inside(cluster, cells)]
+    return clusters, not missing
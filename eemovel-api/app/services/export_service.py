@@ -0,0 +1,243 @@
+import io
+import json
+import numpy as np
+from sqlalchemy import literal_column, text
+from app.extensions import db
+from app.models.item import Item
+from app.services.item_service import filtered_item_query
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # opcional: sem o pyarrow só a exportação FlatGeobuf fica disponível
+    pa = pc = pa_csv = pq = None
+
+EXPORT_FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+    'fgb': 'application/flatgeobuf'
+}
+EXPORT_EXTENSIONS = {'arrow': 'arrows', 'parquet': 'parquet', 'fgb': 'fgb'}
+# Formatos montados pelo pyarrow; o FlatGeobuf sai pronto do PostGIS
+ARROW_FORMATS = ('arrow', 'parquet')
+
+# Linhas por lote (uma consulta keyset e um record batch / row group cada)
+EXPORT_BATCH_ROWS = 65536
+# Tamanho dos pedaços do corpo da resposta do FlatGeobuf
+FGB_CHUNK_BYTES = 1 << 20
+
+GEOMETRY_COLUMN = 'geometry'
+# Bytes de um ponto em WKB: ordem (1) + tipo (4) + x, y (8 + 8)
+_WKB_POINT = np.dtype([('order', 'u1'), ('type', '<u4'), ('x', '<f8'), ('y', '<f8')])
+
+
+def detect_export_format(fmt=None, filename=None):
+    """
+    Resolve o formato pelo parâmetro explícito ou pela extensão do arquivo e
+    confere se ele está disponível. Levanta ValueError com a mensagem para o cliente.
+    """
+    if not fmt and filename:
+        ext = filename.rsplit('.', 1)[-1].lower()
+        fmt = {'arrows': 'arrow', 'arrow': 'arrow', 'parquet': 'parquet', 'fgb': 'fgb'}.get(ext)
+        if fmt is None:
+            raise ValueError(f"Não foi possível identificar o formato. Informe 'format' ({', '.join(EXPORT_FORMATS)})")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: '{fmt}'. Opções: {', '.join(EXPORT_FORMATS)}")
+    if fmt in ARROW_FORMATS and pa is None:
+        raise ValueError(f"A exportação '{fmt}' requer o pacote 'pyarrow' (pip install pyarrow)")
+    return fmt
+
+
+# --- Leitura em lotes colunares ---------------------------------------------
+
+def _arrow_types():
+    return {
+        'id': pa.int64(),
+        'nome': pa.string(),
+        'descricao': pa.string(),
+        'latitude': pa.float64(),
+        'longitude': pa.float64(),
+        'peso': pa.float64()
+    }
+
+
+def export_schema(fields=None, fmt='arrow'):
+    """
+    Schema das colunas exportadas: os campos pedidos (todos, por padrão) e a
+    geometria em WKB. No Arrow a coluna segue a extensão GeoArrow
+    (`geoarrow.wkb`); no Parquet o schema leva os metadados do GeoParquet.
+    """
+    types = _arrow_types()
+    columns = [pa.field(name, types[name]) for name in fields or types]
+    geometry = pa.field(GEOMETRY_COLUMN, pa.binary())
+    if fmt == 'parquet':
+        geo = {
+            'version': '1.0.0',
+            'primary_column': GEOMETRY_COLUMN,
+            # Sem 'crs': o padrão do GeoParquet é OGC:CRS84 (lon/lat), o mesmo do SRID 4326 da tabela
+            'columns': {GEOMETRY_COLUMN: {'encoding': 'WKB', 'geometry_types': ['Point']}}
+        }
+        return pa.schema([*columns, geometry], metadata={'geo': json.dumps(geo)})
+    geometry = geometry.with_metadata({'ARROW:extension:name': 'geoarrow.wkb', 'ARROW:extension:metadata': '{}'})
+    return pa.schema([*columns, geometry])
+
+
+def points_wkb(lng, lat):
+    """Array Arrow de pontos WKB montado direto dos buffers das coordenadas (nulo onde não há ponto)."""
+    lng = pa.array(lng, pa.float64())
+    lat = pa.array(lat, pa.float64())
+    points = np.empty(len(lng), dtype=_WKB_POINT)
+    points['order'] = 1
+    points['type'] = 1
+    points['x'] = lng.to_numpy(zero_copy_only=False)
+    points['y'] = lat.to_numpy(zero_copy_only=False)
+    wkb = pa.FixedSizeBinaryArray.from_buffers(pa.binary(_WKB_POINT.itemsize), len(points),
+                                               [None, pa.py_buffer(points)]).cast(pa.binary())
+    missing = pc.or_(lng.is_null(), lat.is_null())
+    if missing.true_count:
+        wkb = pc.if_else(missing, pa.scalar(None, pa.binary()), wkb)
+    return wkb
+
+
+def _copy_to(sql, stream):
+    """COPY ... TO STDOUT pela conexão DBAPI da sessão (psycopg2 ou psycopg 3)."""
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(sql, stream)
+        else:
+            with cursor.copy(sql) as copy:
+                for data in copy:
+                    stream.write(data)
+    finally:
+        cursor.close()
+
+
+def _literal_sql(query):
+    # O COPY não aceita parâmetros: os filtros (só números) vão embutidos no SQL
+    return str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def parse_copy_csv(stream):
+    """Tabela Arrow a partir do CSV de um COPY das colunas de leitura (`Item.read_columns`)."""
+    types = _arrow_types()
+    return pa_csv.read_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(column_names=list(types)),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=types,
+            strings_can_be_null=True,
+            # No CSV do COPY, NULL é vazio sem aspas e a string vazia é "". Só o vazio
+            # é nulo: os marcadores padrão do pyarrow ('NA', 'NULL', 'nan'...) são nomes válidos
+            null_values=[''],
+            quoted_strings_can_be_null=False
+        )
+    )
+
+
+def read_batches(params, batch_rows=EXPORT_BATCH_ROWS):
+    """
+    Tabelas Arrow com os itens filtrados, um lote por vez.
+
+    Cada lote é um `COPY (SELECT ... WHERE id > último ORDER BY id LIMIT n)
+    TO STDOUT` em CSV, convertido em colunas pelo leitor CSV do pyarrow:
+    as linhas não viram objetos Python em nenhum momento. A paginação
+    keyset usa a chave primária, então todo lote custa o mesmo.
+    """
+    base = Item.read_query(filtered_item_query(params), list(_arrow_types()))
+    after = None
+    while True:
+        query = base if after is None else base.filter(Item.id > after)
+        sql = _literal_sql(query.order_by(Item.id).limit(batch_rows))
+        buffer = io.BytesIO()
+        _copy_to(f'COPY ({sql}) TO STDOUT WITH (FORMAT csv)', buffer)
+        if not buffer.tell():
+            return
+        buffer.seek(0)
+        table = parse_copy_csv(buffer)
+        yield table
+        if table.num_rows < batch_rows:
+            return
+        after = table['id'][-1].as_py()
+
+
+def to_export_batch(table, schema):
+    """Lote lido (`read_batches`) nas colunas do schema exportado, com a geometria em WKB."""
+    geometry = points_wkb(table['longitude'], table['latitude'])
+    columns = [table[name] for name in schema.names if name != GEOMETRY_COLUMN]
+    return pa.Table.from_arrays([*columns, geometry], schema=schema)
+
+
+# --- Escrita -----------------------------------------------------------------
+
+class _ChunkSink(io.RawIOBase):
+    """Destino dos writers do pyarrow: acumula o que foi escrito até o próximo `drain`."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _open_writer(sink, schema, fmt):
+    if fmt == 'parquet':
+        return pq.ParquetWriter(sink, schema, compression='zstd')
+    return pa.ipc.new_stream(sink, schema)
+
+
+def _iter_arrow(params, fmt, batch_rows):
+    schema = export_schema(params.get('fields'), fmt)
+    sink = _ChunkSink()
+    writer = _open_writer(sink, schema, fmt)
+    try:
+        for table in read_batches(params, batch_rows):
+            # Um row group (Parquet) ou record batch (Arrow) por lote lido
+            writer.write_table(to_export_batch(table, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+# O PostGIS monta o arquivo inteiro, com o índice espacial (R-tree Hilbert) no início
+_FGB_SQL = "SELECT ST_AsFlatGeobuf(q, true, 'geom') FROM ({query}) AS q"
+
+
+def _iter_flatgeobuf(params):
+    columns = Item.read_columns()
+    fields = [name for name in params.get('fields') or columns if name not in ('latitude', 'longitude')]
+    # A coluna crua: selecionada pelo modelo, o GeoAlchemy a converteria para WKB (bytea)
+    geom = literal_column(f'{Item.__tablename__}.localizacao').label('geom')
+    query = filtered_item_query(params).with_entities(*[columns[name].label(name) for name in fields], geom)
+    data = db.session.execute(text(_FGB_SQL.format(query=_literal_sql(query.order_by(Item.id))))).scalar()
+    data = memoryview(data or b'')
+    for start in range(0, len(data), FGB_CHUNK_BYTES):
+        yield bytes(data[start:start + FGB_CHUNK_BYTES])
+
+
+def iter_export(params, fmt, batch_rows=EXPORT_BATCH_ROWS):
+    """
+    Corpo da exportação de itens no formato `fmt`, em pedaços de bytes.
+
+    `params` são os da listagem (`normalize_listing_args`): os filtros por
+    raio e bbox e os campos valem do mesmo jeito; a paginação é ignorada.
+    """
+    detect_export_format(fmt)
+    if fmt == 'fgb':
+        return _iter_flatgeobuf(params)
+    return _iter_arrow(params, fmt, batch_rows)
@@ -0,0 +1,135 @@
+import json
+import math
+from sqlalchemy import text
+from app.extensions import db
+
+GEOFENCE_MODES = ('ids', 'count')
+MAX_GEOFENCE_ZONES = 1000
+MAX_GEOFENCE_VERTICES = 200000
+# Vértices por pedaço no ST_Subdivide: polígonos grandes viram vários pedaços de bbox pequena
+SUBDIVIDE_MAX_VERTICES = 256
+
+# Todos os polígonos num único comando: o array de GeoJSON vira uma tabela (unnest WITH ORDINALITY),
+# cada polígono é corrigido e subdividido, e o ST_Intersects com os pontos usa o índice GiST.
+# Um ponto na linha de corte entre dois pedaços aparece duas vezes, por isso o DISTINCT.
+_ZONES_SQL = """
+WITH zonas AS (
+    SELECT z.idx, ST_Subdivide(
+               ST_CollectionExtract(ST_MakeValid(ST_SetSRID(ST_GeomFromGeoJSON(z.geojson), 4326)), 3),
+               :max_vertices
+           ) AS geom
+    FROM unnest(CAST(:geometries AS text[])) WITH ORDINALITY AS z(geojson, idx)
+)
+"""
+
+_IDS_SQL = _ZONES_SQL + """
+SELECT DISTINCT z.idx, i.id
+FROM zonas z
+JOIN items i ON ST_Intersects(i.localizacao, z.geom)
+ORDER BY z.idx, i.id
+"""
+
+_COUNT_SQL = _ZONES_SQL + """
+SELECT z.idx, count(DISTINCT i.id) AS total
+FROM zonas z
+JOIN items i ON ST_Intersects(i.localizacao, z.geom)
+GROUP BY z.idx
+"""
+
+
+def _ring_vertices(ring):
+    if not isinstance(ring, list) or len(ring) < 4:
+        raise ValueError("Cada anel do polígono precisa de pelo menos 4 posições")
+    for position in ring:
+        if not isinstance(position, list) or len(position) < 2:
+            raise ValueError("Posições do polígono devem ser [lng, lat]")
+        lng, lat = position[0], position[1]
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in (lng, lat)):
+            raise ValueError("Posições do polígono devem ser [lng, lat] numéricos")
+        if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+            raise ValueError("Coordenadas fora do intervalo (lat -90..90, lng -180..180)")
+    if ring[0][:2] != ring[-1][:2]:
+        raise ValueError("Cada anel do polígono precisa terminar na posição inicial")
+    return len(ring)
+
+
+def _polygon_vertices(geometry):
+    if not isinstance(geometry, dict) or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+        raise ValueError("Cada feature precisa de uma geometria Polygon ou MultiPolygon")
+    coordinates = geometry.get('coordinates')
+    polygons = [coordinates] if geometry['type'] == 'Polygon' else coordinates
+    if not isinstance(polygons, list) or not polygons:
+        raise ValueError("Geometria sem coordenadas")
+    total = 0
+    for rings in polygons:
+        if not isinstance(rings, list) or not rings:
+            raise ValueError("Polígono sem anéis")
+        total += sum(_ring_vertices(ring) for ring in rings)
+    return total
+
+
+def parse_geofence(data):
+    """
+    Zonas de um GeoJSON FeatureCollection de polígonos: lista de (id, geometria
+    em GeoJSON). O id é o `id` da feature, o `properties.id` ou a posição.
+    Levanta ValueError.
+    """
+    if not isinstance(data, dict) or data.get('type') != 'FeatureCollection':
+        raise ValueError("Envie um GeoJSON FeatureCollection de polígonos")
+    features = data.get('features')
+    if not isinstance(features, list) or not features:
+        raise ValueError("'features' deve ser uma lista não vazia")
+    if len(features) > MAX_GEOFENCE_ZONES:
+        raise ValueError(f"Máximo de {MAX_GEOFENCE_ZONES} polígonos por requisição")
+
+    zones = []
+    vertices = 0
+    for position, feature in enumerate(features):
+        if not isinstance(feature, dict):
+            raise ValueError(f"Feature {position}: deve ser um objeto")
+        try:
+            vertices += _polygon_vertices(feature.get('geometry'))
+        except ValueError as e:
+            raise ValueError(f"Feature {position}: {e}")
+        properties = feature.get('properties') or {}
+        zone_id = feature.get('id', properties.get('id', position) if isinstance(properties, dict) else position)
+        zones.append((zone_id, json.dumps(feature['geometry'])))
+    if vertices > MAX_GEOFENCE_VERTICES:
+        raise ValueError(f"Máximo de {MAX_GEOFENCE_VERTICES} vértices por requisição")
+    return zones
+
+
+def parse_geofence_mode(args):
+    mode = args.get('mode', 'ids')
+    if mode not in GEOFENCE_MODES:
+        raise ValueError(f"Modo desconhecido: '{mode}'. Opções: {', '.join(GEOFENCE_MODES)}")
+    return mode
+
+
+def geofence_rows(zones, mode='ids', yield_per=None):
+    """
+    Linhas (idx, id do item) ou (idx, total) do comando único, com `idx` a
+    posição da zona a partir de 1. Zonas sem itens não aparecem. Com
+    `yield_per` as linhas vêm de um cursor do servidor, em lotes.
+    """
+    statement = text(_IDS_SQL if mode == 'ids' else _COUNT_SQL)
+    if yield_per:
+        statement = statement.execution_options(yield_per=yield_per)
+    params = {'geometries': [geometry for _, geometry in zones], 'max_vertices': SUBDIVIDE_MAX_VERTICES}
+    return db.session.execute(statement, params)
+
+
+def assign_items(zones, mode='ids'):
+    """Resultado por zona, na ordem recebida: {'id', 'total'} e, no modo 'ids', os ids dos itens."""
+    results = [{'id': zone_id, 'total': 0} for zone_id, _ in zones]
+    if mode == 'ids':
+        for result in results:
+            result['itens'] = []
+        for row in geofence_rows(zones, mode):
+            results[row.idx - 1]['itens'].append(row.id)
+        for result in results:
+            result['total'] = len(result['itens'])
+    else:
+        for row in geofence_rows(zones, mode):
+            results[row.idx - 1]['total'] = row.total
+    return results
@@ -1,8 +1,159 @@
-from geoalchemy2.functions import ST_DWithin, ST_MakePoint
-from geoalchemy2.elements import WKTElement
+from sqlalchemy import text
+from app.extensions import db
+from app.models.item import Item
+from app.services.read_model import read_model
+
+
+def reference_point(lat, lng):
+    """Ponto de referência como geography (SRID 4326)"""
+    return db.func.geography(db.func.ST_SetSRID(db.func.ST_MakePoint(lng, lat), 4326))
+
+
+def radius_filter(lat, lng, raio_metros):
+    """
+    Predicado de busca por raio em metros.
+    A expressão `geography(localizacao)` é a mesma do índice GiST
+    `idx_items_localizacao_geog`, então o planner usa o índice em vez de
+    varrer a tabela inteira.
+    """
+    return db.func.ST_DWithin(
+        db.func.geography(Item.localizacao),
+        reference_point(lat, lng),
+        raio_metros
+    )
+
+
+def filtered_item_query(params):
+    """Consulta de itens com os filtros normalizados da listagem (ver `normalize_listing_args`)"""
+    query = Item.query
+    # Só aplica o filtro se os TRÊS parâmetros forem enviados
+    if params['radius'] is not None:
+        query = query.filter(radius_filter(params['lat'], params['lng'], params['radius']))
+
+    # Operador && compara bounding boxes e usa o índice espacial
+    if params['bbox']:
+        query = query.filter(Item.localizacao.op('&&')(db.func.ST_MakeEnvelope(*params['bbox'], 4326)))
+    return query
+
 
 def buscar_por_raio(lat, lng, raio_metros):
-    ponto = ST_MakePoint(lng, lat) 
-    return Item.query.filter(
-        ST_DWithin(Item.localizacao, ponto, raio_metros)
-    ).all()
\ No newline at end of file
+    return Item.query.filter(radius_filter(lat, lng, raio_metros)).all()
+
+
+# --- Vizinhos mais próximos (KNN) -------------------------------------------
+
+DEFAULT_K = 5
+MAX_K = 100
+MAX_NEAREST_BATCH = 1000
+# Com re-ranqueamento, candidatos buscados pelo índice para cada resultado pedido
+RERANK_FACTOR = 4
+
+# O índice devolve os candidatos pela ordem de <-> (graus); a posição de cada um (rank)
+# sai da distância geodésica dentro do LATERAL, e a ordem final usa esse rank: a ordem
+# do ORDER BY interno não sobrevive garantidamente à ordenação externa
+_NEAREST_SQL = """
+SELECT q.idx, n.id, n.nome, n.descricao, n.latitude, n.longitude, n.peso, n.distancia_m
+FROM (
+    SELECT u.idx, ST_SetSRID(ST_MakePoint(u.lng, u.lat), 4326) AS pt
+    FROM unnest(CAST(:lats AS double precision[]), CAST(:lngs AS double precision[]))
+         WITH ORDINALITY AS u(lat, lng, idx)
+) q
+CROSS JOIN LATERAL (
+    SELECT c.*, row_number() OVER (ORDER BY c.distancia_m, c.id) AS rank
+    FROM (
+        SELECT i.id, i.nome, i.descricao, ST_Y(i.localizacao) AS latitude, ST_X(i.localizacao) AS longitude,
+               i.peso, ST_Distance(geography(i.localizacao), geography(q.pt)) AS distancia_m
+        FROM items i
+        {where}
+        ORDER BY i.localizacao <-> q.pt
+        LIMIT :candidates
+    ) c
+) n
+ORDER BY q.idx, n.rank
+"""
+
+
+def parse_nearest_params(args):
+    """Valida k, max_distance e rerank (query string ou JSON). Levanta ValueError."""
+    try:
+        k = int(args.get('k', DEFAULT_K))
+        max_distance = args.get('max_distance')
+        max_distance = float(max_distance) if max_distance not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError("'k' e 'max_distance' devem ser numéricos")
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"'k' deve estar entre 1 e {MAX_K}")
+    if max_distance is not None and max_distance <= 0:
+        raise ValueError("'max_distance' deve ser maior que zero")
+    rerank = str(args.get('rerank', '1')).lower() not in ('0', 'false', 'no')
+    return {'k': k, 'max_distance': max_distance, 'rerank': rerank}
+
+
+def parse_point(data):
+    """(lat, lng) de um dict com 'lat'/'lng' (ou 'latitude'/'longitude'). Levanta ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Cada ponto precisa de 'lat' e 'lng' numéricos")
+    try:
+        lat = float(data['lat'] if 'lat' in data else data['latitude'])
+        lng = float(data['lng'] if 'lng' in data else data['longitude'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Cada ponto precisa de 'lat' e 'lng' numéricos")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("Coordenadas fora do intervalo (lat -90..90, lng -180..180)")
+    return lat, lng
+
+
+def buscar_mais_proximos(points, k=DEFAULT_K, max_distance=None, rerank=True):
+    """
+    Os `k` itens mais próximos de cada ponto (lat, lng), numa única consulta.
+
+    A ordenação usa o operador KNN `<->` sobre `localizacao`, então o índice
+    GiST devolve os candidatos já em ordem, sem calcular a distância de todos
+    os itens. Os candidatos saem sempre ordenados pela distância geodésica
+    (`ST_Distance` em geography), mas como `<->` compara graus, os `k` primeiros
+    do índice podem não ser os `k` mais próximos em metros: com `rerank` são
+    buscados `k * RERANK_FACTOR` candidatos e ficam os `k` primeiros.
+    `max_distance` (metros) usa `ST_DWithin` sobre o índice de geography.
+
+    Retorna uma lista por ponto, na ordem de `points`.
+    """
+    if not points:
+        return []
+    snapshot = read_model.snapshot()
+    if snapshot is not None:
+        return [_nearest_from_snapshot(snapshot, lat, lng, k, max_distance) for lat, lng in points]
+
+    where = ''
+    params = {
+        'lats': [float(lat) for lat, _ in points],
+        'lngs': [float(lng) for _, lng in points],
+        'candidates': k * RERANK_FACTOR if rerank else k
+    }
+    if max_distance is not None:
+        where = 'WHERE ST_DWithin(geography(i.localizacao), geography(q.pt), :max_distance)'
+        params['max_distance'] = max_distance
+
+    results = [[] for _ in points]
+    for row in db.session.execute(text(_NEAREST_SQL.format(where=where)), params):
+        results[row.idx - 1].append({
+            'id': row.id,
+            'nome': row.nome,
+            'descricao': row.descricao,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'peso': row.peso,
+            'distancia_m': round(row.distancia_m, 2)
+        })
+
+    if rerank:
+        results = [found[:k] for found in results]
+    return results
+
+
+def _nearest_from_snapshot(snapshot, lat, lng, k, max_distance):
+    # Sem rerank: a ordem do modelo em memória já é a da distância (grande círculo)
+    rows, distances = snapshot.nearest(lat, lng, k, max_distance)
+    return [
+        {**item, 'distancia_m': round(distance, 2)}
+        for item, distance in zip(snapshot.records(rows), distances.tolist())
+    ]
@@ -0,0 +1,119 @@
+import hashlib
+import json
+from sqlalchemy import text
+from app.extensions import db
+from app.services.result_cache import ResultCache
+from app.utils.pagination import decode_cursor, parse_bbox, parse_fields, parse_limit
+
+# Casas decimais na chave: 5 casas de grau são ~1 m, abaixo do erro de um GPS de celular
+COORD_DECIMALS = 5
+RADIUS_DECIMALS = 1
+BBOX_DECIMALS = 6
+
+listing_cache = ResultCache('listing')
+
+
+def _float_arg(args, name):
+    # Mesmo comportamento de request.args.get(name, type=float): inválido conta como ausente
+    try:
+        return float(args.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_listing_args(args, allowed_fields):
+    """
+    Parâmetros do GET /items/ normalizados: coordenadas e raio arredondados,
+    campos e paginação validados. O resultado é a chave do cache e também o
+    que monta a consulta, então requisições com a mesma chave leem os mesmos
+    itens. Levanta ValueError.
+    """
+    lat, lng, radius = (_float_arg(args, name) for name in ('lat', 'lng', 'radius'))
+    bbox = parse_bbox(args.get('bbox'))
+    cursor = decode_cursor(args.get('cursor'))
+    paginate = 'limit' in args or cursor is not None
+    # O filtro por raio só vale com os três parâmetros
+    has_radius = all(v is not None for v in (lat, lng, radius))
+    return {
+        'lat': round(lat, COORD_DECIMALS) if has_radius else None,
+        'lng': round(lng, COORD_DECIMALS) if has_radius else None,
+        'radius': round(radius, RADIUS_DECIMALS) if has_radius else None,
+        'bbox': [round(v, BBOX_DECIMALS) for v in bbox] if bbox else None,
+        'fields': parse_fields(args.get('fields'), allowed_fields),
+        'cursor': cursor,
+        'limit': parse_limit(args.get('limit')) if paginate else None
+    }
+
+
+def listing_version():
+    """
+    Versão da listagem: contador do banco (`items_version`, incrementado pelo
+    trigger a cada comando em items, venha a escrita da API, do `manage.py
+    load_items`, de SQL direto ou de outra instância) e versão local dos
+    caches, que muda quando este processo recebe o aviso da escrita (o modelo
+    de leitura só reflete a escrita depois disso).
+    """
+    counter = db.session.execute(text('SELECT version FROM items_version')).scalar()
+    return f'{counter}.{listing_cache.version()}'
+
+
+def make_etag(version, params):
+    """
+    ETag da listagem: versão do conjunto de itens + hash dos parâmetros
+    normalizados. Não depende do corpo, então um If-None-Match igual é
+    respondido sem ler os itens nem o cache, qualquer que seja o tamanho da
+    resposta, e nenhuma resposta grande paga a serialização extra do hash.
+    É forte: a listagem sai sempre ordenada por id, então a mesma versão e
+    os mesmos parâmetros produzem o mesmo corpo.
+    """
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=list).encode()).hexdigest()
+    return f'v{version}-{digest[:24]}'
+
+
+def get_listing(params, compute, max_rows=None, version=None):
+    """
+    Resposta da listagem para `params`: ({'etag', 'body', 'headers'}, hit).
+
+    `compute()` devolve (body, headers) lendo o banco. Respostas com mais de
+    `max_rows` itens não são guardadas (mas ganham ETag do mesmo jeito).
+    `version` é a versão lida antes (a mesma da ETag conferida, ver
+    `listing_version()`); sem ela vale só a versão local dos caches.
+    """
+    version = listing_cache.version() if version is None else version
+    key = listing_cache.make_key(params, version)
+    entry = listing_cache.get(key)
+    if entry is not None:
+        return entry, True
+
+    body, headers = compute()
+    entry = {'etag': make_etag(version, params), 'body': body, 'headers': headers}
+    if max_rows is None or len(body) <= max_rows:
+        listing_cache.set(key, entry)
+    return entry, False
+
+
+# Contador por comando (não por linha) numa tabela de uma linha: é transacional,
+# então uma leitura só enxerga a versão nova junto com os dados já gravados
+_VERSION_SQL = (
+    'CREATE TABLE IF NOT EXISTS items_version ('
+    'id boolean PRIMARY KEY DEFAULT true CHECK (id), version bigint NOT NULL DEFAULT 0)',
+    'INSERT INTO items_version (id) VALUES (true) ON CONFLICT DO NOTHING',
+    """
+CREATE OR REPLACE FUNCTION items_bump_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE items_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    'CREATE OR REPLACE TRIGGER items_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON items '
+    'FOR EACH STATEMENT EXECUTE FUNCTION items_bump_version()'
+)
+
+
+def install_version_trigger():
+    """Cria (ou atualiza) a tabela `items_version` e o trigger que a incrementa a cada escrita em items."""
+    # Um comando por execute: nem todo driver aceita vários comandos numa chamada
+    for statement in _VERSION_SQL:
+        db.session.execute(text(statement))
+    db.session.commit()
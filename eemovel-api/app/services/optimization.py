@@ -0,0 +1,346 @@
+import hashlib
+import json
+import math
+import time
+import numpy as np
+from app.extensions import db
+from app.models.item import Item
+from app.models.route_solution import RouteSolution
+from app.services.partitioning import solve_partitioned
+from app.services.read_model import read_model
+from app.utils.cvrp import DEFAULT_TIME_BUDGET, MAX_TIME_BUDGET
+from app.utils.distance import as_lonlat_array, project_local, path_length
+from app.utils.distance_providers import get_provider
+from app.utils.incremental import insert_items, two_opt
+from app.utils.metrics import timed
+from app.utils.partition import DEFAULT_METHOD, MAX_PARTITIONS, PARTITIONERS
+from app.utils.route_engines import get_engine
+
+_EPS = 1e-9
+
+
+class OverweightItemError(ValueError):
+    """Um item pesa mais que a capacidade do veículo e não cabe em nenhuma viagem."""
+
+
+def parse_optimize_params(args):
+    """
+    Valida os parâmetros de otimização da query string (ou de um JSON).
+    Levanta ValueError com a mensagem para o cliente.
+    """
+    engine = get_engine(args.get('engine'))
+    provider = get_provider(args.get('distance'))
+    provider.check()
+    # Nas engines com depósito a capacidade é em peso e pode ser fracionária
+    try:
+        capacity = (float if engine.uses_depot else int)(args.get('capacity', 3))
+        time_budget = float(args.get('time_budget', DEFAULT_TIME_BUDGET))
+        depot_lat = args.get('depot_lat')
+        depot_lng = args.get('depot_lng')
+        depot_lat = float(depot_lat) if depot_lat not in (None, '') else None
+        depot_lng = float(depot_lng) if depot_lng not in (None, '') else None
+        partitions = int(args.get('partitions', 1))
+    except (TypeError, ValueError):
+        raise ValueError("Parâmetros numéricos inválidos")
+
+    if not math.isfinite(capacity) or capacity <= 0:
+        raise ValueError("'capacity' deve ser maior que zero")
+    if not 0 <= time_budget <= MAX_TIME_BUDGET:
+        raise ValueError(f"'time_budget' deve estar entre 0 e {MAX_TIME_BUDGET} segundos")
+    if (depot_lat is None) != (depot_lng is None):
+        raise ValueError("Informe 'depot_lat' e 'depot_lng' juntos")
+    if not 1 <= partitions <= MAX_PARTITIONS:
+        raise ValueError(f"'partitions' deve estar entre 1 e {MAX_PARTITIONS}")
+    partition_method = args.get('partition_method') or DEFAULT_METHOD
+    if partition_method not in PARTITIONERS:
+        raise ValueError(f"Particionamento desconhecido: '{partition_method}'. Opções: {', '.join(sorted(PARTITIONERS))}")
+
+    return {
+        'engine': engine.name,
+        'capacity': capacity,
+        'depot': (depot_lng, depot_lat) if depot_lat is not None else None,
+        'time_budget': time_budget,
+        'distance': provider.name,
+        'partitions': partitions,
+        'partition_method': partition_method
+    }
+
+
+MODES = ('full', 'incremental')
+
+
+def parse_optimize_mode(args):
+    """Modo da otimização: 'full' (padrão) refaz as viagens; 'incremental' parte da última solução."""
+    mode = args.get('mode') or 'full'
+    if mode not in MODES:
+        raise ValueError(f"Modo desconhecido: '{mode}'. Opções: {', '.join(MODES)}")
+    return mode
+
+
+def check_item_weights(items, engine=None, capacity=3):
+    """
+    Nas engines com depósito a capacidade é em peso: um item mais pesado que
+    ela não cabe em nenhuma viagem. Levanta OverweightItemError.
+    """
+    if not get_engine(engine).uses_depot or not items:
+        return
+    heaviest = max(items, key=lambda item: item['peso'])
+    if heaviest['peso'] > capacity + _EPS:
+        raise OverweightItemError(
+            f"O item {heaviest['id']} pesa {heaviest['peso']}, mais que a capacidade ({capacity})"
+        )
+
+
+def load_items_for_optimization():
+    """Itens como dicts, lidos do modelo em memória (se ativo) ou pelo caminho rápido (sem hidratação ORM)"""
+    with timed('leitura_itens'):
+        snapshot = read_model.snapshot()
+        if snapshot is not None:
+            return snapshot.records(snapshot.all_rows())
+        return [row.to_dict() for row in Item.read_rows()]
+
+
+def _matrix_length(matrix, path):
+    return float(sum(matrix[a][b] for a, b in zip(path, path[1:])))
+
+
+def _empty_result():
+    return {
+        'message': 'Nenhum item encontrado no banco para otimização',
+        'resumo': {'total_itens': 0, 'viagens_geradas': 0},
+        'trips': []
+    }
+
+
+def _prepare(items, engine, provider, depot):
+    """Coordenadas (lon/lat e projetadas em metros), depósito e, fora da linha reta, a matriz de distâncias."""
+    with timed('projecao'):
+        lonlat = as_lonlat_array([(item['longitude'], item['latitude']) for item in items])
+        origin_lat = float(lonlat[:, 1].mean())
+
+        if engine.uses_depot:
+            depot = tuple(depot) if depot else tuple(float(v) for v in lonlat.mean(axis=0))
+        else:
+            depot = None
+        # Em metros, não em graus como a heurística original: lá um grau de longitude valia
+        # o mesmo que um de latitude, e o vizinho mais próximo podia ser outro
+        coords = project_local(lonlat, origin_lat).tolist()
+        depot_xy = tuple(project_local([depot], origin_lat)[0]) if depot else None
+
+    matrix = None
+    if not provider.straight_line:
+        with timed(f'matriz_{provider.name}'):
+            ids = [item.get('id') for item in items]
+            matrix = provider.matrix([*lonlat, depot] if depot else lonlat, [*ids, None] if depot else ids)
+    return lonlat, coords, depot, depot_xy, matrix
+
+
+def _summarize(items, trips_idx, engine, provider, capacity, lonlat, depot, matrix):
+    with timed('distancias'):
+        all_trips = [[items[i] for i in trip] for trip in trips_idx]
+        # Com depósito, a distância da viagem inclui a ida e a volta
+        if matrix is not None:
+            depot_idx = len(items)
+            trip_distances = [
+                round(_matrix_length(matrix, [depot_idx, *trip, depot_idx] if depot else trip), 2)
+                for trip in trips_idx
+            ]
+        else:
+            trip_distances = [
+                round(path_length([depot, *lonlat[trip], depot] if depot else lonlat[trip]), 2)
+                for trip in trips_idx
+            ]
+        trip_loads = [sum(items[i]['peso'] for i in trip) for trip in trips_idx]
+
+    return {
+        'status': 'sucesso',
+        'resumo': {
+            'total_itens': len(items),
+            'capacidade': capacity,
+            'engine': engine.name,
+            'distancia': provider.name,
+            'viagens_geradas': len(all_trips),
+            'distancia_total_m': round(sum(trip_distances), 2),
+            'distancia_por_viagem_m': trip_distances,
+            'carga_por_viagem': trip_loads,
+            'deposito': {'latitude': depot[1], 'longitude': depot[0]} if depot else None
+        },
+        'trips': all_trips
+    }
+
+
+def solve_optimization(items, engine=None, capacity=3, depot=None, time_budget=DEFAULT_TIME_BUDGET, distance=None,
+                       partitions=1, partition_method=None):
+    """
+    Monta as viagens e o resumo da resposta do /items/optimize.
+    Não depende do banco, então pode rodar num processo separado (as fases
+    só são medidas dentro de uma requisição amostrada).
+
+    `distance` escolhe o provedor de distâncias (ver `distance_providers`):
+    fora da linha reta, as engines recebem a matriz de distâncias dos itens
+    (e do depósito, na última posição).
+
+    Com `partitions` > 1 os itens são divididos em regiões resolvidas em
+    paralelo (ver `solve_partitioned`), e o resumo ganha `particionamento`.
+
+    Levanta OverweightItemError se um item não cabe sozinho numa viagem
+    (ver `check_item_weights`).
+    """
+    engine = get_engine(engine)
+    provider = get_provider(distance)
+
+    if not items:
+        return _empty_result()
+    check_item_weights(items, engine.name, capacity)
+
+    lonlat, coords, depot, depot_xy, matrix = _prepare(items, engine, provider, depot)
+
+    demands = [item['peso'] for item in items]
+    if partitions > 1 and len(items) > partitions:
+        with timed(f'solver_{engine.name}_particionado'):
+            trips_idx, info = solve_partitioned(
+                engine, coords, capacity, demands=demands, depot=depot_xy, time_budget=time_budget,
+                distances=matrix, partitions=partitions, method=partition_method
+            )
+        result = _summarize(items, trips_idx, engine, provider, capacity, lonlat, depot, matrix)
+        result['resumo']['particionamento'] = info
+        return result
+
+    # Otimização via engine plugável, sobre coordenadas projetadas em metros
+    with timed(f'solver_{engine.name}'):
+        trips_idx = engine.build_trips(
+            coords,
+            capacity,
+            demands=demands,
+            depot=depot_xy,
+            time_budget=time_budget,
+            distances=matrix
+        )
+
+    return _summarize(items, trips_idx, engine, provider, capacity, lonlat, depot, matrix)
+
+
+# --- Modo incremental -------------------------------------------------------
+
+def _fingerprint(item):
+    # Posição e peso: se mudarem, o item é tratado como removido e reinserido
+    return [item['longitude'], item['latitude'], item['peso']]
+
+
+def snapshot_solution(items, result):
+    """Solução em formato persistível: viagens (ids), estado de cada item e depósito."""
+    deposito = result['resumo'].get('deposito')
+    return {
+        'viagens': [[item['id'] for item in trip] for trip in result['trips']],
+        'itens': [[item['id'], *_fingerprint(item)] for item in items],
+        'deposito': [deposito['longitude'], deposito['latitude']] if deposito else None
+    }
+
+
+def _solution_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=list).encode()).hexdigest()
+
+
+def load_solution(params):
+    """Última solução salva para estes parâmetros, ou None."""
+    row = db.session.get(RouteSolution, _solution_key(params))
+    return row.solucao if row else None
+
+
+def save_solution(params, solution):
+    """Guarda a solução como base da próxima otimização incremental com os mesmos parâmetros."""
+    db.session.merge(RouteSolution(chave=_solution_key(params), parametros=params, solucao=solution))
+    db.session.commit()
+
+
+def reoptimize(items, previous, engine=None, capacity=3, depot=None, time_budget=DEFAULT_TIME_BUDGET, distance=None,
+               partitions=1, partition_method=None):
+    """
+    Atualiza a solução anterior (`snapshot_solution`) em vez de refazer tudo.
+
+    Itens removidos (ou que mudaram de posição/peso) saem das viagens; os
+    novos entram por inserção mais barata nas viagens com capacidade
+    sobrando, e os que não couberem formam viagens novas pela engine. Só as
+    viagens alteradas passam pela busca local (2-opt), limitada a
+    `time_budget` segundos. As demais viagens ficam exatamente como estavam.
+    Sem solução anterior, faz a otimização completa (particionada, se
+    pedido); com ela, o particionamento não se aplica.
+    Levanta OverweightItemError como `solve_optimization`.
+    """
+    engine = get_engine(engine)
+    provider = get_provider(distance)
+
+    if not items:
+        return _empty_result()
+    check_item_weights(items, engine.name, capacity)
+    if not previous:
+        result = solve_optimization(items, engine.name, capacity, depot, time_budget, provider.name,
+                                    partitions, partition_method)
+        result['resumo']['incremental'] = {'solucao_anterior': False}
+        return result
+
+    # O depósito padrão (centro dos itens) muda com os itens: mantém o da solução anterior
+    depot = depot or previous.get('deposito')
+    lonlat, coords, depot, depot_xy, matrix = _prepare(items, engine, provider, depot)
+    n = len(items)
+
+    index = {item['id']: i for i, item in enumerate(items)}
+    before = {row[0]: row[1:] for row in previous['itens']}
+    kept = {i for item_id, i in index.items() if before.get(item_id) == _fingerprint(items[i])}
+
+    trips = []
+    touched = set()
+    removed = 0
+    for trip in previous['viagens']:
+        remaining = [index[item_id] for item_id in trip if index.get(item_id) in kept]
+        removed += len(trip) - len(remaining)
+        if remaining:
+            if len(remaining) != len(trip):
+                touched.add(len(trips))
+            trips.append(remaining)
+    added = [i for i in range(n) if i not in kept]
+
+    if matrix is not None:
+        symmetric = ((matrix + matrix.T) / 2).tolist()
+        dist = lambda i, j: symmetric[i][j]
+    else:
+        points = coords + [depot_xy]
+        dist = lambda i, j: math.hypot(points[i][0] - points[j][0], points[i][1] - points[j][1])
+    # Nas engines com depósito a capacidade é em peso; nas demais, em número de itens
+    demands = [item['peso'] for item in items] if engine.uses_depot else [1] * n
+    depot_idx = n if depot else None
+
+    with timed('insercao'):
+        leftovers, inserted = insert_items(trips, added, dist, demands, capacity, depot_idx)
+        touched |= inserted
+
+    created = set()
+    if leftovers:
+        with timed(f'solver_{engine.name}'):
+            nodes = leftovers + ([n] if depot else [])
+            new_trips = engine.build_trips(
+                [coords[i] for i in leftovers],
+                capacity,
+                demands=[items[i]['peso'] for i in leftovers],
+                depot=depot_xy,
+                time_budget=time_budget,
+                distances=matrix[np.ix_(nodes, nodes)] if matrix is not None else None
+            )
+        for trip in new_trips:
+            created.add(len(trips))
+            trips.append([leftovers[i] for i in trip])
+
+    if time_budget and touched:
+        with timed('busca_local'):
+            deadline = time.perf_counter() + time_budget
+            for t in sorted(touched):
+                two_opt(trips[t], dist, deadline, depot_idx)
+
+    result = _summarize(items, trips, engine, provider, capacity, lonlat, depot, matrix)
+    result['resumo']['incremental'] = {
+        'solucao_anterior': True,
+        'inseridos': len(added),
+        'removidos': removed,
+        'viagens_alteradas': len(touched | created)
+    }
+    return result
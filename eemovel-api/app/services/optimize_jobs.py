@@ -0,0 +1,244 @@
+import atexit
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import deque
+from app.services.optimization import solve_optimization
+from app.services.partitioning import partition_pool
+from app.utils.distance_providers import CONFIG_KEYS as DISTANCE_CONFIG_KEYS, configure_providers
+
+# Estados de um job
+PENDING = 'pendente'
+RUNNING = 'executando'
+DONE = 'concluido'
+FAILED = 'erro'
+CANCELLED = 'cancelado'
+EXPIRED = 'expirado'
+FINISHED = (DONE, FAILED, CANCELLED, EXPIRED)
+
+
+class QueueFullError(Exception):
+    """A fila de otimizações atingiu o limite configurado."""
+
+
+def _run_job(conn, params, config):
+    """Executado no processo filho: resolve e devolve o resultado pelo pipe."""
+    try:
+        # O filho não tem o app Flask: a configuração dos provedores de distância vem junto
+        configure_providers(config)
+        partition_pool.configure(config)
+        conn.send((DONE, solve_optimization(**params)))
+    except Exception as e:
+        conn.send((FAILED, str(e)))
+    finally:
+        # O filho sai sem o atexit do concurrent.futures: sem isso, a saída esperaria os workers ociosos
+        partition_pool.shutdown()
+        conn.close()
+
+
+class OptimizationJob:
+    def __init__(self, params, owner, timeout):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.total_items = len(params['items'])
+        self.owner = owner
+        self.timeout = timeout
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.conn = None
+
+    def to_dict(self, include_result=True):
+        now = time.time()
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'engine': self.params.get('engine'),
+            'total_itens': self.total_items,
+            'criado_em': self.created_at,
+            'iniciado_em': self.started_at,
+            'finalizado_em': self.finished_at,
+            'tempo_na_fila_s': round((self.started_at or now) - self.created_at, 3),
+            'tempo_execucao_s': round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+            'timeout_s': self.timeout
+        }
+        if self.error:
+            data['erro'] = self.error
+        if include_result and self.status == DONE:
+            data['resultado'] = self.result
+        return data
+
+
+class OptimizationJobs:
+    """
+    Fila de otimizações assíncronas executadas em processos separados.
+
+    Cada job roda num processo próprio (limitado a `max_workers` simultâneos),
+    o que permite cancelar ou encerrar por timeout um solve em andamento sem
+    afetar os demais. O estado fica na memória do processo web.
+    """
+
+    def __init__(self, app=None):
+        self.max_workers = 2
+        self.max_pending = 20
+        self.default_timeout = 300
+        self.retention = 3600
+        self._jobs = {}
+        self._queue = deque()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._config = {}
+        self._ctx = self._make_context()
+        if app is not None:
+            self.init_app(app)
+
+    @staticmethod
+    def _make_context():
+        # forkserver: os filhos nascem de um processo limpo (sem as threads e
+        # conexões do servidor web) e com o solver já importado
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context('forkserver')
+            ctx.set_forkserver_preload(['app.services.optimization'])
+            return ctx
+        return multiprocessing.get_context('spawn')
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('OPTIMIZE_MAX_WORKERS', self.max_workers)
+        self.max_pending = app.config.get('OPTIMIZE_MAX_PENDING', self.max_pending)
+        self.default_timeout = app.config.get('OPTIMIZE_JOB_TIMEOUT', self.default_timeout)
+        self.retention = app.config.get('OPTIMIZE_JOB_RETENTION', self.retention)
+        self._config = {key: app.config.get(key) for key in (*DISTANCE_CONFIG_KEYS, 'OPTIMIZE_PARTITION_WORKERS')}
+        app.extensions['optimization_jobs'] = self
+        atexit.register(self.shutdown)
+
+    def submit(self, params, owner=None, timeout=None):
+        """Enfileira um solve; `params` são os argumentos de `solve_optimization`."""
+        with self._lock:
+            self._purge()
+            if len(self._queue) >= self.max_pending:
+                raise QueueFullError(f"Fila de otimização cheia ({self.max_pending} jobs pendentes)")
+            job = OptimizationJob(params, owner, min(timeout or self.default_timeout, self.default_timeout))
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._ensure_dispatcher()
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancela um job pendente ou em execução (o processo é encerrado)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            if job.status == PENDING:
+                self._queue.remove(job)
+            else:
+                self._stop(job)
+            self._finish(job, CANCELLED)
+            return job
+
+    def shutdown(self):
+        """Encerra os jobs em execução (chamado na saída do processo web)."""
+        with self._lock:
+            for job in list(self._running):
+                self._stop(job)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pendentes': len(self._queue),
+                'executando': len(self._running),
+                'max_workers': self.max_workers,
+                'max_pendentes': self.max_pending
+            }
+
+    # --- Despacho ---------------------------------------------------------
+
+    def _ensure_dispatcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch_loop, name='optimization-jobs', daemon=True)
+            self._thread.start()
+
+    def _dispatch_loop(self):
+        while True:
+            self._wakeup.wait(timeout=0.1)
+            self._wakeup.clear()
+            with self._lock:
+                self._collect()
+                self._start_pending()
+
+    def _start_pending(self):
+        while self._queue and len(self._running) < self.max_workers:
+            job = self._queue.popleft()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                parent_conn, child_conn = self._ctx.Pipe(duplex=False)
+                # Não daemon: o job pode abrir o pool do solve particionado (ver shutdown)
+                job.process = self._ctx.Process(target=_run_job, args=(child_conn, job.params, self._config))
+                job.process.start()
+                child_conn.close()
+            except Exception as e:
+                job.error = f'Falha ao iniciar o processo de otimização: {e}'
+                self._finish(job, FAILED)
+                continue
+            job.conn = parent_conn
+            self._running.add(job)
+
+    def _collect(self):
+        now = time.time()
+        for job in list(self._running):
+            if job.conn.poll():
+                try:
+                    status, payload = job.conn.recv()
+                except EOFError:
+                    status, payload = FAILED, 'O processo de otimização terminou sem resultado'
+                job.process.join(timeout=1)
+                if status == DONE:
+                    job.result = payload
+                else:
+                    job.error = payload
+                self._finish(job, status)
+            elif not job.process.is_alive():
+                job.error = f'O processo de otimização terminou inesperadamente (código {job.process.exitcode})'
+                self._finish(job, FAILED)
+            elif now - job.started_at > job.timeout:
+                self._stop(job)
+                job.error = f'Tempo limite de {job.timeout}s excedido'
+                self._finish(job, EXPIRED)
+
+    def _stop(self, job):
+        if job.process is not None and job.process.is_alive():
+            job.process.terminate()
+            job.process.join(timeout=1)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        if job.conn is not None:
+            job.conn.close()
+            job.conn = None
+        job.process = None
+        # Os itens não são mais necessários depois do solve
+        job.params.pop('items', None)
+        self._running.discard(job)
+
+    def _purge(self):
+        """Remove jobs finalizados há mais de `retention` segundos."""
+        limit = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.status in FINISHED and j.finished_at < limit]:
+            del self._jobs[job_id]
+
+
+optimization_jobs = OptimizationJobs()
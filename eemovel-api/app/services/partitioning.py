@@ -0,0 +1,184 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import wait
+import numpy as np
+from app.utils.cvrp import DEFAULT_TIME_BUDGET
+from app.utils.partition import DEFAULT_METHOD, partition
+from app.utils.route_engines import get_engine
+
+# Viagens com carga abaixo desta fração da capacidade são refeitas na costura
+REPAIR_FILL = 0.75
+# Fração do time_budget reservada para a costura das bordas
+REPAIR_BUDGET_SHARE = 0.2
+
+
+def _exit_with_parent():
+    """Inicializador dos workers: encerra o worker se o processo que criou o pool morrer (ex.: job cancelado)."""
+    parent = multiprocessing.parent_process()
+    if parent is None:
+        return
+
+    def watch():
+        wait([parent.sentinel])
+        os._exit(1)
+
+    threading.Thread(target=watch, name='partition-parent-watch', daemon=True).start()
+
+
+def _solve_region(engine_name, coords, demands, capacity, depot, time_budget, distances):
+    """Executado num worker: viagens (índices locais) de uma região."""
+    return get_engine(engine_name).build_trips(
+        coords.tolist(),
+        capacity,
+        demands=demands.tolist(),
+        depot=depot,
+        time_budget=time_budget,
+        distances=distances
+    )
+
+
+class PartitionPool:
+    """
+    Pool de processos que resolve as regiões de uma otimização particionada.
+
+    Criado no primeiro uso e reaproveitado entre solves. Cada região viaja
+    para o worker como arrays NumPy compactos (coordenadas projetadas,
+    demandas e, fora da linha reta, a submatriz de distâncias). Com um
+    único worker as regiões são resolvidas no próprio processo.
+    """
+
+    def __init__(self):
+        self.max_workers = os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+        app.extensions['partition_pool'] = self
+
+    def configure(self, config):
+        with self._lock:
+            self.max_workers = config.get('OPTIMIZE_PARTITION_WORKERS') or os.cpu_count() or 1
+            self._shutdown(wait=False)
+
+    @staticmethod
+    def _make_context():
+        # Mesmo contexto dos jobs (optimize_jobs): workers limpos e com o solver já importado
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context('forkserver')
+            ctx.set_forkserver_preload(['app.services.optimization'])
+            return ctx
+        return multiprocessing.get_context('spawn')
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=self._make_context(), initializer=_exit_with_parent
+                )
+            return self._executor
+
+    def _shutdown(self, wait):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self):
+        """Encerra os workers (o próximo solve particionado recria o pool)."""
+        with self._lock:
+            self._shutdown(wait=True)
+
+    def workers_for(self, tasks):
+        return max(1, min(self.max_workers, tasks))
+
+    def map(self, fn, tasks):
+        """Aplica `fn(*task)` a cada tarefa, em paralelo quando houver mais de um worker."""
+        if self.workers_for(len(tasks)) == 1:
+            return [fn(*task) for task in tasks]
+        executor = self._get_executor()
+        try:
+            return list(executor.map(fn, *zip(*tasks)))
+        except BrokenProcessPool:
+            # Um worker morreu: o próximo solve recria o pool
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+
+partition_pool = PartitionPool()
+
+
+def _submatrix(distances, nodes):
+    return None if distances is None else np.ascontiguousarray(distances[np.ix_(nodes, nodes)])
+
+
+def solve_partitioned(engine, coords, capacity, demands=None, depot=None, time_budget=DEFAULT_TIME_BUDGET,
+                      distances=None, partitions=2, method=None, pool=None):
+    """
+    Otimização particionada para conjuntos grandes de itens.
+
+    Os pontos (array n x 2, em metros) são divididos em `partitions` regiões
+    (ver `app.utils.partition`: setores em volta do depósito, k-means ou
+    grade) e cada região é resolvida pela engine num worker do `pool`.
+    Na costura, as viagens pouco cheias (as que sobram onde uma região
+    termina) são desfeitas e os itens delas são roteirizados juntos, o que
+    junta as pontas de regiões vizinhas em viagens cheias.
+
+    `distances` segue o formato das engines (depósito na última posição).
+    Retorna (viagens com índices globais, resumo do particionamento).
+    """
+    engine = get_engine(engine) if isinstance(engine, str) or engine is None else engine
+    pool = pool or partition_pool
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    demands = np.ones(n) if demands is None else np.asarray(demands, dtype=np.float64)
+    depot = tuple(depot) if depot is not None else None
+    # Nas engines sem depósito a capacidade é em número de itens
+    loads_of = demands if engine.uses_depot else np.ones(n)
+
+    regions = partition(coords, partitions, method, center=depot, weights=loads_of)
+    workers = pool.workers_for(len(regions))
+    # As regiões dividem o tempo de melhoria quando há menos workers do que regiões
+    region_budget = time_budget * (1 - REPAIR_BUDGET_SHARE) * min(1.0, workers / max(len(regions), 1))
+
+    tasks = []
+    for region in regions:
+        nodes = [*region, n] if depot is not None and distances is not None else region
+        tasks.append((engine.name, coords[region], demands[region], capacity, depot, region_budget,
+                      _submatrix(distances, nodes)))
+    trips = [
+        [int(region[i]) for i in trip]
+        for region, region_trips in zip(regions, pool.map(_solve_region, tasks))
+        for trip in region_trips
+    ]
+
+    # Costura: refaz juntas as viagens pouco cheias de todas as regiões
+    threshold = REPAIR_FILL * capacity
+    kept, loose = [], []
+    for trip in trips:
+        if loads_of[trip].sum() < threshold:
+            loose.extend(trip)
+        else:
+            kept.append(trip)
+    rebuilt = []
+    if len(regions) > 1 and loose:
+        loose = np.array(loose)
+        nodes = [*loose, n] if depot is not None and distances is not None else loose
+        rebuilt = [
+            [int(loose[i]) for i in trip]
+            for trip in _solve_region(engine.name, coords[loose], demands[loose], capacity, depot,
+                                      time_budget * REPAIR_BUDGET_SHARE, _submatrix(distances, nodes))
+        ]
+    else:
+        kept = trips
+
+    return kept + rebuilt, {
+        'regioes': len(regions),
+        'metodo': method or DEFAULT_METHOD,
+        'workers': workers,
+        'viagens_refeitas': len(rebuilt)
+    }
@@ -0,0 +1,514 @@
+import logging
+import math
+import re
+import select
+import threading
+import time
+from array import array
+import numpy as np
+from sqlalchemy import text
+from app.extensions import db
+from app.models.item import Item
+from app.services.result_cache import ITEM_CHANGE_LISTENERS, invalidate_item_caches
+from app.utils.distance import EARTH_RADIUS_M, haversine
+from app.utils.spatial_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+# Campos de leitura, na ordem de `Item.read_columns`
+READ_FIELDS = ('id', 'nome', 'descricao', 'latitude', 'longitude', 'peso')
+
+DEFAULT_CHANNEL = 'items_changed'
+# Acima disso o trigger manda só 'reload' (o payload do NOTIFY vai até 8000 bytes)
+NOTIFY_MAX_IDS = 500
+# Com mais ids pendentes que isso, a próxima sincronização é uma recarga completa
+MAX_INCREMENTAL_IDS = 5000
+# Linhas fora da grade (acrescentadas ou removidas depois da montagem) que disparam a compactação
+REINDEX_FRACTION = 0.05
+REINDEX_MIN_ROWS = 1024
+LOAD_BATCH_ROWS = 50000
+# Espera entre tentativas de carga ou de reconexão do LISTEN
+RETRY_SECONDS = 10
+LISTEN_TIMEOUT = 5
+
+# Metros por grau de latitude na esfera
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+class StringPool:
+    """
+    Textos dos itens concatenados em UTF-8 num único buffer; cada texto é o
+    trecho entre duas posições de `_offsets` e é identificado pelo índice
+    (o código). Só cresce, para que as fotografias antigas continuem
+    válidas; a compactação de uma fotografia monta um pool novo (`compact`).
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array('q', [0])
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self):
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+    def add(self, value):
+        """Código de `value` (-1 para NULL)."""
+        if value is None:
+            return -1
+        with self._lock:
+            self._data.extend(value.encode('utf-8'))
+            self._offsets.append(len(self._data))
+            return len(self._offsets) - 2
+
+    def intern(self, values):
+        """Códigos (int32) de vários textos; os repetidos ocupam o buffer uma vez só."""
+        seen = {}
+        codes = np.empty(len(values), dtype=np.int32)
+        for position, value in enumerate(values):
+            code = seen.get(value)
+            if code is None:
+                code = seen[value] = self.add(value)
+            codes[position] = code
+        return codes
+
+    def get(self, code):
+        if code < 0:
+            return None
+        return self._data[self._offsets[code]:self._offsets[code + 1]].decode('utf-8')
+
+    def compact(self, *code_arrays):
+        """
+        Pool novo só com os textos usados em `code_arrays`, e os arrays de
+        códigos remapeados para ele (os bytes são copiados sem decodificar).
+        """
+        used = np.unique(np.concatenate([codes[codes >= 0] for codes in code_arrays] or [np.empty(0, np.int32)]))
+        pool = StringPool()
+        for code in used.tolist():
+            pool._data.extend(self._data[self._offsets[code]:self._offsets[code + 1]])
+            pool._offsets.append(len(pool._data))
+        remapped = []
+        for codes in code_arrays:
+            new = np.searchsorted(used, codes).astype(np.int32)
+            new[codes < 0] = -1
+            remapped.append(new)
+        return pool, remapped
+
+
+def _column_arrays(rows, pool):
+    ids, nomes, descricoes, lats, lngs, pesos = (list(column) for column in zip(*rows)) if rows else ([],) * 6
+    return {
+        'ids': np.array(ids, dtype=np.int64),
+        'lng': np.array(lngs, dtype=np.float64),
+        'lat': np.array(lats, dtype=np.float64),
+        'peso': np.array(pesos, dtype=np.float64),
+        'nome': pool.intern(nomes),
+        'descricao': pool.intern(descricoes)
+    }
+
+
+class ItemSnapshot:
+    """
+    Fotografia imutável dos itens em arrays colunares.
+
+    Ids, coordenadas e pesos ficam em arrays NumPy; nome e descrição são
+    códigos no `StringPool`. As primeiras `indexed` linhas estão na grade
+    espacial (`GridIndex`); as acrescentadas por atualizações incrementais
+    ficam depois delas e são filtradas direto, e as removidas só saem de
+    `alive`. Quando essas sobras passam de REINDEX_FRACTION, a fotografia
+    seguinte é compactada e a grade, remontada.
+
+    As distâncias são de grande círculo (esfera): perto da borda de um raio
+    o resultado pode diferir do PostGIS, que mede no elipsoide (~0,3%).
+    """
+
+    def __init__(self, columns, pool, version=0, alive=None, index=None, indexed=None):
+        self.ids = columns['ids']
+        self.lng = columns['lng']
+        self.lat = columns['lat']
+        self.peso = columns['peso']
+        self.nome = columns['nome']
+        self.descricao = columns['descricao']
+        self.pool = pool
+        self.version = version
+        self.alive = np.ones(len(self.ids), dtype=bool) if alive is None else alive
+        if index is None:
+            index, indexed = GridIndex(self.lng, self.lat), len(self.ids)
+        self.index = index
+        self.indexed = indexed
+
+    @classmethod
+    def from_rows(cls, rows, version=0, pool=None):
+        """Fotografia a partir de tuplas (id, nome, descricao, latitude, longitude, peso)."""
+        pool = pool or StringPool()
+        columns = _column_arrays(list(rows), pool)
+        order = np.argsort(columns['ids'], kind='stable')
+        return cls({name: values[order] for name, values in columns.items()}, pool, version)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    @property
+    def nbytes(self):
+        arrays = (self.ids, self.lng, self.lat, self.peso, self.nome, self.descricao, self.alive,
+                  self.index.order, self.index.keys)
+        return sum(values.nbytes for values in arrays) + self.pool.nbytes
+
+    def columns(self):
+        return {'ids': self.ids, 'lng': self.lng, 'lat': self.lat, 'peso': self.peso,
+                'nome': self.nome, 'descricao': self.descricao}
+
+    def apply(self, rows, ids, version):
+        """
+        Nova fotografia com o estado atual dos `ids`: `rows` são as linhas
+        lidas do banco para eles (um id sem linha foi removido).
+        """
+        alive = self.alive.copy()
+        alive[np.isin(self.ids, np.fromiter(ids, dtype=np.int64))] = False
+        added = _column_arrays(list(rows), self.pool)
+        current = self.columns()
+        columns = {name: np.concatenate([current[name], added[name]]) for name in current}
+        alive = np.concatenate([alive, np.ones(len(added['ids']), dtype=bool)])
+
+        outside = len(alive) - self.indexed + int(np.count_nonzero(~alive[:self.indexed]))
+        if outside > max(REINDEX_MIN_ROWS, REINDEX_FRACTION * len(alive)):
+            # Compacta: só as linhas vivas, ordenadas por id, numa grade nova e
+            # com um pool sem os textos que as atualizações deixaram para trás
+            keep = np.flatnonzero(alive)
+            keep = keep[np.argsort(columns['ids'][keep], kind='stable')]
+            columns = {name: values[keep] for name, values in columns.items()}
+            pool, (columns['nome'], columns['descricao']) = self.pool.compact(columns['nome'], columns['descricao'])
+            return ItemSnapshot(columns, pool, version)
+        return ItemSnapshot(columns, self.pool, version, alive=alive, index=self.index, indexed=self.indexed)
+
+    # --- Consultas -------------------------------------------------------------
+
+    def _rows_in_bbox(self, min_x, min_y, max_x, max_y):
+        rows = self.index.query_bbox(min_x, min_y, max_x, max_y)
+        if self.indexed < len(self.ids):
+            tail = np.arange(self.indexed, len(self.ids))
+            x, y = self.lng[tail], self.lat[tail]
+            rows = np.concatenate([rows, tail[(x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)]])
+        return rows[self.alive[rows]]
+
+    def _within(self, lat, lng, radius):
+        """(linhas, distâncias em metros) dos itens a até `radius` metros do ponto."""
+        dlat = radius / _METERS_PER_DEGREE
+        if abs(lat) + dlat >= 90:
+            dlng = 360.0
+        else:
+            dlng = dlat / math.cos(math.radians(abs(lat) + dlat))
+        if dlng >= 180 or lng - dlng < -180 or lng + dlng > 180:
+            min_lng, max_lng = -180.0, 180.0
+        else:
+            min_lng, max_lng = lng - dlng, lng + dlng
+        rows = self._rows_in_bbox(min_lng, lat - dlat, max_lng, lat + dlat)
+        distances = haversine(lng, lat, self.lng[rows], self.lat[rows])
+        inside = distances <= radius
+        return rows[inside], distances[inside]
+
+    def filter(self, params):
+        """Linhas que atendem aos filtros da listagem (`normalize_listing_args`), em ordem de id."""
+        rows = None
+        if params.get('radius') is not None:
+            rows, _ = self._within(params['lat'], params['lng'], params['radius'])
+        if params.get('bbox'):
+            found = self._rows_in_bbox(*params['bbox'])
+            rows = found if rows is None else np.intersect1d(rows, found)
+        if rows is None:
+            rows = np.flatnonzero(self.alive)
+        return rows[np.argsort(self.ids[rows], kind='stable')]
+
+    def listing(self, params):
+        """
+        (itens, id do último item quando há próxima página) com a semântica
+        do GET /items/: filtros, campos e paginação keyset por id.
+        """
+        rows = self.filter(params)
+        limit = params.get('limit')
+        next_id = None
+        if limit:
+            if params.get('cursor') is not None:
+                rows = rows[self.ids[rows] > params['cursor']]
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_id = int(self.ids[rows[-1]])
+        return self.records(rows, params.get('fields')), next_id
+
+    def nearest(self, lat, lng, k, max_distance=None):
+        """(linhas, distâncias) dos `k` itens mais próximos, do mais perto ao mais longe (empate pelo id)."""
+        radius = max(self.index.cell * _METERS_PER_DEGREE, 100.0)
+        while True:
+            limit = radius if max_distance is None else min(radius, max_distance)
+            rows, distances = self._within(lat, lng, limit)
+            # Com k itens dentro do raio, nenhum item de fora pode estar mais perto que eles
+            if len(rows) >= k or limit == max_distance or radius >= math.pi * EARTH_RADIUS_M:
+                order = np.lexsort((self.ids[rows], distances))[:k]
+                return rows[order], distances[order]
+            radius *= 4
+
+    def all_rows(self):
+        rows = np.flatnonzero(self.alive)
+        return rows[np.argsort(self.ids[rows], kind='stable')]
+
+    def records(self, rows, fields=None):
+        """Dicts dos itens nas linhas `rows`, só com `fields` (padrão: todos os campos de leitura)."""
+        names = list(fields or READ_FIELDS)
+        values = []
+        for name in names:
+            if name in ('nome', 'descricao'):
+                codes = getattr(self, name)[rows].tolist()
+                values.append([self.pool.get(code) for code in codes])
+            elif name in ('latitude', 'longitude'):
+                coords = (self.lat if name == 'latitude' else self.lng)[rows].tolist()
+                # NaN é a localização NULL no banco
+                values.append([None if value != value else value for value in coords])
+            else:
+                values.append((self.ids if name == 'id' else self.peso)[rows].tolist())
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+class ItemReadModel:
+    """
+    Modelo de leitura em memória dos itens, opcional (READ_MODEL_ENABLED).
+
+    Carregado em segundo plano no primeiro uso; enquanto isso (e sempre que
+    não puder responder com dados atuais) `snapshot()` devolve None e o
+    chamador lê do PostGIS.
+
+    Consistência por versão: cada escrita conhecida incrementa `version()`
+    (pelas escritas da API, via `invalidate_item_caches(ids)`, e pelo LISTEN
+    no canal dos triggers da tabela, que traz as escritas de outros
+    processos). Uma fotografia só é usada se reflete a versão atual; antes
+    disso os ids pendentes são relidos do banco e aplicados. Alterações sem
+    ids conhecidos (carga em massa) disparam uma recarga completa.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.channel = DEFAULT_CHANNEL
+        self.hits = 0
+        self.fallbacks = 0
+        self._app = None
+        self._snapshot = None
+        self._version = 0
+        self._pending = set()
+        self._reload = True
+        # Carga completa em andamento: até ela terminar, a fotografia antiga não pode ser atualizada
+        self._loading = False
+        self._retry_at = 0.0
+        self._loader = None
+        self._listener = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        ITEM_CHANGE_LISTENERS.append(self.invalidate)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('READ_MODEL_ENABLED', self.enabled)
+        self.channel = app.config.get('READ_MODEL_CHANNEL', self.channel)
+        self._app = app
+        app.extensions['read_model'] = self
+
+    def version(self):
+        return self._version
+
+    def invalidate(self, ids=None):
+        """Registra uma escrita nos itens `ids` (None: itens desconhecidos, recarga completa)."""
+        with self._lock:
+            self._version += 1
+            if ids is None:
+                self._reload = True
+            else:
+                self._pending.update(int(i) for i in ids)
+                if len(self._pending) > MAX_INCREMENTAL_IDS:
+                    self._reload = True
+
+    def snapshot(self):
+        """Fotografia que reflete todas as escritas conhecidas, ou None (o chamador lê do banco)."""
+        if not self.enabled:
+            return None
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version != self._version:
+            snapshot = self._refresh()
+        if snapshot is None:
+            self._start()
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return snapshot
+
+    def _refresh(self):
+        with self._refresh_lock:
+            snapshot = self._snapshot
+            with self._lock:
+                version = self._version
+                if snapshot.version == version:
+                    return snapshot
+                # Os ids pendentes foram levados pela carga: aplicá-los (nenhum) à fotografia
+                # antiga a marcaria com a versão nova sem as escritas em massa
+                if self._reload or self._loading:
+                    return None
+                ids, self._pending = self._pending, set()
+            try:
+                rows = Item.read_query(Item.query.filter(Item.id.in_(ids)), READ_FIELDS).all() if ids else []
+            except Exception:
+                # Os ids continuam pendentes e a leitura vai ao banco (que pode ter voltado)
+                logger.exception('Falha ao atualizar o modelo de leitura')
+                db.session.rollback()
+                with self._lock:
+                    self._pending |= ids
+                return None
+            # Os ids foram lidos depois da versão: escritas que chegarem agora ficam para a próxima
+            self._snapshot = snapshot.apply(rows, ids, version)
+            return self._snapshot
+
+    def _start(self):
+        """Inicia a carga completa e o LISTEN, se ainda não estão rodando."""
+        with self._lock:
+            if self._app is None or time.monotonic() < self._retry_at:
+                return
+            if self.channel and (self._listener is None or not self._listener.is_alive()):
+                self._listener = threading.Thread(target=self._listen, name='read-model-listen', daemon=True)
+                self._listener.start()
+            if self._loader is None or not self._loader.is_alive():
+                self._loader = threading.Thread(target=self._load, name='read-model-load', daemon=True)
+                self._loader.start()
+
+    def load(self):
+        """Carga completa a partir do banco (dentro de um app context)."""
+        with self._lock:
+            version = self._version
+            pending, self._pending = self._pending, set()
+            # Uma recarga pedida durante a carga volta a marcar _reload e roda depois desta
+            self._reload = False
+            self._loading = True
+        try:
+            query = Item.read_query(fields=READ_FIELDS).order_by(Item.id).yield_per(LOAD_BATCH_ROWS)
+            self._snapshot = ItemSnapshot.from_rows(query, version)
+        except Exception:
+            with self._lock:
+                self._pending |= pending
+                self._reload = True
+            raise
+        finally:
+            with self._lock:
+                self._loading = False
+        logger.info('Modelo de leitura carregado: %d itens, %.1f MB', len(self._snapshot), self._snapshot.nbytes / 1e6)
+
+    def _load(self):
+        with self._app.app_context():
+            try:
+                self.load()
+            except Exception:
+                logger.exception('Falha na carga do modelo de leitura')
+                self._retry_at = time.monotonic() + RETRY_SECONDS
+            finally:
+                db.session.remove()
+
+    def handle_notification(self, payload):
+        """
+        Payload do trigger: ids separados por vírgula ou 'reload'. A escrita
+        veio de qualquer processo, então invalida também os caches de
+        resultados; o modelo é avisado como ouvinte de `invalidate_item_caches`.
+        """
+        ids = None if payload == 'reload' else [int(value) for value in payload.split(',') if value]
+        invalidate_item_caches(ids)
+
+    def _listen(self):
+        # Conexão própria, fora do pool: fica parada no LISTEN enquanto o processo viver
+        with self._app.app_context():
+            url = db.engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+            dbapi = db.engine.dialect.loaded_dbapi
+        connected_before = False
+        while True:
+            try:
+                connection = dbapi.connect(url)
+                connection.autocommit = True
+                connection.cursor().execute(f'LISTEN "{self.channel}"')
+                if connected_before:
+                    # Notificações podem ter se perdido enquanto a conexão estava caída
+                    invalidate_item_caches()
+                connected_before = True
+                self._consume(connection)
+            except Exception:
+                logger.exception('LISTEN do modelo de leitura interrompido; reconectando')
+                time.sleep(RETRY_SECONDS)
+
+    def _consume(self, connection):
+        if hasattr(connection, 'poll'):
+            # psycopg2
+            while True:
+                if select.select([connection], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    self.handle_notification(connection.notifies.pop(0).payload)
+        while True:
+            # psycopg 3
+            for notify in connection.notifies(timeout=LISTEN_TIMEOUT):
+                self.handle_notification(notify.payload)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'habilitado': self.enabled,
+            'carregado': snapshot is not None,
+            'itens': len(snapshot) if snapshot is not None else 0,
+            'bytes': snapshot.nbytes if snapshot is not None else 0,
+            'versao': self._version,
+            'versao_aplicada': snapshot.version if snapshot is not None else None,
+            'hits': self.hits,
+            'fallbacks': self.fallbacks
+        }
+
+
+read_model = ItemReadModel()
+
+
+# Triggers por comando (não por linha): um NOTIFY por INSERT/UPDATE/DELETE/COPY,
+# com os ids alterados ou 'reload' quando são muitos
+_NOTIFY_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION items_notify_changes() RETURNS trigger AS $$
+DECLARE
+    total bigint;
+    payload text;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify(TG_ARGV[0], 'reload');
+        RETURN NULL;
+    END IF;
+    SELECT count(*), string_agg(id::text, ',') INTO total, payload
+    FROM (SELECT id FROM alterados LIMIT {max_ids} + 1) AS a;
+    IF total > {max_ids} THEN
+        PERFORM pg_notify(TG_ARGV[0], 'reload');
+    ELSIF total > 0 THEN
+        PERFORM pg_notify(TG_ARGV[0], payload);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+_NOTIFY_TRIGGERS = (
+    ('insert', 'INSERT', 'REFERENCING NEW TABLE AS alterados'),
+    ('update', 'UPDATE', 'REFERENCING NEW TABLE AS alterados'),
+    ('delete', 'DELETE', 'REFERENCING OLD TABLE AS alterados'),
+    ('truncate', 'TRUNCATE', '')
+)
+
+
+def install_notify_triggers(channel=DEFAULT_CHANNEL):
+    """Cria (ou atualiza) os triggers que avisam no canal `channel` a cada escrita em items."""
+    if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', channel or ''):
+        raise ValueError(f"Nome de canal inválido: '{channel}'")
+    # Um comando por execute: nem todo driver aceita vários comandos numa chamada
+    db.session.execute(text(_NOTIFY_FUNCTION_SQL.format(max_ids=NOTIFY_MAX_IDS)))
+    for name, event, referencing in _NOTIFY_TRIGGERS:
+        db.session.execute(text(
+            f'CREATE OR REPLACE TRIGGER items_notify_{name} AFTER {event} ON items {referencing} '
+            f"FOR EACH STATEMENT EXECUTE FUNCTION items_notify_changes('{channel}')"
+        ))
+    db.session.commit()
@@ -0,0 +1,220 @@
+import json
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+
+# Contador de versão do conjunto de itens, compartilhado pelos caches
+DATASET_VERSION_KEY = 'items:version'
+
+# Caches derivados da tabela items, invalidados juntos a cada escrita
+ITEM_CACHES = []
+# Chamados depois dos caches com os ids alterados (None quando não são conhecidos)
+ITEM_CHANGE_LISTENERS = []
+
+
+class SharedVersionCounter:
+    """
+    Versão do dataset em memória compartilhada (multiprocessing.Value), usada
+    sem CACHE_REDIS_URL. O valor é criado na importação do módulo, então os
+    processos criados por fork depois disso (os workers do gunicorn, a partir
+    do `manage.py serve`) enxergam e incrementam o mesmo contador: uma escrita
+    em um worker invalida os caches de todos.
+    Processos independentes (ex.: `manage.py load_items`) têm o próprio contador.
+    """
+
+    def __init__(self):
+        self._value = multiprocessing.Value('q', 0)
+
+    def get_counter(self, key):
+        return self._value.value
+
+    def incr(self, key):
+        with self._value.get_lock():
+            self._value.value += 1
+            return self._value.value
+
+
+# Único por processo principal: todos os caches e todos os workers leem a mesma versão
+shared_versions = SharedVersionCounter()
+
+
+class MemoryCacheBackend:
+    """Backend local (por processo): LRU limitado a `max_entries`, com TTL."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCacheBackend:
+    """
+    Backend compartilhado entre processos/instâncias (requer o pacote `redis`).
+    A remoção por LRU fica a cargo da política de memória do próprio Redis.
+    """
+
+    def __init__(self, url, prefix='eemovel:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("O backend Redis requer o pacote 'redis' (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def get_counter(self, key):
+        return int(self._client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(f'{self.prefix}cache:*'):
+            self._client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(f'{self.prefix}cache:*'))
+
+
+# Um cliente por URL: os caches configurados com o mesmo Redis dividem o contador de versão
+_redis_backends = {}
+
+
+def _redis_backend(url):
+    backend = _redis_backends.get(url)
+    if backend is None:
+        backend = _redis_backends[url] = RedisCacheBackend(url)
+    return backend
+
+
+class ResultCache:
+    """
+    Cache de resultados derivados do conjunto de itens.
+
+    A chave combina a versão do dataset com os parâmetros do cálculo; as
+    escritas em itens chamam `invalidate_item_caches()`, que incrementa a
+    versão e torna as entradas anteriores inalcançáveis (elas saem pelo LRU
+    ou pelo TTL).
+
+    Com `CACHE_REDIS_URL` a versão fica sempre no Redis; as entradas também,
+    a menos que `shared=False` (valores binários, como tiles, ficam no processo).
+    Sem Redis as entradas ficam no processo e a versão em `shared_versions`,
+    compartilhada pelos workers do gunicorn.
+    """
+
+    def __init__(self, name, shared=True, app=None):
+        self.name = name
+        self.shared = shared
+        self.ttl = 300
+        self.enabled = True
+        self.backend = MemoryCacheBackend()
+        self.versions = shared_versions
+        self.hits = 0
+        self.misses = 0
+        ITEM_CACHES.append(self)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        prefix = f'{self.name.upper()}_CACHE'
+        self.enabled = app.config.get(f'{prefix}_ENABLED', self.enabled)
+        self.ttl = app.config.get(f'{prefix}_TTL', self.ttl)
+        url = app.config.get('CACHE_REDIS_URL')
+        local = MemoryCacheBackend(app.config.get(f'{prefix}_SIZE', self.backend.max_entries))
+        self.versions = _redis_backend(url) if url else shared_versions
+        self.backend = self.versions if url and self.shared else local
+        app.extensions[f'{self.name}_cache'] = self
+
+    def version(self):
+        return self.versions.get_counter(DATASET_VERSION_KEY)
+
+    def invalidate(self):
+        """Marca o conjunto de itens como alterado para este cache."""
+        return self.versions.incr(DATASET_VERSION_KEY)
+
+    def make_key(self, params, version=None):
+        version = self.version() if version is None else version
+        return f'cache:{self.name}:{version}:' + json.dumps(params, sort_keys=True, default=list)
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.enabled:
+            self.backend.set(key, value, self.ttl)
+
+    def get_or_compute(self, params, compute):
+        """Retorna (valor, hit). A versão é lida antes do cálculo: uma escrita
+        concorrente faz a próxima leitura recalcular em vez de servir dado velho."""
+        key = self.make_key(params)
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.set(key, value)
+        return value, False
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'habilitado': self.enabled,
+            'versao_dataset': self.version(),
+            'entradas': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'taxa_acerto': round(self.hits / total, 4) if total else None,
+            'ttl_s': self.ttl
+        }
+
+
+def invalidate_item_caches(ids=None):
+    """Chamado após qualquer escrita na tabela items; `ids` são os itens alterados, quando conhecidos."""
+    # Os caches dividem o contador de versão: um incremento por contador, não um por cache
+    counters = {id(cache.versions): cache for cache in ITEM_CACHES}
+    for cache in counters.values():
+        cache.invalidate()
+    for listener in ITEM_CHANGE_LISTENERS:
+        listener(ids)
+
+
+optimize_cache = ResultCache('optimize')
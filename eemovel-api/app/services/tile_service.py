@@ -0,0 +1,71 @@
+from sqlalchemy import text
+from app.extensions import db
+from app.services.result_cache import ResultCache
+
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+MAX_ZOOM = 22
+TILE_EXTENT = 4096
+# Margem em unidades do tile, para símbolos na borda não serem cortados
+TILE_BUFFER = 64
+LAYER_NAME = 'items'
+
+# Tiles são binários e ficam sempre no processo (shared=False)
+tile_cache = ResultCache('tiles', shared=False)
+
+# Pontos que caem no mesmo pixel do tile viram uma única feature com `quantidade`:
+# em zoom baixo o tile fica pequeno mesmo com milhões de itens.
+# O endpoint é público: só vão id, peso e quantidade; nome e descrição exigem o JWT da listagem.
+# O filtro usa o operador && sobre localizacao (índice GiST idx_items_localizacao).
+_TILE_SQL = text(f"""
+WITH params AS (
+    SELECT CAST(:z AS integer) AS z, CAST(:x AS integer) AS x, CAST(:y AS integer) AS y,
+           CAST(:margin AS double precision) AS margin
+),
+bounds AS (
+    SELECT ST_TileEnvelope(z, x, y) AS geom,
+           ST_Transform(ST_TileEnvelope(z, x, y, margin => margin), 4326) AS geom_4326
+    FROM params
+),
+pontos AS (
+    SELECT ST_AsMVTGeom(ST_Transform(i.localizacao, 3857), bounds.geom, CAST(:extent AS integer), CAST(:buffer AS integer), true) AS geom,
+           i.id, i.peso
+    FROM {LAYER_NAME} i, bounds
+    WHERE i.localizacao && bounds.geom_4326
+),
+features AS (
+    SELECT geom,
+           min(id) AS id,
+           sum(peso) AS peso,
+           count(*) AS quantidade
+    FROM pontos
+    WHERE geom IS NOT NULL
+    GROUP BY geom
+)
+SELECT ST_AsMVT(features, CAST(:layer AS text), CAST(:extent AS integer), 'geom', 'id') FROM features
+""")
+
+
+def validate_tile(z, x, y):
+    """Levanta ValueError se (z, x, y) não for um tile válido do esquema XYZ."""
+    if not 0 <= z <= MAX_ZOOM:
+        raise ValueError(f"Zoom deve estar entre 0 e {MAX_ZOOM}")
+    limit = 2 ** z
+    if not (0 <= x < limit and 0 <= y < limit):
+        raise ValueError(f"Tile fora do intervalo para o zoom {z}: x e y devem estar entre 0 e {limit - 1}")
+
+
+def render_tile(z, x, y):
+    """Tile MVT (bytes) com os itens do tile; vazio se não houver itens."""
+    tile = db.session.execute(_TILE_SQL, {
+        'z': z, 'x': x, 'y': y,
+        'extent': TILE_EXTENT,
+        'buffer': TILE_BUFFER,
+        'margin': TILE_BUFFER / TILE_EXTENT,
+        'layer': LAYER_NAME
+    }).scalar()
+    return bytes(tile) if tile is not None else b''
+
+
+def get_tile(z, x, y):
+    """Tile do cache (invalidado a cada escrita em items) ou renderizado no banco."""
+    return tile_cache.get_or_compute({'z': z, 'x': x, 'y': y}, lambda: render_tile(z, x, y))
@@ -0,0 +1,246 @@
+import math
+import time
+import numpy as np
+from app.utils.distance import DEFAULT_BLOCK_SIZE, iter_distance_blocks
+
+# Vizinhos considerados por item nas economias e no relocate (lista granular)
+DEFAULT_NEIGHBORS = 30
+DEFAULT_TIME_BUDGET = 2.0
+MAX_TIME_BUDGET = 30.0
+_EPS = 1e-9
+
+
+class CVRPSolver:
+    """
+    CVRP com depósito único: construção por economias (Clarke-Wright) e
+    melhoria por 2-opt, or-opt e relocate dentro de um orçamento de tempo.
+
+    As coordenadas devem estar em metros (ver `distance.project_local`).
+    O depósito é o nó de índice `n`; os itens são 0..n-1.
+
+    Com `distances` ((n + 1) x (n + 1), depósito na última posição) os custos
+    vêm da matriz. Os movimentos (2-opt invertendo trechos) supõem custos
+    simétricos, então a matriz é simetrizada pela média dos dois sentidos.
+    """
+
+    def __init__(self, coords, demands, capacity, depot, neighbors=DEFAULT_NEIGHBORS, distances=None):
+        self.n = len(coords)
+        self.xs = [float(c[0]) for c in coords] + [float(depot[0])]
+        self.ys = [float(c[1]) for c in coords] + [float(depot[1])]
+        self.depot = self.n
+        self.demands = [float(d) for d in demands]
+        self.capacity = float(capacity)
+        if self.demands and max(self.demands) > self.capacity + _EPS:
+            raise ValueError("Há itens com peso maior que a capacidade")
+        self.matrix = None
+        if distances is not None:
+            distances = np.asarray(distances, dtype=np.float64)
+            if distances.shape != (self.n + 1, self.n + 1):
+                raise ValueError("A matriz de distâncias deve incluir o depósito na última posição")
+            self.matrix = ((distances + distances.T) / 2).tolist()
+            self.dist = self._matrix_dist
+        self.neighbors = self._neighbor_lists(coords, min(neighbors, self.n - 1))
+
+    def dist(self, i, j):
+        return math.hypot(self.xs[i] - self.xs[j], self.ys[i] - self.ys[j])
+
+    def _matrix_dist(self, i, j):
+        return self.matrix[i][j]
+
+    def _blocks(self, coords):
+        if self.matrix is None:
+            yield from iter_distance_blocks(np.asarray(coords, dtype=np.float64), metric='projected')
+            return
+        items = np.asarray(self.matrix)[:self.n, :self.n]
+        for start in range(0, self.n, DEFAULT_BLOCK_SIZE):
+            yield start, items[start:start + DEFAULT_BLOCK_SIZE].copy()
+
+    def _neighbor_lists(self, coords, k):
+        if k < 1:
+            return [[] for _ in range(self.n)]
+        lists = []
+        for start, block in self._blocks(coords):
+            rows = np.arange(len(block))
+            block[rows, start + rows] = np.inf
+            nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+            order = np.argsort(block[rows[:, None], nearest], axis=1)
+            lists.extend(np.take_along_axis(nearest, order, axis=1).tolist())
+        return lists
+
+    def route_cost(self, route):
+        if not route:
+            return 0.0
+        d = self.depot
+        cost = self.dist(d, route[0]) + self.dist(route[-1], d)
+        for a, b in zip(route, route[1:]):
+            cost += self.dist(a, b)
+        return cost
+
+    # --- Construção -------------------------------------------------------
+
+    def savings(self):
+        """Clarke-Wright paralelo restrito às listas de vizinhos."""
+        d = self.depot
+        pairs = set()
+        for i, nbrs in enumerate(self.neighbors):
+            for j in nbrs:
+                pairs.add((i, j) if i < j else (j, i))
+        candidates = sorted(
+            ((self.dist(d, i) + self.dist(d, j) - self.dist(i, j), i, j) for i, j in pairs),
+            key=lambda s: (-s[0], s[1], s[2])
+        )
+
+        route_of = list(range(self.n))
+        routes = {i: [i] for i in range(self.n)}
+        loads = {i: self.demands[i] for i in range(self.n)}
+
+        for saving, i, j in candidates:
+            if saving <= _EPS:
+                break
+            ri, rj = route_of[i], route_of[j]
+            if ri == rj or loads[ri] + loads[rj] > self.capacity + _EPS:
+                continue
+            a, b = routes[ri], routes[rj]
+            # i precisa ser extremidade de a e j extremidade de b
+            if a[-1] != i:
+                if a[0] != i:
+                    continue
+                a.reverse()
+            if b[0] != j:
+                if b[-1] != j:
+                    continue
+                b.reverse()
+
+            a.extend(b)
+            for node in b:
+                route_of[node] = ri
+            loads[ri] += loads.pop(rj)
+            del routes[rj]
+
+        return [routes[r] for r in sorted(routes)]
+
+    # --- Melhoria ---------------------------------------------------------
+
+    def two_opt(self, route, deadline):
+        """2-opt intra-rota (primeira melhoria), com o depósito nas pontas."""
+        path = [self.depot] + route + [self.depot]
+        improved = True
+        changed = False
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for i in range(len(path) - 3):
+                if time.perf_counter() > deadline:
+                    break
+                a, b = path[i], path[i + 1]
+                d_ab = self.dist(a, b)
+                for j in range(i + 2, len(path) - 1):
+                    c, e = path[j], path[j + 1]
+                    delta = self.dist(a, c) + self.dist(b, e) - d_ab - self.dist(c, e)
+                    if delta < -_EPS:
+                        path[i + 1:j + 1] = reversed(path[i + 1:j + 1])
+                        improved = changed = True
+                        b = path[i + 1]
+                        d_ab = self.dist(a, b)
+        route[:] = path[1:-1]
+        return changed
+
+    def or_opt(self, route, deadline):
+        """Move segmentos de 1 a 3 itens para outra posição da mesma rota."""
+        changed = False
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for length in (1, 2, 3):
+                for start in range(len(route) - length + 1):
+                    if time.perf_counter() > deadline:
+                        return changed
+                    path = [self.depot] + route + [self.depot]
+                    seg = path[start + 1:start + 1 + length]
+                    prev, nxt = path[start], path[start + 1 + length]
+                    removal = self.dist(prev, seg[0]) + self.dist(seg[-1], nxt) - self.dist(prev, nxt)
+                    rest = route[:start] + route[start + length:]
+                    rest_path = [self.depot] + rest + [self.depot]
+                    best = None
+                    for k in range(len(rest_path) - 1):
+                        if k == start:
+                            continue
+                        p, q = rest_path[k], rest_path[k + 1]
+                        for s in (seg, seg[::-1]):
+                            delta = self.dist(p, s[0]) + self.dist(s[-1], q) - self.dist(p, q) - removal
+                            if delta < -_EPS and (best is None or delta < best[0]):
+                                best = (delta, k, s)
+                    if best:
+                        _, k, s = best
+                        route[:] = rest[:k] + list(s) + rest[k:]
+                        improved = changed = True
+                        break
+                if improved:
+                    break
+        return changed
+
+    def relocate(self, routes, deadline):
+        """Move um item para outra rota, junto de um vizinho, se couber e reduzir o custo."""
+        d = self.depot
+        route_of = [0] * self.n
+        loads = []
+        for r, route in enumerate(routes):
+            for node in route:
+                route_of[node] = r
+            loads.append(sum(self.demands[node] for node in route))
+
+        changed = False
+        for u in range(self.n):
+            if time.perf_counter() > deadline:
+                break
+            ru = route_of[u]
+            src = routes[ru]
+            pos_u = src.index(u)
+            prev_u = src[pos_u - 1] if pos_u > 0 else d
+            next_u = src[pos_u + 1] if pos_u + 1 < len(src) else d
+            gain = self.dist(prev_u, u) + self.dist(u, next_u) - self.dist(prev_u, next_u)
+
+            best = None
+            for v in self.neighbors[u]:
+                rv = route_of[v]
+                if rv == ru or loads[rv] + self.demands[u] > self.capacity + _EPS:
+                    continue
+                dst = routes[rv]
+                pos_v = dst.index(v)
+                prev_v = dst[pos_v - 1] if pos_v > 0 else d
+                next_v = dst[pos_v + 1] if pos_v + 1 < len(dst) else d
+                for insert_at, a, b in ((pos_v, prev_v, v), (pos_v + 1, v, next_v)):
+                    delta = self.dist(a, u) + self.dist(u, b) - self.dist(a, b) - gain
+                    if delta < -_EPS and (best is None or delta < best[0]):
+                        best = (delta, rv, insert_at)
+
+            if best:
+                _, rv, insert_at = best
+                src.pop(pos_u)
+                routes[rv].insert(insert_at, u)
+                route_of[u] = rv
+                loads[ru] -= self.demands[u]
+                loads[rv] += self.demands[u]
+                changed = True
+
+        routes[:] = [route for route in routes if route]
+        return changed
+
+    def improve(self, routes, time_budget):
+        deadline = time.perf_counter() + time_budget
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for route in routes:
+                improved |= self.two_opt(route, deadline)
+                improved |= self.or_opt(route, deadline)
+            improved |= self.relocate(routes, deadline)
+        return routes
+
+    def solve(self, time_budget=DEFAULT_TIME_BUDGET):
+        """Lista de rotas (índices dos itens, sem o depósito)."""
+        if self.n == 0:
+            return []
+        routes = self.savings()
+        if time_budget and time_budget > 0:
+            self.improve(routes, time_budget)
+        return routes
@@ -0,0 +1,106 @@
+import numpy as np
+
+# Raio médio da Terra (IUGG), em metros
+EARTH_RADIUS_M = 6371008.8
+
+# Linhas por bloco nas matrizes em pedaços: cada bloco ocupa block_size * m floats
+DEFAULT_BLOCK_SIZE = 1024
+
+METRICS = ('haversine', 'projected')
+
+
+def as_lonlat_array(points):
+    """Converte uma sequência de pares (lon, lat) num array float64 de forma (n, 2)."""
+    arr = np.asarray(points, dtype=np.float64)
+    if arr.size == 0:
+        return arr.reshape(0, 2)
+    if arr.ndim != 2 or arr.shape[1] != 2:
+        raise ValueError("As coordenadas devem ter o formato [(lon, lat), ...]")
+    return arr
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """
+    Distância de grande círculo em metros. Aceita escalares ou arrays
+    (com broadcasting do NumPy) em graus decimais.
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lon1, lat1, lon2, lat2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def project_local(points, origin_lat=None):
+    """
+    Projeção equiretangular local (em metros) centrada na latitude média.
+    Em escala urbana o erro em relação à haversine é desprezível e as
+    distâncias passam a ser euclidianas, o que permite usar KD-tree.
+    """
+    arr = as_lonlat_array(points)
+    if origin_lat is None:
+        origin_lat = float(arr[:, 1].mean()) if len(arr) else 0.0
+    lon = np.radians(arr[:, 0])
+    lat = np.radians(arr[:, 1])
+    x = EARTH_RADIUS_M * lon * np.cos(np.radians(origin_lat))
+    y = EARTH_RADIUS_M * lat
+    return np.column_stack((x, y))
+
+
+def _pairwise(a, b, metric):
+    if metric == 'haversine':
+        return haversine(a[:, None, 0], a[:, None, 1], b[None, :, 0], b[None, :, 1])
+    if metric == 'projected':
+        diff = a[:, None, :] - b[None, :, :]
+        return np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+    raise ValueError(f"Métrica desconhecida: '{metric}'. Opções: {', '.join(METRICS)}")
+
+
+def iter_distance_blocks(a, b=None, metric='haversine', block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Gera a matriz de distâncias em blocos de linhas: (inicio, bloco), onde
+    `bloco` tem forma (min(block_size, n - inicio), len(b)). O pico de memória
+    fica limitado a block_size * len(b) floats em vez de n².
+
+    Para metric='projected', `a` e `b` já devem estar em metros (ver `project_local`).
+    """
+    a = as_lonlat_array(a)
+    b = a if b is None else as_lonlat_array(b)
+    for start in range(0, len(a), block_size):
+        yield start, _pairwise(a[start:start + block_size], b, metric)
+
+
+def distance_matrix(a, b=None, metric='haversine', block_size=DEFAULT_BLOCK_SIZE):
+    """Matriz de distâncias completa (n x m), montada bloco a bloco."""
+    a = as_lonlat_array(a)
+    b = a if b is None else as_lonlat_array(b)
+    out = np.empty((len(a), len(b)), dtype=np.float64)
+    for start, block in iter_distance_blocks(a, b, metric, block_size):
+        out[start:start + len(block)] = block
+    return out
+
+
+def nearest_in_blocks(a, b, metric='haversine', block_size=DEFAULT_BLOCK_SIZE):
+    """Para cada ponto de `a`, índice e distância do ponto mais próximo em `b`, sem materializar a matriz."""
+    a = as_lonlat_array(a)
+    idx = np.empty(len(a), dtype=np.int64)
+    dist = np.empty(len(a), dtype=np.float64)
+    for start, block in iter_distance_blocks(a, b, metric, block_size):
+        best = block.argmin(axis=1)
+        idx[start:start + len(block)] = best
+        dist[start:start + len(block)] = block[np.arange(len(block)), best]
+    return idx, dist
+
+
+def path_length(points, metric='haversine'):
+    """Soma das distâncias entre pontos consecutivos de um trajeto."""
+    arr = as_lonlat_array(points)
+    if len(arr) < 2:
+        return 0.0
+    if metric == 'haversine':
+        legs = haversine(arr[:-1, 0], arr[:-1, 1], arr[1:, 0], arr[1:, 1])
+    elif metric == 'projected':
+        legs = np.hypot(*(arr[1:] - arr[:-1]).T)
+    else:
+        raise ValueError(f"Métrica desconhecida: '{metric}'. Opções: {', '.join(METRICS)}")
+    return float(legs.sum())
@@ -0,0 +1,138 @@
+import os
+import threading
+import numpy as np
+from app.utils.distance import as_lonlat_array, distance_matrix
+from app.utils.matrix_cache import DEFAULT_MAX_ITEMS, DistanceMatrixCache
+from app.utils.road_network import RoadGraph
+
+PROVIDERS = {}
+DEFAULT_PROVIDER = 'haversine'
+# Chaves do app.config repassadas aos processos dos jobs de otimização
+CONFIG_KEYS = ('ROAD_GRAPH_PATH', 'DISTANCE_CACHE_DIR', 'DISTANCE_CACHE_MAX_ITEMS')
+
+
+def register_provider(provider):
+    """Registra uma instância de provedor de distâncias pelo seu `name`."""
+    PROVIDERS[provider.name] = provider
+    return provider
+
+
+def get_provider(name=None):
+    """Provedor pedido (ou o padrão). Levanta ValueError se não existir."""
+    name = name or DEFAULT_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Provedor de distâncias desconhecido: '{name}'. Opções: {', '.join(sorted(PROVIDERS))}")
+    return PROVIDERS[name]
+
+
+def configure_providers(config):
+    """Aplica a configuração (dict com as chaves do app.config) a todos os provedores."""
+    for provider in PROVIDERS.values():
+        provider.configure(config)
+
+
+class DistanceProvider:
+    """
+    Interface dos provedores de distância do otimizador.
+
+    `matrix` recebe pontos (lon, lat) e, opcionalmente, o id de item de cada
+    um (None para pontos sem id, como o depósito) e devolve a matriz n x n
+    em metros, possivelmente assimétrica (`matrix[i][j]` é o trajeto de i
+    para j). Provedores com `straight_line = True` equivalem à distância
+    geométrica, e o otimizador pode continuar trabalhando com coordenadas.
+    """
+    name = None
+    straight_line = False
+
+    def configure(self, config):
+        pass
+
+    def check(self):
+        """Levanta ValueError se o provedor não puder ser usado (ex.: sem configuração)."""
+
+    def matrix(self, lonlat, ids=None):
+        raise NotImplementedError
+
+
+class HaversineProvider(DistanceProvider):
+    """Distância de grande círculo (linha reta), o comportamento original."""
+    name = 'haversine'
+    straight_line = True
+
+    def matrix(self, lonlat, ids=None):
+        return distance_matrix(lonlat)
+
+
+class RoadNetworkProvider(DistanceProvider):
+    """
+    Distância pela malha viária de um grafo gerado do OSM
+    (`python manage.py build_road_graph`), em `ROAD_GRAPH_PATH`.
+
+    Com `DISTANCE_CACHE_DIR`, as distâncias entre itens ficam numa matriz
+    em disco indexada pelo id (ver `DistanceMatrixCache`), e solves seguintes
+    só calculam os pares de itens novos ou movidos.
+    """
+    name = 'road'
+
+    def __init__(self):
+        self.graph_path = None
+        self.cache_dir = None
+        self.max_cached_items = DEFAULT_MAX_ITEMS
+        self._graph = None
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+        app.extensions['road_network'] = self
+
+    def configure(self, config):
+        with self._lock:
+            self.graph_path = config.get('ROAD_GRAPH_PATH')
+            self.cache_dir = config.get('DISTANCE_CACHE_DIR')
+            self.max_cached_items = config.get('DISTANCE_CACHE_MAX_ITEMS', self.max_cached_items)
+            self._graph = None
+            self._cache = None
+
+    def check(self):
+        if not self.graph_path or not os.path.exists(self.graph_path):
+            raise ValueError("Distâncias pela malha viária indisponíveis: configure ROAD_GRAPH_PATH "
+                             "com um grafo gerado por 'python manage.py build_road_graph'")
+
+    def graph(self):
+        """Grafo carregado no primeiro uso (uma vez por processo)."""
+        with self._lock:
+            if self._graph is None:
+                self.check()
+                self._graph = RoadGraph.load(self.graph_path)
+                if self.cache_dir:
+                    stat = os.stat(self.graph_path)
+                    fingerprint = f'{os.path.abspath(self.graph_path)}:{stat.st_size}:{stat.st_mtime_ns}'
+                    self._cache = DistanceMatrixCache(self.cache_dir, fingerprint, self.max_cached_items)
+            return self._graph
+
+    def matrix(self, lonlat, ids=None):
+        graph = self.graph()
+        lonlat = as_lonlat_array(lonlat)
+        keyed = [] if ids is None or self._cache is None else [i for i, v in enumerate(ids) if v is not None]
+        if not keyed:
+            return graph.distance_matrix(lonlat)
+
+        out = np.empty((len(lonlat), len(lonlat)), dtype=np.float64)
+        points = lonlat[keyed]
+        out[np.ix_(keyed, keyed)] = self._cache.lookup(
+            [ids[i] for i in keyed], points, lambda rows: graph.distance_matrix(points[rows], points)
+        )
+        # Pontos sem id (ex.: o depósito) não vão para o cache
+        others = sorted(set(range(len(lonlat))) - set(keyed))
+        if others:
+            out[others, :] = graph.distance_matrix(lonlat[others], lonlat)
+            out[:, others] = graph.distance_matrix(lonlat, lonlat[others])
+        return out
+
+    def stats(self):
+        return self._cache.stats() if self._cache is not None else {'hits': 0, 'misses': 0}
+
+
+register_provider(HaversineProvider())
+road_network = register_provider(RoadNetworkProvider())
@@ -0,0 +1,82 @@
+import time
+
+_EPS = 1e-9
+
+
+def insert_items(trips, added, dist, demands, capacity, depot=None):
+    """
+    Inserção mais barata: cada item de `added` entra na posição (em qualquer
+    viagem com capacidade sobrando) que menos aumenta a distância.
+
+    `trips` são listas de índices, alteradas no lugar. `dist(i, j)` é o custo
+    entre dois índices; com `depot` (índice do depósito) as viagens saem e
+    voltam para ele, e um item pode abrir uma viagem nova se isso custar
+    menos do que encaixá-lo. Sem depósito as viagens são caminhos abertos.
+
+    Retorna (itens que não couberam em nenhuma viagem, índices das viagens alteradas).
+    """
+    loads = [sum(demands[i] for i in trip) for trip in trips]
+    leftovers = []
+    touched = set()
+
+    for item in added:
+        best = None
+        for t, trip in enumerate(trips):
+            if loads[t] + demands[item] > capacity + _EPS:
+                continue
+            path = [depot, *trip, depot]
+            for pos in range(len(trip) + 1):
+                a, b = path[pos], path[pos + 1]
+                delta = _leg(dist, a, item) + _leg(dist, item, b) - _leg(dist, a, b)
+                if best is None or delta < best[0] - _EPS:
+                    best = (delta, t, pos)
+
+        if depot is not None and demands[item] <= capacity + _EPS:
+            alone = dist(depot, item) + dist(item, depot)
+            if best is None or alone < best[0] - _EPS:
+                best = (alone, len(trips), 0)
+                trips.append([])
+                loads.append(0.0)
+
+        if best is None:
+            leftovers.append(item)
+            continue
+        _, t, pos = best
+        trips[t].insert(pos, item)
+        loads[t] += demands[item]
+        touched.add(t)
+
+    return leftovers, touched
+
+
+def two_opt(trip, dist, deadline, depot=None):
+    """
+    2-opt (primeira melhoria) numa viagem, até `deadline` (time.perf_counter).
+    Com `depot` as pontas ficam no depósito; sem ele o caminho é aberto e o
+    início e o fim também podem ser invertidos. Supõe custos simétricos.
+    """
+    path = [depot, *trip, depot]
+    improved = True
+    changed = False
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(len(path) - 3):
+            a, b = path[i], path[i + 1]
+            for j in range(i + 2, len(path) - 1):
+                c, e = path[j], path[j + 1]
+                delta = _leg(dist, a, c) + _leg(dist, b, e) - _leg(dist, a, b) - _leg(dist, c, e)
+                if delta < -_EPS:
+                    path[i + 1:j + 1] = reversed(path[i + 1:j + 1])
+                    improved = changed = True
+                    b = path[i + 1]
+            if time.perf_counter() > deadline:
+                break
+    trip[:] = path[1:-1]
+    return changed
+
+
+def _leg(dist, a, b):
+    # Pontas None: caminho aberto, sem custo de ida ou volta
+    if a is None or b is None:
+        return 0.0
+    return dist(a, b)
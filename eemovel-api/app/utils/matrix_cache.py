@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+DEFAULT_MAX_ITEMS = 20000
+INITIAL_CAPACITY = 1024
+
+
+class DistanceMatrixCache:
+    """
+    Matriz de distâncias persistente entre itens, indexada pelo id do item.
+
+    A matriz fica num arquivo float32 mapeado em memória (`np.memmap`) de
+    `capacidade x capacidade`; cada item ganha uma linha/coluna na primeira
+    vez em que aparece, e solves seguintes só calculam os pares que faltam.
+    Um valor 0 fora da diagonal significa "não calculado" (o arquivo novo é
+    esparso, então só ocupa disco o que já foi preenchido).
+
+    A posição de cada item é guardada junto: se o item mudou de lugar, a sua
+    linha e coluna são descartadas. O `fingerprint` identifica a origem das
+    distâncias (ex.: o arquivo do grafo); se mudar, o cache recomeça vazio.
+    Escritas são serializadas por uma trava de arquivo, então vários
+    processos (workers, jobs) podem compartilhar o mesmo diretório.
+    """
+
+    def __init__(self, directory, fingerprint, max_items=DEFAULT_MAX_ITEMS):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock, open(self._path('lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # --- Estado em disco --------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self._path('meta.json')) as f:
+                meta = json.load(f)
+            if meta.get('fingerprint') != self.fingerprint:
+                return self._reset()
+            ids = np.load(self._path('ids.npy'))
+            coords = np.load(self._path('coords.npy'))
+            matrix = np.memmap(self._path('matrix.f32'), dtype=np.float32, mode='r+',
+                               shape=(meta['capacity'], meta['capacity']))
+        except (OSError, ValueError, KeyError):
+            return self._reset()
+        return ids, coords, matrix
+
+    def _reset(self, capacity=INITIAL_CAPACITY):
+        ids = np.empty(0, dtype=np.int64)
+        coords = np.empty((0, 2), dtype=np.float64)
+        matrix = np.memmap(self._path('matrix.f32'), dtype=np.float32, mode='w+', shape=(capacity, capacity))
+        self._save(ids, coords, matrix)
+        return ids, coords, matrix
+
+    def _save(self, ids, coords, matrix):
+        matrix.flush()
+        np.save(self._path('ids.npy'), ids)
+        np.save(self._path('coords.npy'), coords)
+        with open(self._path('meta.json'), 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'capacity': matrix.shape[0]}, f)
+
+    def _grow(self, matrix, size, needed):
+        capacity = min(max(needed, 2 * matrix.shape[0]), self.max_items)
+        grown = np.memmap(self._path('matrix.f32.tmp'), dtype=np.float32, mode='w+', shape=(capacity, capacity))
+        for start in range(0, size, INITIAL_CAPACITY):
+            stop = min(start + INITIAL_CAPACITY, size)
+            grown[start:stop, :size] = matrix[start:stop, :size]
+        grown.flush()
+        del grown, matrix
+        os.replace(self._path('matrix.f32.tmp'), self._path('matrix.f32'))
+        return np.memmap(self._path('matrix.f32'), dtype=np.float32, mode='r+', shape=(capacity, capacity))
+
+    # --- Consulta ---------------------------------------------------------
+
+    def lookup(self, ids, lonlat, compute):
+        """
+        Matriz (n x n) de distâncias entre os itens `ids`, com posições `lonlat`.
+        `compute(rows)` recebe os índices (em `ids`) das origens que têm pares
+        faltando e devolve as distâncias delas para todos os `ids`.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        lonlat = np.asarray(lonlat, dtype=np.float64)
+        n = len(ids)
+        if n > self.max_items or len(np.unique(ids)) != n:
+            self.misses += 1
+            return np.asarray(compute(np.arange(n)), dtype=np.float64)
+
+        with self._exclusive():
+            cached_ids, coords, matrix = self._load()
+            position = {item_id: row for row, item_id in enumerate(cached_ids.tolist())}
+            new = [i for i, item_id in enumerate(ids.tolist()) if item_id not in position]
+            if len(cached_ids) + len(new) > self.max_items:
+                # Sem espaço: recomeça só com os itens pedidos
+                cached_ids, coords, matrix = self._reset(min(max(n, INITIAL_CAPACITY), self.max_items))
+                position, new = {}, list(range(n))
+
+            size = len(cached_ids) + len(new)
+            if size > matrix.shape[0]:
+                matrix = self._grow(matrix, len(cached_ids), size)
+            for i in new:
+                position[int(ids[i])] = len(position)
+            cached_ids = np.concatenate([cached_ids, ids[new]])
+            coords = np.concatenate([coords, lonlat[new]])
+            rows = np.array([position[item_id] for item_id in ids.tolist()], dtype=np.int64)
+
+            # Itens que mudaram de posição perdem as distâncias calculadas
+            moved = rows[np.any(coords[rows] != lonlat, axis=1)]
+            if len(moved):
+                matrix[moved, :size] = 0
+                matrix[:size, moved] = 0
+                coords[rows] = lonlat
+
+            block = np.asarray(matrix[np.ix_(rows, rows)], dtype=np.float64)
+            missing = block == 0
+            np.fill_diagonal(missing, False)
+            pending = np.flatnonzero(missing.any(axis=1))
+            if len(pending):
+                self.misses += 1
+                # Mesma precisão do arquivo, para o resultado não mudar entre o 1º solve e os seguintes
+                computed = np.asarray(compute(pending), dtype=np.float32)
+                block[pending] = computed
+                matrix[np.ix_(rows[pending], rows)] = computed
+            else:
+                self.hits += 1
+            if len(pending) or new or len(moved):
+                self._save(cached_ids, coords, matrix)
+            return block
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
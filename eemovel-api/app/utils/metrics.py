@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Limites (em segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def gauge(name, help, value):
+    """Linhas de um gauge simples, para uso em `Metrics.register_collector`."""
+    return [f'# HELP {name} {help}', f'# TYPE {name} gauge', f'{name} {value}']
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        # Cópia sob o lock: um inc() concorrente com um rótulo novo mudaria o dict durante a iteração
+        with self._lock:
+            values = sorted(self._values.items())
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in values:
+            yield f'{self.name}{_labels(self.label_names, labels)} {value}'
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Contagem por faixa (não cumulativa), soma e total
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def expose(self):
+        # Cópia sob o lock, inclusive das contagens por faixa, que observe() altera no lugar
+        with self._lock:
+            values = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items())
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        names = self.label_names + ('le',)
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ('+Inf',), counts):
+                cumulative += n
+                yield f'{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.label_names, labels)} {total}'
+            yield f'{self.name}_count{_labels(self.label_names, labels)} {count}'
+
+
+class Metrics:
+    """
+    Instrumentação por requisição exposta em `/metrics` (formato Prometheus).
+
+    Latência e contagem de requisições são medidas sempre. O detalhamento
+    (tempo de SQL, linhas retornadas, fases da otimização, serialização e o
+    header Server-Timing) só é coletado numa amostra de `METRICS_SAMPLE_RATE`
+    das requisições, para o custo ficar desprezível sob carga.
+    """
+
+    def __init__(self, app=None):
+        self.sample_rate = 1.0
+        self.requests = Counter('http_requests_total', 'Requisições por endpoint, método e status', ('endpoint', 'method', 'status'))
+        self.latency = Histogram('http_request_duration_seconds', 'Latência das requisições', ('endpoint', 'method'))
+        self.sql_time = Histogram('db_query_duration_seconds', 'Tempo de execução das consultas SQL (amostrado)', ('endpoint',))
+        self.sql_rows = Counter('db_rows_returned_total', 'Linhas retornadas pelas consultas SQL (amostrado)', ('endpoint',))
+        self.phases = Histogram('app_phase_duration_seconds', 'Tempo por fase do processamento (amostrado)', ('endpoint', 'phase'))
+        self._collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = app.config.get('METRICS_SAMPLE_RATE', self.sample_rate)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.expose_view)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.extensions['metrics'] = self
+
+    def register_collector(self, collect):
+        """`collect()` devolve linhas já no formato Prometheus (gauges de outros módulos)."""
+        self._collectors.append(collect)
+
+    # --- Ciclo da requisição ----------------------------------------------
+
+    def _before_request(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        g._metrics_timings = {}
+
+    def _after_request(self, response):
+        start = g.get('_metrics_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = _endpoint()
+        self.requests.inc(endpoint, request.method, response.status_code)
+        self.latency.observe(elapsed, endpoint, request.method)
+
+        if g._metrics_sampled:
+            timings = g._metrics_timings
+            for phase, seconds in timings.items():
+                if phase != 'db':
+                    self.phases.observe(seconds, endpoint, phase)
+            entries = [f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in timings.items()]
+            entries.append(f'total;dur={elapsed * 1000:.1f}')
+            response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+    def expose_view(self):
+        lines = []
+        for metric in (self.requests, self.latency, self.sql_time, self.sql_rows, self.phases):
+            lines.extend(metric.expose())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return Response('\n'.join(lines) + '\n', content_type=PROMETHEUS_MIMETYPE)
+
+
+def _endpoint():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'desconhecido'
+
+
+def _sampled():
+    return has_request_context() and g.get('_metrics_sampled', False)
+
+
+def add_timing(phase, seconds):
+    """Acumula o tempo de uma fase na requisição atual (ignorado fora da amostra)."""
+    if _sampled():
+        timings = g._metrics_timings
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """Mede um trecho como fase da requisição; sem custo fora de requisições amostradas."""
+    if not _sampled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(phase, time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sampled():
+        conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_metrics_query_start')
+    if not starts or not _sampled():
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    endpoint = _endpoint()
+    metrics.sql_time.observe(elapsed, endpoint)
+    # rowcount é -1 em cursores do servidor (streaming)
+    if statement.lstrip()[:6].upper() == 'SELECT' and cursor.rowcount > 0:
+        metrics.sql_rows.inc(endpoint, amount=cursor.rowcount)
+    add_timing('db', elapsed)
+
+
+metrics = Metrics()
@@ -1,29 +1,34 @@
-import math
+import numpy as np
+from app.utils.distance import haversine
+
 
 def calculate_distance(p1, p2):
-    """Distância Euclidiana simples (pode ser substituída por Haversine)"""
-    return math.sqrt((p1['lat'] - p2['lat'])**2 + (p1['lon'] - p2['lon'])**2)
+    """Distância Haversine em metros entre dois pontos {'lat', 'lon'}"""
+    return float(haversine(p1['lon'], p1['lat'], p2['lon'], p2['lat']))
+
 
 def optimize_route(start_point, destinations):
     """
     Algoritmo Vizinho Mais Próximo (Nearest Neighbor).
+    As distâncias de cada passo são calculadas em lote (NumPy) contra
+    todos os destinos ainda não visitados.
     """
     route = [start_point]
-    current = start_point
-    unvisited = destinations.copy()
+    if not destinations:
+        return route
 
-    while unvisited:
-        nearest = None
-        min_dist = float('inf')
+    lons = np.array([p['lon'] for p in destinations], dtype=np.float64)
+    lats = np.array([p['lat'] for p in destinations], dtype=np.float64)
+    visited = np.zeros(len(destinations), dtype=bool)
+    current = start_point
 
-        for point in unvisited:
-            dist = calculate_distance(current, point)
-            if dist < min_dist:
-                min_dist = dist
-                nearest = point
+    for _ in range(len(destinations)):
+        dist = haversine(current['lon'], current['lat'], lons, lats)
+        dist[visited] = np.inf
+        nearest = int(dist.argmin())
 
-        route.append(nearest)
-        unvisited.remove(nearest)
-        current = nearest
+        visited[nearest] = True
+        current = destinations[nearest]
+        route.append(current)
 
-    return route
\ No newline at end of file
+    return route
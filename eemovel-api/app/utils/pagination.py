@@ -0,0 +1,66 @@
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 5000
+
+
+def encode_cursor(last_id):
+    """Token opaco de paginação keyset a partir do último id retornado."""
+    raw = json.dumps({'id': last_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Recupera o último id de um token; None se não houver token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(data['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+        raise ValueError("Cursor de paginação inválido")
+
+
+def parse_limit(value):
+    """Valida o tamanho de página (1..MAX_PAGE_SIZE); usa o padrão se ausente."""
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("O parâmetro 'limit' deve ser um inteiro")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"O parâmetro 'limit' deve estar entre 1 e {MAX_PAGE_SIZE}")
+    return limit
+
+
+def parse_fields(value, allowed):
+    """Lista de campos pedida em `fields=a,b`; None se ausente. Ordem preservada."""
+    if not value:
+        return None
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise ValueError(f"Campo desconhecido: '{name}'. Opções: {', '.join(allowed)}")
+        if name not in fields:
+            fields.append(name)
+    return fields or None
+
+
+def parse_bbox(value):
+    """Converte `minx,miny,maxx,maxy` (lon/lat) numa tupla de floats; None se ausente."""
+    if not value:
+        return None
+    try:
+        minx, miny, maxx, maxy = (float(v) for v in value.split(','))
+    except ValueError:
+        raise ValueError("O parâmetro 'bbox' deve ter o formato minx,miny,maxx,maxy")
+    if minx > maxx or miny > maxy:
+        raise ValueError("bbox inválido: os valores mínimos devem ser menores que os máximos")
+    return minx, miny, maxx, maxy
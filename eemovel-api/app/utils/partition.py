@@ -0,0 +1,135 @@
+import math
+import numpy as np
+
+PARTITIONERS = {}
+DEFAULT_METHOD = 'sweep'
+MAX_PARTITIONS = 64
+
+
+def register_partitioner(name):
+    """Registra uma função `(coords, k, center, weights) -> rótulos` pelo nome."""
+    def decorator(fn):
+        PARTITIONERS[name] = fn
+        return fn
+    return decorator
+
+
+def partition(coords, k, method=None, center=None, weights=None):
+    """
+    Divide os pontos (array n x 2, em metros) em até `k` regiões compactas.
+    Retorna a lista de arrays de índices de cada região (sem regiões vazias).
+    `weights` (ex.: peso dos itens) equilibra as regiões pela carga em vez
+    da contagem. Levanta ValueError para método desconhecido.
+    """
+    method = method or DEFAULT_METHOD
+    if method not in PARTITIONERS:
+        raise ValueError(f"Particionamento desconhecido: '{method}'. Opções: {', '.join(sorted(PARTITIONERS))}")
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    k = max(1, min(int(k), n))
+    if k == 1:
+        return [np.arange(n)] if n else []
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+    center = coords.mean(axis=0) if center is None else np.asarray(center, dtype=np.float64)
+
+    labels = PARTITIONERS[method](coords, k, center, weights)
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    return [region for region in np.split(order, bounds) if len(region)]
+
+
+def _split(order, parts, weights):
+    """Corta `order` em `parts` trechos contíguos de peso parecido; devolve o rótulo de cada posição."""
+    cumulative = np.cumsum(weights[order])
+    total = cumulative[-1] if len(cumulative) else 0.0
+    if total <= 0:
+        return np.minimum(np.arange(len(order)) * parts // max(len(order), 1), parts - 1)
+    # Cada ponto vai para o trecho que contém o meio do seu peso
+    return np.minimum(((cumulative - weights[order] / 2) / total * parts).astype(np.int64), parts - 1)
+
+
+@register_partitioner('sweep')
+def sweep(coords, k, center, weights):
+    """
+    Setores angulares em volta do centro (ou do depósito), com carga parecida.
+    A varredura começa na maior abertura entre ângulos consecutivos, para
+    que nenhum setor atravesse um vazio.
+    """
+    angles = np.arctan2(coords[:, 1] - center[1], coords[:, 0] - center[0])
+    order = np.argsort(angles, kind='stable')
+    sorted_angles = angles[order]
+    gaps = np.diff(np.concatenate([sorted_angles, sorted_angles[:1] + 2 * math.pi]))
+    order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+
+    labels = np.empty(len(coords), dtype=np.int64)
+    labels[order] = _split(order, k, weights)
+    return labels
+
+
+@register_partitioner('grid')
+def grid(coords, k, center, weights):
+    """
+    Células de uma grade por quantis: faixas verticais e, dentro de cada uma,
+    faixas horizontais, todas com carga parecida (k não precisa ser quadrado).
+    """
+    columns = math.ceil(math.sqrt(k))
+    rows = [k // columns + (c < k % columns) for c in range(columns)]
+    labels = np.empty(len(coords), dtype=np.int64)
+
+    by_x = np.argsort(coords[:, 0], kind='stable')
+    column_of = _split(by_x, k, weights)
+    # Coluna c recebe os trechos [início_c, início_c + rows[c]) do corte em k
+    starts = np.cumsum([0, *rows])
+    column_of = np.searchsorted(starts, column_of, side='right') - 1
+    for c in range(columns):
+        members = by_x[column_of == c]
+        if not len(members):
+            continue
+        by_y = members[np.argsort(coords[members, 1], kind='stable')]
+        labels[by_y] = starts[c] + _split(by_y, rows[c], weights)
+    return labels
+
+
+def _seed_empty(coords, labels, centroids):
+    """
+    Grupos sem pontos recebem o ponto mais distante do próprio centroide
+    (tirado de um grupo com mais de um ponto), que passa a ser o centroide.
+    Supõe k <= n. Altera `labels` e `centroids`.
+    """
+    counts = np.bincount(labels, minlength=len(centroids))
+    for c in np.flatnonzero(counts == 0):
+        d = ((coords - centroids[labels]) ** 2).sum(axis=1)
+        d[counts[labels] < 2] = -1
+        far = int(d.argmax())
+        counts[labels[far]] -= 1
+        counts[c] = 1
+        labels[far] = c
+        centroids[c] = coords[far]
+
+
+@register_partitioner('kmeans')
+def kmeans(coords, k, center, weights, iterations=20):
+    """k-means (Lloyd) ponderado, partindo dos setores da varredura. Regiões compactas, carga livre."""
+    labels = sweep(coords, k, center, weights)
+    # Com pesos desiguais a varredura pode deixar setores vazios: eles não têm média
+    centroids = np.zeros((k, 2))
+    for c in np.unique(labels):
+        centroids[c] = coords[labels == c].mean(axis=0)
+    _seed_empty(coords, labels, centroids)
+    for _ in range(iterations):
+        labels = np.empty(len(coords), dtype=np.int64)
+        # Em blocos, para não montar a matriz n x k inteira com muitos pontos
+        for start in range(0, len(coords), 65536):
+            block = coords[start:start + 65536]
+            d = ((block[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+            labels[start:start + 65536] = d.argmin(axis=1)
+        _seed_empty(coords, labels, centroids)
+        moved = centroids.copy()
+        for c in range(k):
+            mask = labels == c
+            if mask.any():
+                moved[c] = np.average(coords[mask], axis=0, weights=weights[mask] if weights[mask].sum() > 0 else None)
+        if np.allclose(moved, centroids):
+            break
+        centroids = moved
+    return labels
@@ -0,0 +1,206 @@
+import heapq
+import math
+import xml.etree.ElementTree as ET
+import numpy as np
+from app.utils.distance import as_lonlat_array, haversine, project_local
+from app.utils.spatial_index import KDTree
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as _csgraph_dijkstra
+except ImportError:  # opcional: sem o scipy o Dijkstra roda em Python puro
+    csr_matrix = _csgraph_dijkstra = None
+
+# Vias do OSM (tag highway) usadas pelos veículos de entrega
+DRIVABLE_HIGHWAYS = frozenset({
+    'motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified', 'residential',
+    'motorway_link', 'trunk_link', 'primary_link', 'secondary_link', 'tertiary_link',
+    'living_street', 'service', 'road'
+})
+# Origens por lote no Dijkstra do scipy: cada lote ocupa batch * nós floats
+SCIPY_BATCH = 64
+
+
+class RoadGraph:
+    """
+    Grafo viário dirigido, com arestas ponderadas pelo comprimento em metros.
+
+    Os nós têm (lon, lat); as arestas ficam em CSR (`indptr`, `indices`,
+    `weights`) nos dois sentidos, para o Dijkstra partir sempre do lado com
+    menos pontos (das origens, ou dos destinos no grafo reverso).
+    """
+
+    def __init__(self, lon, lat, sources, targets, weights):
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.forward = self._csr(self.sources, self.targets)
+        self.reverse = self._csr(self.targets, self.sources)
+        self._origin_lat = float(self.lat.mean()) if len(self.lat) else 0.0
+        self._tree = None
+
+    def __len__(self):
+        return len(self.lon)
+
+    def _csr(self, sources, targets):
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self)), out=indptr[1:])
+        return indptr, targets[order], self.weights[order]
+
+    # --- Arquivo ----------------------------------------------------------
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['lon'], data['lat'], data['sources'], data['targets'], data['weights'])
+
+    def save(self, path):
+        np.savez_compressed(path, lon=self.lon, lat=self.lat, sources=self.sources,
+                            targets=self.targets, weights=self.weights)
+
+    # --- Consultas --------------------------------------------------------
+
+    def snap(self, points):
+        """Nó mais próximo de cada ponto (lon, lat) e a distância até ele, em metros."""
+        if self._tree is None:
+            self._tree = KDTree(project_local(np.column_stack((self.lon, self.lat)), self._origin_lat).tolist())
+        nodes, offsets = [], []
+        for x, y in project_local(points, self._origin_lat):
+            node, dist = self._tree.nearest(x, y)
+            nodes.append(node)
+            offsets.append(dist)
+        return np.asarray(nodes, dtype=np.int64), np.asarray(offsets, dtype=np.float64)
+
+    def shortest_paths(self, sources, targets):
+        """
+        Matriz (len(sources) x len(targets)) de menores caminhos entre nós,
+        em metros; `inf` onde não há caminho. Cada origem distinta roda um
+        Dijkstra, que para assim que todos os destinos são alcançados.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if len(np.unique(targets)) < len(np.unique(sources)):
+            return self._shortest_paths(targets, sources, self.reverse).T
+        return self._shortest_paths(sources, targets, self.forward)
+
+    def _shortest_paths(self, sources, targets, csr):
+        unique_sources, inverse = np.unique(sources, return_inverse=True)
+        out = np.empty((len(unique_sources), len(targets)), dtype=np.float64)
+        if _csgraph_dijkstra is not None:
+            indptr, indices, weights = csr
+            graph = csr_matrix((weights, indices, indptr), shape=(len(self), len(self)))
+            for start in range(0, len(unique_sources), SCIPY_BATCH):
+                batch = unique_sources[start:start + SCIPY_BATCH]
+                out[start:start + len(batch)] = _csgraph_dijkstra(graph, indices=batch)[:, targets]
+        else:
+            adjacency = tuple(arr.tolist() for arr in csr)
+            wanted = set(targets.tolist())
+            for row, source in enumerate(unique_sources.tolist()):
+                dist = _dijkstra(adjacency, source, wanted)
+                out[row] = [dist.get(t, math.inf) for t in targets.tolist()]
+        return out[inverse]
+
+    def distance_matrix(self, a, b=None):
+        """
+        Distâncias pela malha viária entre pontos (lon, lat), em metros: a ida
+        até o nó mais próximo, o menor caminho e a saída do nó de destino.
+        Pares sem caminho no grafo (ex.: componentes desconexos) caem na
+        distância em linha reta.
+        """
+        a = as_lonlat_array(a)
+        b = a if b is None else as_lonlat_array(b)
+        if not len(a) or not len(b):
+            return np.zeros((len(a), len(b)))
+        nodes_a, offsets_a = self.snap(a)
+        nodes_b, offsets_b = (nodes_a, offsets_a) if b is a else self.snap(b)
+        straight = haversine(a[:, None, 0], a[:, None, 1], b[None, :, 0], b[None, :, 1])
+        road = self.shortest_paths(nodes_a, nodes_b) + offsets_a[:, None] + offsets_b[None, :]
+        road = np.where(np.isfinite(road), road, straight)
+        # O mesmo ponto não passa pela malha
+        return np.where(straight == 0, 0.0, road)
+
+
+def _dijkstra(adjacency, source, targets):
+    indptr, indices, weights = adjacency
+    dist = {source: 0.0}
+    settled = set()
+    remaining = len(targets)
+    heap = [(0.0, source)]
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u in targets:
+            remaining -= 1
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return {node: dist[node] for node in settled}
+
+
+def _oneway(tags):
+    value = tags.get('oneway', '')
+    if value in ('yes', '1', 'true'):
+        return 1
+    if value == '-1':
+        return -1
+    if tags.get('junction') in ('roundabout', 'circular') or tags.get('highway') == 'motorway':
+        return 0 if value == 'no' else 1
+    return 0
+
+
+def build_graph_from_osm(path, highways=DRIVABLE_HIGHWAYS):
+    """
+    Monta o grafo viário a partir de um extrato OSM em XML (.osm), lido em
+    streaming. Mantém só as vias de `highways` e os nós usados por elas;
+    `oneway` e rotatórias viram arestas num único sentido.
+    """
+    coords = {}
+    ways = []
+    nds = []
+    tags = {}
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == 'node':
+            coords[int(elem.get('id'))] = (float(elem.get('lon')), float(elem.get('lat')))
+            tags = {}
+            elem.clear()
+        elif elem.tag == 'nd':
+            nds.append(int(elem.get('ref')))
+        elif elem.tag == 'tag':
+            tags[elem.get('k')] = elem.get('v')
+        elif elem.tag == 'way':
+            if tags.get('highway') in highways and len(nds) > 1:
+                ways.append((nds, _oneway(tags)))
+            nds, tags = [], {}
+            elem.clear()
+        elif elem.tag == 'relation':
+            nds, tags = [], {}
+            elem.clear()
+
+    index = {}
+    sources, targets = [], []
+    for refs, oneway in ways:
+        refs = [ref for ref in refs if ref in coords]
+        for u, v in zip(refs, refs[1:]):
+            u, v = index.setdefault(u, len(index)), index.setdefault(v, len(index))
+            if oneway >= 0:
+                sources.append(u)
+                targets.append(v)
+            if oneway <= 0:
+                sources.append(v)
+                targets.append(u)
+
+    lonlat = np.empty((len(index), 2), dtype=np.float64)
+    for ref, i in index.items():
+        lonlat[i] = coords[ref]
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    weights = haversine(lonlat[sources, 0], lonlat[sources, 1], lonlat[targets, 0], lonlat[targets, 1])
+    return RoadGraph(lonlat[:, 0], lonlat[:, 1], sources, targets, weights)
@@ -0,0 +1,131 @@
+import math
+from app.utils.cvrp import CVRPSolver, DEFAULT_TIME_BUDGET
+from app.utils.spatial_index import KDTree
+
+ENGINES = {}
+DEFAULT_ENGINE = 'kdtree'
+
+
+def register_engine(cls):
+    """Registra uma engine de montagem de viagens pelo seu `name`."""
+    ENGINES[cls.name] = cls
+    return cls
+
+
+def get_engine(name=None):
+    """Instancia a engine pedida (ou a padrão). Levanta ValueError se não existir."""
+    name = name or DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Engine de otimização desconhecida: '{name}'. Opções: {', '.join(sorted(ENGINES))}")
+    return ENGINES[name]()
+
+
+def _planar_distance(p1, p2):
+    dx = p1[0] - p2[0]
+    dy = p1[1] - p2[1]
+    return math.sqrt(dx * dx + dy * dy)
+
+
+class RouteEngine:
+    """
+    Interface das engines de roteirização.
+
+    `build_trips` recebe uma lista de coordenadas (x, y) e a capacidade do
+    veículo e devolve a lista de viagens, cada uma com os índices dos pontos
+    na ordem de visita. Opções extras (demandas, depósito...) chegam como
+    argumentos nomeados e são ignoradas pelas engines que não as usam.
+
+    Com `distances` (matriz n x n, ou (n + 1) x (n + 1) com o depósito na
+    última posição), a proximidade passa a vir da matriz em vez das
+    coordenadas, ex.: distâncias pela malha viária.
+    """
+    name = None
+    # Engines com depósito: as viagens saem e voltam para ele
+    uses_depot = False
+
+    def build_trips(self, coords, capacity, **options):
+        raise NotImplementedError
+
+
+@register_engine
+class LinearScanEngine(RouteEngine):
+    """Heurística original do Vizinho Mais Próximo: varredura linear, O(n²)."""
+    name = 'linear'
+
+    def build_trips(self, coords, capacity, distances=None, **options):
+        if distances is not None:
+            distance = lambda i, j: distances[i][j]
+        else:
+            distance = lambda i, j: _planar_distance(coords[i], coords[j])
+        unvisited = list(range(len(coords)))
+        trips = []
+
+        while unvisited:
+            current = unvisited.pop(0)
+            trip = [current]
+
+            while len(trip) < capacity and unvisited:
+                origin = current
+                closest = min(unvisited, key=lambda i: distance(origin, i))
+                unvisited.remove(closest)
+                trip.append(closest)
+                current = closest
+
+            trips.append(trip)
+
+        return trips
+
+
+@register_engine
+class KDTreeEngine(RouteEngine):
+    """
+    Vizinho Mais Próximo apoiado em KD-tree com remoção, O(n log n) no caso médio.
+    Produz exatamente as mesmas viagens da varredura linear.
+    """
+    name = 'kdtree'
+
+    def build_trips(self, coords, capacity, distances=None, **options):
+        # A KD-tree só vale para distância euclidiana; com matriz, a varredura dá o mesmo resultado
+        if distances is not None:
+            return LinearScanEngine().build_trips(coords, capacity, distances=distances)
+        tree = KDTree(coords)
+        trips = []
+        # Próximo índice candidato a iniciar viagem (o primeiro ainda não visitado)
+        start = 0
+
+        while len(tree):
+            while start not in tree:
+                start += 1
+            current = start
+            tree.remove(current)
+            trip = [current]
+
+            while len(trip) < capacity and len(tree):
+                closest, _ = tree.nearest(*coords[current])
+                tree.remove(closest)
+                trip.append(closest)
+                current = closest
+
+            trips.append(trip)
+
+        return trips
+
+
+@register_engine
+class CVRPEngine(RouteEngine):
+    """
+    CVRP: depósito, peso por item e capacidade em unidades de peso.
+    Economias de Clarke-Wright seguidas de 2-opt/or-opt/relocate.
+    """
+    name = 'cvrp'
+    uses_depot = True
+
+    def build_trips(self, coords, capacity, demands=None, depot=None, time_budget=DEFAULT_TIME_BUDGET,
+                    distances=None, **options):
+        if not coords:
+            return []
+        if demands is None:
+            demands = [1.0] * len(coords)
+        if depot is None:
+            depot = (sum(c[0] for c in coords) / len(coords), sum(c[1] for c in coords) / len(coords))
+        return CVRPSolver(coords, demands, capacity, depot, distances=distances).solve(time_budget)
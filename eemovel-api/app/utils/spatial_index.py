@@ -0,0 +1,167 @@
+import math
+import numpy as np
+
+
+class KDTree:
+    """
+    KD-tree 2D com remoção de pontos, usada na busca do vizinho mais próximo.
+
+    A árvore é implícita: os índices ficam em `_perm` e o nó de cada
+    subárvore [lo, hi) é a posição do meio. `_count` guarda quantos pontos
+    ainda vivos existem em cada subárvore, permitindo podar ramos vazios
+    depois das remoções.
+    """
+
+    def __init__(self, coords):
+        self._xs = [float(c[0]) for c in coords]
+        self._ys = [float(c[1]) for c in coords]
+        self._n = len(self._xs)
+        self._perm = list(range(self._n))
+        self._count = [0] * self._n
+        self._alive = [True] * self._n
+        self._size = self._n
+
+        self._build(0, self._n, 0)
+
+        self._pos = [0] * self._n
+        for position, idx in enumerate(self._perm):
+            self._pos[idx] = position
+
+    def _build(self, lo, hi, axis):
+        if lo >= hi:
+            return
+        values = self._xs if axis == 0 else self._ys
+        self._perm[lo:hi] = sorted(self._perm[lo:hi], key=values.__getitem__)
+        mid = (lo + hi) // 2
+        self._count[mid] = hi - lo
+        self._build(lo, mid, 1 - axis)
+        self._build(mid + 1, hi, 1 - axis)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, idx):
+        return 0 <= idx < self._n and self._alive[idx]
+
+    def remove(self, idx):
+        """Remove o ponto `idx` da árvore (O(log n))."""
+        if idx not in self:
+            raise KeyError(idx)
+
+        target = self._pos[idx]
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            self._count[mid] -= 1
+            if target == mid:
+                break
+            if target < mid:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        self._alive[idx] = False
+        self._size -= 1
+
+    def nearest(self, x, y):
+        """
+        Retorna (indice, distancia) do ponto vivo mais próximo de (x, y).
+        Empates são resolvidos pelo menor índice, como o `min()` sobre a lista.
+        """
+        xs, ys = self._xs, self._ys
+        perm, count, alive = self._perm, self._count, self._alive
+
+        best_idx = -1
+        best_dist = math.inf
+        stack = [(0, self._n, 0, 0.0)]
+
+        while stack:
+            lo, hi, axis, bound = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if count[mid] == 0 or bound > best_dist:
+                continue
+
+            idx = perm[mid]
+            if alive[idx]:
+                # Mesma fórmula usada pelo GEOS para distância entre pontos
+                dx = x - xs[idx]
+                dy = y - ys[idx]
+                dist = math.sqrt(dx * dx + dy * dy)
+                if dist < best_dist or (dist == best_dist and idx < best_idx):
+                    best_idx, best_dist = idx, dist
+
+            diff = x - xs[idx] if axis == 0 else y - ys[idx]
+            next_axis = 1 - axis
+            # O lado mais próximo é empilhado por último para ser visitado primeiro
+            if diff < 0:
+                stack.append((mid + 1, hi, next_axis, -diff))
+                stack.append((lo, mid, next_axis, 0.0))
+            else:
+                stack.append((lo, mid, next_axis, diff))
+                stack.append((mid + 1, hi, next_axis, 0.0))
+
+        return best_idx, best_dist
+
+
+class GridIndex:
+    """
+    Grade regular sobre pontos (x, y) guardados em arrays NumPy, para buscas
+    por retângulo em conjuntos grandes.
+
+    Cada ponto recebe a chave da sua célula (coluna * linhas + linha) e os
+    índices ficam ordenados por ela: dentro de uma coluna, as células de uma
+    faixa de linhas são um trecho contíguo da ordem, achado com dois
+    `searchsorted`. A grade é montada de uma vez (um argsort) e não muda; o
+    lado da célula mira `per_cell` pontos por célula em média.
+    """
+
+    def __init__(self, xs, ys, per_cell=32):
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        # Pontos sem coordenada (NaN) ficam fora da grade
+        indexed = np.flatnonzero(np.isfinite(self.xs) & np.isfinite(self.ys))
+        n = len(indexed)
+        if n:
+            xs, ys = self.xs[indexed], self.ys[indexed]
+            self.min_x, self.min_y = float(xs.min()), float(ys.min())
+            span_x = float(xs.max()) - self.min_x
+            span_y = float(ys.max()) - self.min_y
+        else:
+            self.min_x = self.min_y = span_x = span_y = 0.0
+        cells = max(1, n // per_cell)
+        # Com os pontos numa linha a área é ~0: o maior lado limita o número de células
+        self.cell = max(math.sqrt(span_x * span_y / cells), max(span_x, span_y) / cells, 1e-9)
+        self.columns = int(span_x / self.cell) + 1
+        self.rows = int(span_y / self.cell) + 1
+
+        keys = self._column(self.xs[indexed]) * self.rows + self._row(self.ys[indexed])
+        order = np.argsort(keys, kind='stable')
+        self.order = indexed[order]
+        self.keys = keys[order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def _column(self, x):
+        return np.clip(((np.asarray(x) - self.min_x) / self.cell).astype(np.int64), 0, self.columns - 1)
+
+    def _row(self, y):
+        return np.clip(((np.asarray(y) - self.min_y) / self.cell).astype(np.int64), 0, self.rows - 1)
+
+    def query_bbox(self, min_x, min_y, max_x, max_y):
+        """Índices (array) dos pontos dentro do retângulo, bordas incluídas, em ordem crescente."""
+        if not len(self) or min_x > max_x or min_y > max_y:
+            return np.empty(0, dtype=np.int64)
+        if max_x < self.min_x or max_y < self.min_y:
+            return np.empty(0, dtype=np.int64)
+        c0, c1 = int(self._column(min_x)), int(self._column(max_x))
+        r0, r1 = int(self._row(min_y)), int(self._row(max_y))
+        columns = np.arange(c0, c1 + 1) * self.rows
+        starts = np.searchsorted(self.keys, columns + r0, side='left')
+        ends = np.searchsorted(self.keys, columns + r1, side='right')
+        candidates = np.concatenate([self.order[s:e] for s, e in zip(starts, ends)] or [np.empty(0, dtype=np.int64)])
+        x, y = self.xs[candidates], self.ys[candidates]
+        inside = (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+        return np.sort(candidates[inside])
@@ -0,0 +1,52 @@
+import json
+from flask import Response, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Linhas lidas por vez do cursor do servidor e agrupadas em cada chunk HTTP
+STREAM_CHUNK_SIZE = 1000
+
+
+def wants_stream(req):
+    """O cliente pediu streaming via `?stream=1` ou `Accept: application/x-ndjson`?"""
+    if req.args.get('stream', type=int):
+        return True
+    return req.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def _chunks(lines, chunk_size):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_ndjson(rows, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """Um objeto JSON por linha, agrupado em chunks de `chunk_size` linhas."""
+    return _chunks((json.dumps(serialize(row)) + '\n' for row in rows), chunk_size)
+
+
+def iter_json_array(rows, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """Array JSON válido, emitido incrementalmente."""
+    def lines():
+        yield '['
+        for position, row in enumerate(rows):
+            yield (',' if position else '') + json.dumps(serialize(row))
+        yield ']\n'
+    return _chunks(lines(), chunk_size)
+
+
+def stream_response(req, rows, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Monta a resposta em streaming (NDJSON ou array JSON conforme o Accept).
+    `rows` deve ser um iterável preguiçoso, ex.: `query.yield_per(n)`.
+    """
+    if req.accept_mimetypes.best == NDJSON_MIMETYPE:
+        body, mimetype = iter_ndjson(rows, serialize, chunk_size), NDJSON_MIMETYPE
+    else:
+        body, mimetype = iter_json_array(rows, serialize, chunk_size), 'application/json'
+    return Response(stream_with_context(body), mimetype=mimetype)
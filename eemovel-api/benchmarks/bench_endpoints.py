@@ -0,0 +1,275 @@
+"""
+Benchmark dos endpoints de itens (listagem, raio, bbox, criação, exportação e otimização)
+sobre nuvens de pontos sintéticas (ver benchmarks/generators.py).
+
+Alvos:
+    memoria  executa em processo o caminho de cada endpoint sem banco
+             (serialização, filtros vetorizados, validação e solver)
+    postgis  requisições reais pelo cliente de testes do Flask contra o banco
+             configurado na aplicação; APAGA a tabela items a cada tamanho
+
+Uso (a partir de eemovel-api/):
+    python -m benchmarks.bench_endpoints --sizes 1000 10000 --output resultados.json
+    python -m benchmarks.bench_endpoints --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_endpoints --alvo postgis --reset --sizes 10000 100000
+
+Com --baseline, compara a mediana de cada caso com o resultado guardado e
+termina com código 1 se algum ficar mais lento que a tolerância.
+"""
+import argparse
+import bisect
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from benchmarks.generators import CENTRO, GERADORES, gerar_itens
+from app.models.item import Item
+from app.services import export_service
+from app.services.bulk_loader import normalize_record
+from app.services.optimization import solve_optimization
+from app.utils.distance import haversine
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.streaming import iter_ndjson
+
+CASOS = ('lista', 'lista_stream', 'raio', 'bbox', 'criacao', 'exportacao', 'otimizacao')
+# A exportação colunar depende do pyarrow (opcional)
+CASOS_PADRAO = [caso for caso in CASOS if caso != 'exportacao' or export_service.pa is not None]
+RAIO_M = 1000
+BBOX = (CENTRO[0] - 0.01, CENTRO[1] - 0.01, CENTRO[0] + 0.01, CENTRO[1] + 0.01)
+# Diferenças absolutas abaixo disso são ruído de medição
+RUIDO_S = 0.001
+
+
+class AlvoMemoria:
+    """Caminho de cada endpoint em processo, com os itens em memória."""
+    nome = 'memoria'
+
+    def preparar(self, pontos, itens):
+        self.pontos = pontos
+        self.itens = [dict(item, id=i) for i, item in enumerate(itens, start=1)]
+        self.ids = [item['id'] for item in self.itens]
+        # O CSV que o COPY ... TO STDOUT do /items/export devolveria
+        self.csv = ''.join(
+            f"{item['id']},{item['nome']},{item['descricao'] or ''},{item['latitude']!r},{item['longitude']!r},{item['peso']}\n"
+            for item in self.itens
+        ).encode()
+
+    def lista(self):
+        # Página keyset a partir do meio da tabela
+        inicio = bisect.bisect_right(self.ids, self.ids[len(self.ids) // 2])
+        json.dumps(self.itens[inicio:inicio + DEFAULT_PAGE_SIZE])
+
+    def lista_stream(self):
+        for _ in iter_ndjson(self.itens, lambda item: item):
+            pass
+
+    def _pagina(self, mascara):
+        json.dumps([self.itens[i] for i in np.flatnonzero(mascara)[:MAX_PAGE_SIZE]])
+
+    def raio(self):
+        distancias = haversine(CENTRO[0], CENTRO[1], self.pontos[:, 0], self.pontos[:, 1])
+        self._pagina(distancias <= RAIO_M)
+
+    def bbox(self):
+        lng, lat = self.pontos[:, 0], self.pontos[:, 1]
+        self._pagina((lng >= BBOX[0]) & (lat >= BBOX[1]) & (lng <= BBOX[2]) & (lat <= BBOX[3]))
+
+    def exportacao(self):
+        # Mesmo caminho do /items/export?format=arrow: CSV do COPY -> colunas -> Arrow IPC
+        schema = export_service.export_schema()
+        sink = io.BytesIO()
+        with export_service.pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_table(export_service.to_export_batch(export_service.parse_copy_csv(io.BytesIO(self.csv)), schema))
+
+    def criacao(self):
+        # Validação, montagem do modelo e serialização da resposta (sem o INSERT)
+        nome, descricao, lng, lat, peso = normalize_record(self.itens[0])
+        Item(nome=nome, descricao=descricao, localizacao=f'SRID=4326;POINT({lng} {lat})', peso=peso)
+        json.dumps({'nome': nome, 'descricao': descricao, 'latitude': lat, 'longitude': lng, 'peso': peso})
+
+    def otimizacao(self, engine, capacity):
+        solve_optimization(self.itens, engine=engine, capacity=capacity, time_budget=0)
+
+
+class AlvoPostgis:
+    """Requisições pelo cliente de testes do Flask contra o PostGIS configurado."""
+    nome = 'postgis'
+
+    def __init__(self):
+        from flask_jwt_extended import create_access_token
+        from app import create_app
+        from app.services.result_cache import optimize_cache
+        from app.utils.metrics import metrics
+
+        self.app = create_app()
+        self.client = self.app.test_client()
+        # O benchmark mede o cálculo, não o cache nem a amostragem de métricas
+        optimize_cache.enabled = False
+        metrics.sample_rate = 0
+        with self.app.app_context():
+            self.headers = {'Authorization': f'Bearer {create_access_token(identity="benchmark")}'}
+
+    def preparar(self, pontos, itens):
+        from sqlalchemy import text
+        from app.extensions import db
+        from app.services.bulk_loader import load_items
+
+        csv_data = io.StringIO()
+        csv_data.write('nome,descricao,latitude,longitude,peso\n')
+        for item in itens:
+            csv_data.write(f"{item['nome']},{item['descricao']},{item['latitude']!r},{item['longitude']!r},{item['peso']}\n")
+        csv_data.seek(0)
+
+        with self.app.app_context():
+            db.session.execute(text('TRUNCATE items RESTART IDENTITY'))
+            db.session.commit()
+            report = load_items(csv_data, 'csv', defer_index=True)
+            if report['inseridos'] != len(itens):
+                raise RuntimeError(f"Carga incompleta: {report['inseridos']} de {len(itens)} itens")
+
+    def _get(self, url):
+        response = self.client.get(url, headers=self.headers)
+        # Consome o corpo (necessário nas respostas em streaming)
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+
+    def lista(self):
+        self._get(f'/items/?limit={DEFAULT_PAGE_SIZE}')
+
+    def lista_stream(self):
+        self._get('/items/?stream=1')
+
+    def raio(self):
+        self._get(f'/items/?lat={CENTRO[1]}&lng={CENTRO[0]}&radius={RAIO_M}&limit={MAX_PAGE_SIZE}')
+
+    def bbox(self):
+        self._get(f"/items/?bbox={','.join(map(str, BBOX))}&limit={MAX_PAGE_SIZE}")
+
+    def criacao(self):
+        item = {'nome': 'Benchmark', 'latitude': CENTRO[1], 'longitude': CENTRO[0]}
+        response = self.client.post('/items/', json=item, headers=self.headers)
+        if response.status_code != 201:
+            raise RuntimeError(f'POST /items/: HTTP {response.status_code}')
+
+    def exportacao(self):
+        self._get('/items/export?format=arrow')
+
+    def otimizacao(self, engine, capacity):
+        self._get(f'/items/optimize?engine={engine}&capacity={capacity}&time_budget=0')
+
+
+ALVOS = {'memoria': AlvoMemoria, 'postgis': AlvoPostgis}
+
+
+def medir(funcao, repeticoes, aquecimento=1):
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return {
+        'mediana_s': statistics.median(tempos),
+        'p95_s': tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))],
+        'min_s': tempos[0],
+        'repeticoes': repeticoes
+    }
+
+
+def executar(args):
+    alvo = ALVOS[args.alvo]()
+    resultados = []
+    for gerador in args.geradores:
+        for n in args.sizes:
+            pontos = GERADORES[gerador](n, seed=args.seed)
+            alvo.preparar(pontos, gerar_itens(pontos, seed=args.seed))
+            for caso in args.casos:
+                if caso == 'otimizacao':
+                    if n > args.optimize_max:
+                        continue
+                    funcao = lambda: alvo.otimizacao(args.engine, args.capacity)
+                else:
+                    funcao = getattr(alvo, caso)
+                medida = medir(funcao, args.repeticoes)
+                resultados.append({'caso': caso, 'gerador': gerador, 'n': n, **medida})
+                print(f"{caso:>13} {gerador:>9} {n:>9} {medida['mediana_s'] * 1000:>11.2f}ms "
+                      f"p95 {medida['p95_s'] * 1000:.2f}ms", file=sys.stderr)
+    return {
+        'ambiente': {
+            'alvo': args.alvo,
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'seed': args.seed,
+            'engine': args.engine,
+            'capacidade': args.capacity,
+            'data': datetime.now(timezone.utc).isoformat(timespec='seconds')
+        },
+        'resultados': resultados
+    }
+
+
+def comparar(atual, baseline, tolerancia):
+    """Lista de regressões: casos cuja mediana passou de baseline * (1 + tolerancia)."""
+    anteriores = {(r['caso'], r['gerador'], r['n']): r for r in baseline['resultados']}
+    regressoes = []
+    for r in atual['resultados']:
+        anterior = anteriores.get((r['caso'], r['gerador'], r['n']))
+        if anterior is None:
+            continue
+        limite = anterior['mediana_s'] * (1 + tolerancia)
+        if r['mediana_s'] > limite and r['mediana_s'] - anterior['mediana_s'] > RUIDO_S:
+            regressoes.append({
+                'caso': r['caso'], 'gerador': r['gerador'], 'n': r['n'],
+                'baseline_s': anterior['mediana_s'], 'atual_s': r['mediana_s'],
+                'variacao': round(r['mediana_s'] / anterior['mediana_s'] - 1, 4)
+            })
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alvo', choices=sorted(ALVOS), default='memoria')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--geradores', nargs='+', choices=sorted(GERADORES), default=sorted(GERADORES))
+    parser.add_argument('--casos', nargs='+', choices=CASOS, default=CASOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--engine', default='kdtree', help='Engine usada no caso otimizacao')
+    parser.add_argument('--capacity', type=float, default=3)
+    parser.add_argument('--optimize-max', type=int, default=100000, help='Maior n no caso otimizacao')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados (padrão: stdout)')
+    parser.add_argument('--baseline', help='Resultado anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Piora relativa aceita sobre a baseline')
+    parser.add_argument('--reset', action='store_true', help='Confirma que o alvo postgis pode apagar a tabela items')
+    args = parser.parse_args()
+
+    if args.alvo == 'postgis' and not args.reset:
+        parser.error('o alvo postgis apaga e recarrega a tabela items; confirme com --reset')
+
+    atual = executar(args)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            atual['regressoes'] = comparar(atual, json.load(f), args.tolerancia)
+
+    saida = json.dumps(atual, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(saida + '\n')
+    else:
+        print(saida)
+
+    for r in atual.get('regressoes', []):
+        print(f"REGRESSÃO {r['caso']} {r['gerador']} n={r['n']}: "
+              f"{r['baseline_s'] * 1000:.2f}ms -> {r['atual_s'] * 1000:.2f}ms (+{r['variacao']:.0%})", file=sys.stderr)
+    return 1 if atual.get('regressoes') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
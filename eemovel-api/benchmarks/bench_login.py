@@ -0,0 +1,62 @@
+"""
+Benchmark do login: vazão com e sem o cache de verificações do LoginService.
+
+Simula clientes de integração que fazem login repetidamente com as mesmas
+credenciais, em várias threads, sem banco (o usuário vem de um dicionário).
+
+Uso (a partir de eemovel-api/):
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --logins 200 --threads 8 --rounds 12
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask_bcrypt import Bcrypt
+from app.services.auth_service import LoginService
+
+
+def medir(service, usuarios, logins, threads):
+    credenciais = list(usuarios)
+
+    def login(i):
+        email = credenciais[i % len(credenciais)]
+        inicio = time.perf_counter()
+        assert service.authenticate(email, 'senha', load_user=usuarios.get) is not None
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencias = sorted(pool.map(login, range(logins)))
+    total = time.perf_counter() - inicio
+    return {
+        'logins_por_s': logins / total,
+        'mediana_ms': statistics.median(latencias) * 1000,
+        'p95_ms': latencias[int(0.95 * (len(latencias) - 1))] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clientes', type=int, default=4, help='Usuários distintos fazendo login')
+    parser.add_argument('--rounds', type=int, default=12, help='Custo do bcrypt (padrão do Flask-Bcrypt)')
+    args = parser.parse_args()
+
+    hasher = Bcrypt()
+    hasher._log_rounds = args.rounds
+    password_hash = hasher.generate_password_hash('senha').decode('utf-8')
+    usuarios = {f'cliente{i}@eemovel.com': (i, password_hash) for i in range(args.clientes)}
+
+    print(f"{'modo':>10} {'logins/s':>10} {'mediana':>10} {'p95':>10}")
+    for modo, ttl in (('sem_cache', 0), ('com_cache', 300)):
+        service = LoginService()
+        service.ttl = ttl
+        service.max_pending = args.logins
+        r = medir(service, usuarios, args.logins, args.threads)
+        print(f"{modo:>10} {r['logins_por_s']:>10.1f} {r['mediana_ms']:>8.1f}ms {r['p95_ms']:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark da otimização particionada: ganho de tempo contra perda de qualidade.
+
+Para cada tamanho, resolve sem particionar (referência) e com cada número
+de regiões, e mostra o tempo, o speedup, a distância total e a perda em
+relação à referência. Os workers são `max(--partitions)`, limitados aos
+núcleos disponíveis (ver `--workers`).
+
+Uso (a partir de eemovel-api/):
+    python -m benchmarks.bench_partitioned
+    python -m benchmarks.bench_partitioned --sizes 20000 --engine cvrp --capacity 20 --partitions 1 2 4 8
+"""
+import argparse
+import os
+import time
+import numpy as np
+from benchmarks.generators import GERADORES
+from app.services.partitioning import partition_pool, solve_partitioned
+from app.utils.distance import project_local
+from app.utils.partition import DEFAULT_METHOD, PARTITIONERS
+from app.utils.route_engines import ENGINES, get_engine
+
+
+def distancia_total(coords, trips, depot):
+    """Soma dos trechos em metros (com ida e volta ao depósito, se houver)."""
+    total = 0.0
+    for trip in trips:
+        path = coords[trip]
+        if depot is not None:
+            path = np.vstack([depot, path, depot])
+        total += float(np.hypot(*np.diff(path, axis=0).T).sum())
+    return total
+
+
+def medir(engine, coords, capacity, depot, time_budget, partitions, method):
+    inicio = time.perf_counter()
+    if partitions == 1:
+        trips = get_engine(engine).build_trips(coords.tolist(), capacity, depot=depot, time_budget=time_budget)
+    else:
+        trips, _ = solve_partitioned(engine, coords, capacity, depot=depot, time_budget=time_budget,
+                                     partitions=partitions, method=method)
+    return time.perf_counter() - inicio, trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 100000])
+    parser.add_argument('--partitions', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='kdtree')
+    parser.add_argument('--metodo', choices=sorted(PARTITIONERS), default=DEFAULT_METHOD)
+    parser.add_argument('--capacity', type=float, default=3)
+    parser.add_argument('--time-budget', type=float, default=2.0)
+    parser.add_argument('--workers', type=int, default=0, help='0: um por região, até os núcleos disponíveis')
+    parser.add_argument('--gerador', choices=sorted(GERADORES), default='cidade')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workers = args.workers or min(max(args.partitions), os.cpu_count() or 1)
+    partition_pool.configure({'OPTIMIZE_PARTITION_WORKERS': workers})
+    engine = ENGINES[args.engine]
+    capacity = args.capacity if engine.uses_depot else int(args.capacity)
+    print(f'engine={args.engine} metodo={args.metodo} workers={workers} núcleos={os.cpu_count()}')
+
+    # Aquece o pool (início dos processos) fora da medição
+    aquecimento = project_local(GERADORES[args.gerador](1000, seed=args.seed))
+    solve_partitioned(args.engine, aquecimento, capacity, time_budget=0, partitions=workers)
+
+    print(f"{'n':>8} {'regiões':>8} {'tempo':>10} {'speedup':>8} {'distância_km':>13} {'perda':>8} {'viagens':>8}")
+    for n in args.sizes:
+        lonlat = GERADORES[args.gerador](n, seed=args.seed)
+        coords = project_local(lonlat)
+        depot = tuple(coords.mean(axis=0)) if engine.uses_depot else None
+        referencia = None
+        for k in args.partitions:
+            elapsed, trips = medir(args.engine, coords, capacity, depot, args.time_budget, k, args.metodo)
+            total = distancia_total(coords, trips, depot)
+            if referencia is None:
+                referencia = (elapsed, total)
+            speedup = referencia[0] / elapsed if elapsed else float('inf')
+            perda = (total - referencia[1]) / referencia[1] if referencia[1] else 0.0
+            print(f'{n:>8} {k:>8} {elapsed:>9.3f}s {speedup:>7.2f}x {total / 1000:>13.1f} {perda:>+8.1%} {len(trips):>8}')
+
+
+if __name__ == '__main__':
+    main()
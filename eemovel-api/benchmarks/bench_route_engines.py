@@ -0,0 +1,53 @@
+"""
+Benchmark das engines de roteirização do /items/optimize.
+
+Uso (a partir de eemovel-api/):
+    python -m benchmarks.bench_route_engines
+    python -m benchmarks.bench_route_engines --sizes 10 1000 100000 --capacity 3 --gerador cidade
+"""
+import argparse
+import time
+from benchmarks.generators import GERADORES
+from app.utils.route_engines import ENGINES
+
+# Tamanho máximo por engine: a varredura linear é O(n²) e o CVRP (economias e busca
+# local sobre as listas de vizinhos) fica lento demais em 100k pontos; acima disso a engine fica de fora
+ENGINE_LIMITS = {'linear': 5000, 'cvrp': 10000}
+
+
+def medir(engine_name, coords, capacity):
+    engine = ENGINES[engine_name]()
+    inicio = time.perf_counter()
+    trips = engine.build_trips(coords, capacity)
+    return time.perf_counter() - inicio, trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--capacity', type=int, default=3)
+    parser.add_argument('--engines', nargs='+', default=sorted(ENGINES))
+    parser.add_argument('--gerador', choices=sorted(GERADORES), default='uniforme')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'n':>8} " + ' '.join(f'{name:>12}' for name in args.engines) + '  iguais')
+    for n in args.sizes:
+        coords = GERADORES[args.gerador](n, seed=args.seed).tolist()
+        tempos, resultados = [], []
+        for name in args.engines:
+            if n > ENGINE_LIMITS.get(name, n):
+                tempos.append('-')
+                continue
+            elapsed, trips = medir(name, coords, args.capacity)
+            tempos.append(f'{elapsed:.4f}s')
+            # Só as engines sem depósito devem produzir as mesmas viagens
+            if not ENGINES[name].uses_depot:
+                resultados.append(trips)
+
+        iguais = all(r == resultados[0] for r in resultados) if len(resultados) > 1 else '-'
+        print(f'{n:>8} ' + ' '.join(f'{t:>12}' for t in tempos) + f'  {iguais}')
+
+
+if __name__ == '__main__':
+    main()
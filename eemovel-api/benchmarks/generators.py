@@ -0,0 +1,67 @@
+"""
+Geradores determinísticos de pontos sintéticos para os benchmarks.
+
+Todos recebem `n` e `seed` e devolvem um array NumPy (n, 2) de (lon, lat)
+ao redor de Cascavel; a mesma seed gera sempre os mesmos pontos.
+"""
+import numpy as np
+
+CENTRO = (-53.455, -24.955)
+# Meia largura, em graus, da área coberta (~20 km)
+EXTENSAO = 0.1
+
+
+def uniforme(n, seed=0):
+    """Pontos uniformes num quadrado ao redor do centro."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        CENTRO[0] + rng.uniform(-EXTENSAO, EXTENSAO, n),
+        CENTRO[1] + rng.uniform(-EXTENSAO, EXTENSAO, n)
+    ])
+
+
+def agrupado(n, seed=0, clusters=20):
+    """Aglomerados gaussianos de tamanhos e dispersões variados."""
+    rng = np.random.default_rng(seed)
+    centros = uniforme(clusters, seed + 1)
+    pesos = rng.dirichlet(np.ones(clusters))
+    escolha = rng.choice(clusters, size=n, p=pesos)
+    dispersao = rng.uniform(0.002, 0.015, clusters)
+    return centros[escolha] + rng.normal(size=(n, 2)) * dispersao[escolha, None]
+
+
+def cidade(n, seed=0, quadra=0.002):
+    """
+    Aproximação de uma cidade: centro denso, pontos alinhados às ruas de uma
+    malha regular e uma periferia esparsa (50% / 35% / 15%).
+    """
+    rng = np.random.default_rng(seed)
+    n_centro = n // 2
+    n_ruas = n * 35 // 100
+    n_periferia = n - n_centro - n_ruas
+
+    centro = np.asarray(CENTRO) + rng.normal(scale=0.012, size=(n_centro, 2))
+
+    # Um eixo fica sobre a linha da rua (múltiplo da quadra), o outro é livre
+    ruas = np.asarray(CENTRO) + rng.uniform(-EXTENSAO / 2, EXTENSAO / 2, (n_ruas, 2))
+    eixo = rng.integers(0, 2, n_ruas)
+    linhas = np.arange(n_ruas)
+    ruas[linhas, eixo] = np.round(ruas[linhas, eixo] / quadra) * quadra
+    ruas += rng.normal(scale=0.00005, size=(n_ruas, 2))
+
+    periferia = uniforme(n_periferia, seed + 2)
+    pontos = np.concatenate([centro, ruas, periferia])
+    return pontos[rng.permutation(n)]
+
+
+GERADORES = {'uniforme': uniforme, 'agrupado': agrupado, 'cidade': cidade}
+
+
+def gerar_itens(pontos, seed=0):
+    """Registros no formato da carga em massa (nome, descricao, latitude, longitude, peso)."""
+    rng = np.random.default_rng(seed)
+    pesos = rng.integers(1, 4, len(pontos))
+    return [
+        {'nome': f'Ponto {i}', 'descricao': 'Sintético', 'latitude': float(lat), 'longitude': float(lng), 'peso': float(peso)}
+        for i, ((lng, lat), peso) in enumerate(zip(pontos, pesos))
+    ]
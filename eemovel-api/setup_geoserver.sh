@@ -28,21 +28,20 @@ fi
 
 echo "✅ Autenticado. Cadastrando pontos..."
 
-# 3. Função de Cadastro
-post_item() {
-    curl -s -X POST http://web:5000/items/ -H "Content-Type: application/json" -H "Authorization: Bearer $TOKEN" -d "{\"nome\": \"$1\", \"latitude\": $2, \"longitude\": $3, \"descricao\": \"$4\"}"
-    echo "📍 Item '$1' enviado."
-}
-
-post_item "Catedral" -24.9554 -53.4552 "Centro"
-post_item "Lago Municipal" -24.9610 -53.4350 "Regiao do Lago"
-post_item "Prefeitura" -24.9605 -53.4475 "Centro"
-post_item "Zoologico" -24.9625 -53.4250 "Regiao do Lago"
-post_item "Calcadao" -24.9545 -53.4590 "Centro"
-post_item "Museu" -24.9520 -53.4520 "Centro"
-post_item "Praca Migrante" -24.9560 -53.4680 "Centro"
-post_item "Teatro" -24.9515 -53.4485 "Centro"
-post_item "Parque Vitoria" -24.9450 -53.4380 "Country"
-post_item "Expovel" -24.9950 -53.4320 "Santos Dumont"
+# 3. Carga em massa (uma única requisição, gravada via COPY)
+curl -s -X POST http://web:5000/items/bulk -H "Content-Type: text/csv" -H "Authorization: Bearer $TOKEN" --data-binary @- <<'CSV'
+nome,latitude,longitude,descricao
+Catedral,-24.9554,-53.4552,Centro
+Lago Municipal,-24.9610,-53.4350,Regiao do Lago
+Prefeitura,-24.9605,-53.4475,Centro
+Zoologico,-24.9625,-53.4250,Regiao do Lago
+Calcadao,-24.9545,-53.4590,Centro
+Museu,-24.9520,-53.4520,Centro
+Praca Migrante,-24.9560,-53.4680,Centro
+Teatro,-24.9515,-53.4485,Centro
+Parque Vitoria,-24.9450,-53.4380,Country
+Expovel,-24.9950,-53.4320,Santos Dumont
+CSV
+echo "📍 Pontos enviados."
 
 echo "✨ Configuração concluída com sucesso!"
\ No newline at end of file
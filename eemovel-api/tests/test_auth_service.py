@@ -0,0 +1,46 @@
+import pytest
+from flask_bcrypt import Bcrypt
+from app.services.auth_service import LoginService, LoginThrottledError
+
+hasher = Bcrypt()
+hasher._log_rounds = 4
+USUARIOS = {'teste@eemovel.com': (1, hasher.generate_password_hash('123').decode('utf-8'))}
+
+
+class Contador:
+    def __init__(self):
+        self.consultas = 0
+
+    def __call__(self, email):
+        self.consultas += 1
+        return USUARIOS.get(email)
+
+
+def test_login_em_cache_nao_consulta_o_banco():
+    service = LoginService()
+    load_user = Contador()
+
+    assert service.authenticate('teste@eemovel.com', '123', load_user) == 1
+    assert service.authenticate('teste@eemovel.com', '123', load_user) == 1
+    assert load_user.consultas == 1
+    # Senha errada nunca é atendida pelo cache
+    assert service.authenticate('teste@eemovel.com', 'errada', load_user) is None
+    assert load_user.consultas == 2
+    assert (service.hits, service.misses) == (1, 2)
+
+
+def test_bloqueio_apos_falhas():
+    service = LoginService()
+    service.max_failures = 3
+    # O dono da conta já logou: o login fica no cache
+    assert service.authenticate('teste@eemovel.com', '123', USUARIOS.get, client='10.0.0.1') == 1
+    for _ in range(3):
+        assert service.authenticate('teste@eemovel.com', 'errada', USUARIOS.get, client='10.0.0.2') is None
+    with pytest.raises(LoginThrottledError) as excinfo:
+        service.authenticate('teste@eemovel.com', 'outra', USUARIOS.get, client='10.0.0.2')
+    assert excinfo.value.retry_after > 0
+
+    # Falhas de outro cliente não bloqueiam o dono, nem no cache nem fora dele
+    assert service.authenticate('teste@eemovel.com', '123', USUARIOS.get, client='10.0.0.1') == 1
+    service._cache.clear()
+    assert service.authenticate('teste@eemovel.com', '123', USUARIOS.get, client='10.0.0.3') == 1
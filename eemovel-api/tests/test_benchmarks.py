@@ -0,0 +1,26 @@
+import numpy as np
+from benchmarks.generators import GERADORES
+from benchmarks.bench_endpoints import comparar
+
+
+def test_geradores_deterministicos():
+    for gerador in GERADORES.values():
+        pontos = gerador(500, seed=7)
+        assert pontos.shape == (500, 2)
+        np.testing.assert_array_equal(pontos, gerador(500, seed=7))
+        assert not np.array_equal(pontos, gerador(500, seed=8))
+
+
+def test_comparar_com_baseline():
+    baseline = {'resultados': [
+        {'caso': 'raio', 'gerador': 'cidade', 'n': 1000, 'mediana_s': 0.010},
+        {'caso': 'bbox', 'gerador': 'cidade', 'n': 1000, 'mediana_s': 0.0001}
+    ]}
+    atual = {'resultados': [
+        {'caso': 'raio', 'gerador': 'cidade', 'n': 1000, 'mediana_s': 0.020},
+        # Dobrou, mas a diferença absoluta é ruído
+        {'caso': 'bbox', 'gerador': 'cidade', 'n': 1000, 'mediana_s': 0.0002},
+        {'caso': 'lista', 'gerador': 'cidade', 'n': 1000, 'mediana_s': 1.0}
+    ]}
+    regressoes = comparar(atual, baseline, tolerancia=0.25)
+    assert [(r['caso'], r['variacao']) for r in regressoes] == [('raio', 1.0)]
@@ -0,0 +1,121 @@
+import io
+import json
+import re
+import pytest
+from app.services import bulk_loader
+from app.services.bulk_loader import COPY_NULL, copy_buffer, detect_format, iter_geojson, iter_csv, iter_ndjson, normalize_record
+
+
+def test_geojson_lido_em_blocos_pequenos():
+    colecao = {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-53.4552 + i / 1000, -24.9554]},
+             'properties': {'nome': f'Ponto {i}', 'descricao': 'Centro'}}
+            for i in range(50)
+        ]
+    }
+    features = list(iter_geojson(io.StringIO(json.dumps(colecao)), read_size=64))
+
+    assert [n for n, _ in features] == list(range(1, 51))
+    assert normalize_record(features[0][1]) == ('Ponto 0', 'Centro', -53.4552, -24.9554, 1.0)
+
+
+def test_validacao_por_linha():
+    csv_data = "nome,descricao,latitude,longitude,peso\nCatedral,Centro,-24.9554,-53.4552,2.5\n,Sem nome,1,1,\nLonge,,95,10,\n"
+    resultado = {}
+    for linha, registro in iter_csv(io.StringIO(csv_data)):
+        try:
+            resultado[linha] = normalize_record(registro)
+        except ValueError as e:
+            resultado[linha] = str(e)
+
+    assert resultado[2] == ('Catedral', 'Centro', -53.4552, -24.9554, 2.5)
+    assert 'nome' in resultado[3]
+    assert 'latitude' in resultado[4]
+
+    linhas = list(iter_ndjson(io.StringIO('{"nome": "A", "latitude": 1, "longitude": 2}\n\nnão é json\n')))
+    assert [n for n, _ in linhas] == [1, 3]
+    with pytest.raises(ValueError):
+        normalize_record(linhas[1][1])
+
+
+def test_detect_format():
+    assert detect_format(content_type='text/csv; charset=utf-8') == 'csv'
+    assert detect_format(filename='pontos.geojson') == 'geojson'
+    assert detect_format('ndjson', content_type='text/csv') == 'ndjson'
+    with pytest.raises(ValueError):
+        detect_format(content_type='text/plain')
+
+
+def test_normalize_change():
+    from app.services.bulk_loader import normalize_change
+    assert normalize_change({'id': 3, 'peso': '2'}) == (3, None, None, False, 2.0, None, None)
+    assert normalize_change({'id': '4', 'descricao': '', 'latitude': -24.9, 'longitude': -53.4}) == \
+        (4, None, None, True, None, -53.4, -24.9)
+    for change in ({'peso': 1}, {'id': 0, 'peso': 1}, {'id': 1.5, 'peso': 1}, {'id': True, 'peso': 1},
+                   {'id': 1}, {'id': 1, 'nome': ' '}, {'id': 1, 'latitude': 1}, {'id': 1, 'peso': -1}, []):
+        with pytest.raises(ValueError):
+            normalize_change(change)
+
+
+def _copy_csv_values(line):
+    """Lê uma linha como o COPY CSV com NULL '\\N': só o marcador sem aspas é NULL."""
+    values = []
+    for quoted, bare in re.findall(r'(?:"((?:[^"]|"")*)"|([^,]*))(?:,|$)', line)[:-1]:
+        if bare == COPY_NULL:
+            values.append(None)
+        elif bare:
+            values.append(bare)
+        else:
+            values.append(quoted.replace('""', '"'))
+    return values
+
+
+def test_copy_buffer_preserva_null_e_texto_vazio():
+    rows = [
+        ('Sem descrição', None, -53.4552, -24.9554, 1.0),
+        ('Vazia', '', -53.4, -24.9, 2.0),
+        ('Aspas "e", vírgula', COPY_NULL, -53.4, -24.9, 0.5)
+    ]
+    lines = copy_buffer(rows).getvalue().splitlines()
+
+    assert [_copy_csv_values(line)[:2] for line in lines] == [
+        ['Sem descrição', None],
+        ['Vazia', ''],
+        ['Aspas "e", vírgula', COPY_NULL]
+    ]
+    assert _copy_csv_values(lines[0])[2:] == ['SRID=4326;POINT(-53.4552 -24.9554)', '1.0']
+
+
+def test_defer_index_recria_indices_mesmo_com_erro(monkeypatch):
+    class Session:
+        def __init__(self):
+            self.sql = []
+
+        def execute(self, statement, *args):
+            self.sql.append(str(statement))
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+    class FakeDb:
+        session = Session()
+
+    recreated = []
+    monkeypatch.setattr(bulk_loader, 'db', FakeDb)
+    monkeypatch.setattr(bulk_loader, '_recreate_indexes', recreated.extend)
+
+    def broken_stream():
+        yield 'nome,descricao,latitude,longitude\n'
+        raise ConnectionError('cliente desconectou')
+
+    with pytest.raises(ConnectionError):
+        bulk_loader.load_items(broken_stream(), 'csv', defer_index=True)
+
+    indexes = bulk_loader._spatial_indexes()
+    assert indexes and recreated == indexes
+    assert all(any(index.name in sql for sql in FakeDb.session.sql) for index in indexes)
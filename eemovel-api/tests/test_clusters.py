@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from app.services import cluster_service
+from app.services.cluster_service import cell_envelope, cell_range, cell_size, get_clusters, parse_cluster_params
+
+
+def test_cell_size():
+    # No zoom 0 um tile de 256 px cobre os 360° de longitude
+    assert cell_size(0, 256) == 360.0
+    assert cell_size(12, 64) == pytest.approx(360.0 / 4096 / 4)
+
+
+def test_parse_cluster_params():
+    assert parse_cluster_params({'zoom': '12'}) == (12, 64)
+    assert parse_cluster_params({'zoom': '3', 'grid': '128'}) == (3, 128)
+    for args in ({}, {'zoom': 'x'}, {'zoom': '21'}, {'zoom': '5', 'grid': '4'}):
+        with pytest.raises(ValueError):
+            parse_cluster_params(args)
+
+
+def test_cell_range_e_envelope():
+    size = 0.5
+    # Célula k cobre [(k - 0,5) * size, (k + 0,5) * size)
+    assert cell_range((0.0, 0.0, 1.0, 1.0), size) == (0, 0, 2, 2)
+    assert cell_range((-0.3, 0.26, 0.24, 0.74), size) == (-1, 1, 0, 1)
+    assert cell_envelope((-1, 1, 0, 1), size) == (-0.75, 0.25, 0.25, 0.75)
+
+
+@pytest.fixture
+def pontos(monkeypatch):
+    """aggregate_grid em Python sobre pontos fixos, com a mesma regra do SQL (&& no envelope + snap)."""
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(-53.6, -53.3, 2000), rng.uniform(-25.1, -24.8, 2000)])
+    calls = []
+
+    def aggregate(size, cells):
+        calls.append(cells)
+        minx, miny, maxx, maxy = cell_envelope(cells, size)
+        grid = {}
+        for x, y in points:
+            if minx <= x <= maxx and miny <= y <= maxy:
+                grid.setdefault((round(x / size), round(y / size)), []).append((x, y))
+        return [
+            {'celula': list(cell), 'quantidade': len(members)}
+            for cell, members in grid.items() if cluster_service._inside({'celula': cell}, cells)
+        ]
+
+    monkeypatch.setattr(cluster_service, 'aggregate_grid', aggregate)
+    return points, calls
+
+
+def test_clusters_por_recorte_com_celulas_inteiras(pontos):
+    points, calls = pontos
+    bbox = (-53.5, -25.0, -53.4, -24.9)
+    clusters, hit = get_clusters(12, bbox)
+    assert not hit
+
+    size = cell_size(12)
+    c0, r0, c1, r1 = cell_range(bbox, size)
+    cols, rows = np.round(points[:, 0] / size), np.round(points[:, 1] / size)
+    expected = {}
+    for col, row in zip(cols.astype(int).tolist(), rows.astype(int).tolist()):
+        if c0 <= col <= c1 and r0 <= row <= r1:
+            expected[(col, row)] = expected.get((col, row), 0) + 1
+    # Células da borda saem inteiras, com itens de fora do bbox
+    assert {tuple(c['celula']): c['quantidade'] for c in clusters} == expected
+
+
+def test_cache_por_bloco_so_em_zoom_baixo(pontos):
+    _, calls = pontos
+    cluster_service.cluster_cache.invalidate()
+    bbox = (-53.5, -25.0, -53.4, -24.9)
+    first, hit = get_clusters(9, bbox)
+    assert not hit and len(calls) == 1
+    # Recorte menor, dentro dos mesmos blocos: vem do cache e é o subconjunto das células
+    inner = (-53.47, -24.97, -53.43, -24.93)
+    again, hit = get_clusters(9, inner)
+    assert hit and len(calls) == 1
+    cells = cell_range(inner, cell_size(9))
+    assert again == [c for c in first if cluster_service._inside(c, cells)]
+
+    # Zoom alto: sem cache
+    get_clusters(16, bbox)
+    get_clusters(16, bbox)
+    assert len(calls) == 3
+
+    with pytest.raises(ValueError):
+        get_clusters(cluster_service.MAX_WORLD_ZOOM + 1)
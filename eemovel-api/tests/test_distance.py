@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from app.utils.distance import (
+    haversine, project_local, distance_matrix, iter_distance_blocks, nearest_in_blocks, path_length
+)
+from app.utils.optimizer import calculate_distance, optimize_route
+
+CATEDRAL = (-53.4552, -24.9554)
+EXPOVEL = (-53.4320, -24.9950)
+
+
+def test_haversine_em_metros():
+    # Um grau de latitude tem ~111,2 km
+    assert haversine(0, 0, 0, 1) == pytest.approx(111195, rel=1e-4)
+    d = haversine(*CATEDRAL, *EXPOVEL)
+    assert 4900 < d < 5000
+    assert calculate_distance({'lon': CATEDRAL[0], 'lat': CATEDRAL[1]}, {'lon': EXPOVEL[0], 'lat': EXPOVEL[1]}) == pytest.approx(d)
+
+
+def test_matriz_em_blocos_igual_a_completa():
+    rng = np.random.default_rng(1)
+    pts = np.column_stack((rng.uniform(-53.5, -53.4, 50), rng.uniform(-25.0, -24.9, 50)))
+    full = distance_matrix(pts, block_size=len(pts))
+    blocks = np.vstack([block for _, block in iter_distance_blocks(pts, block_size=7)])
+    np.testing.assert_allclose(full, blocks)
+    np.testing.assert_allclose(full, full.T)
+
+    # A projeção local aproxima a haversine em escala urbana
+    proj = distance_matrix(project_local(pts), metric='projected', block_size=16)
+    np.testing.assert_allclose(proj, full, rtol=1e-3, atol=1e-6)
+
+    idx, dist = nearest_in_blocks(pts[:5], pts, block_size=2)
+    assert list(idx) == [0, 1, 2, 3, 4]
+    assert np.all(dist == 0)
+
+
+def test_path_length_e_optimize_route():
+    assert path_length([CATEDRAL]) == 0.0
+    assert path_length([CATEDRAL, EXPOVEL, CATEDRAL]) == pytest.approx(2 * haversine(*CATEDRAL, *EXPOVEL))
+
+    start = {'lon': CATEDRAL[0], 'lat': CATEDRAL[1]}
+    longe = {'lon': EXPOVEL[0], 'lat': EXPOVEL[1]}
+    perto = {'lon': -53.4590, 'lat': -24.9545}
+    assert optimize_route(start, [longe, perto]) == [start, perto, longe]
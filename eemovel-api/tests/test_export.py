@@ -0,0 +1,55 @@
+import io
+import json
+from unittest import mock
+import pytest
+from app.services import export_service
+from app.services.export_service import detect_export_format, iter_export, parse_copy_csv, points_wkb
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+# Como o COPY ... TO STDOUT (FORMAT csv) escreve: NULL sem aspas, string vazia com aspas
+COPY_CSV = b'1,Casa,,-24.95,-53.45,1.5\n2,"Loja, centro","linha 1\nlinha 2",-24.96,-53.46,2\n3,Sem ponto,"",,,1\n'
+
+
+def _exportar(fmt, fields=None):
+    tabela = parse_copy_csv(io.BytesIO(COPY_CSV))
+    with mock.patch.object(export_service, 'read_batches', lambda params, batch_rows: iter([tabela, tabela])):
+        return b''.join(iter_export({'fields': fields}, fmt))
+
+
+def test_csv_do_copy_em_colunas():
+    tabela = parse_copy_csv(io.BytesIO(COPY_CSV))
+    assert tabela['descricao'].to_pylist() == [None, 'linha 1\nlinha 2', '']
+    assert tabela['nome'][1].as_py() == 'Loja, centro'
+    assert tabela.schema.field('id').type == pa.int64()
+
+    # Só o vazio sem aspas é NULL: 'NA', 'NULL' e 'nan' são textos como quaisquer outros
+    textos = parse_copy_csv(io.BytesIO(b'4,NA,NULL,-24.9,-53.4,1\n5,nan,N/A,-24.9,-53.4,1\n'))
+    assert textos['nome'].to_pylist() == ['NA', 'nan']
+    assert textos['descricao'].to_pylist() == ['NULL', 'N/A']
+
+    wkb = points_wkb(tabela['longitude'], tabela['latitude']).to_pylist()
+    # Ponto em WKB little-endian: 01 + tipo 1 + x + y
+    assert wkb[0] == bytes.fromhex('0101000000') + pa.array([-53.45, -24.95]).buffers()[1].to_pybytes()
+    assert wkb[2] is None
+
+
+def test_exportacao_arrow_e_geoparquet():
+    arrow = pa.ipc.open_stream(_exportar('arrow')).read_all()
+    assert arrow.num_rows == 6
+    assert arrow.schema.field('geometry').metadata[b'ARROW:extension:name'] == b'geoarrow.wkb'
+
+    parquet = pq.read_table(io.BytesIO(_exportar('parquet', fields=['id', 'peso'])))
+    assert parquet.column_names == ['id', 'peso', 'geometry']
+    assert parquet['peso'].to_pylist() == [1.5, 2.0, 1.0] * 2
+    geo = json.loads(parquet.schema.metadata[b'geo'])
+    assert geo['primary_column'] == 'geometry' and geo['columns']['geometry']['encoding'] == 'WKB'
+
+
+def test_formato_da_exportacao():
+    assert detect_export_format(filename='itens.parquet') == 'parquet'
+    assert detect_export_format('fgb', filename='itens.parquet') == 'fgb'
+    for fmt, filename in (('csv', None), (None, 'itens.csv')):
+        with pytest.raises(ValueError):
+            detect_export_format(fmt, filename)
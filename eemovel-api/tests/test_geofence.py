@@ -0,0 +1,50 @@
+import json
+import pytest
+from app.services.geofence_service import MAX_GEOFENCE_ZONES, parse_geofence, parse_geofence_mode
+
+SQUARE = [[[-53.47, -24.97], [-53.43, -24.97], [-53.43, -24.94], [-53.47, -24.94], [-53.47, -24.97]]]
+
+
+def _collection(*geometries, **feature):
+    return {
+        'type': 'FeatureCollection',
+        'features': [{'type': 'Feature', 'geometry': geometry, 'properties': {}, **feature} for geometry in geometries]
+    }
+
+
+def test_parse_geofence_ids_das_zonas():
+    polygon = {'type': 'Polygon', 'coordinates': SQUARE}
+    multi = {'type': 'MultiPolygon', 'coordinates': [SQUARE, SQUARE]}
+    data = _collection(polygon, multi)
+    data['features'][0]['id'] = 'centro'
+    data['features'][1]['properties'] = {'id': 7}
+
+    zones = parse_geofence(data)
+    assert [zone_id for zone_id, _ in zones] == ['centro', 7]
+    assert json.loads(zones[1][1]) == multi
+
+    # Sem id: a posição na coleção
+    assert [zone_id for zone_id, _ in parse_geofence(_collection(polygon, polygon))] == [0, 1]
+
+
+@pytest.mark.parametrize('data', [
+    None,
+    {'type': 'Feature'},
+    {'type': 'FeatureCollection', 'features': []},
+    _collection({'type': 'Point', 'coordinates': [-53.4, -24.9]}),
+    _collection({'type': 'Polygon', 'coordinates': [SQUARE[0][:3]]}),
+    _collection({'type': 'Polygon', 'coordinates': [SQUARE[0][:-1] + [[-53.0, -24.0]]]}),
+    _collection({'type': 'Polygon', 'coordinates': [[[-200, 0], [0, 0], [0, 1], [-200, 0]]]}),
+    _collection({'type': 'Polygon', 'coordinates': [[['a', 0], [0, 0], [0, 1], ['a', 0]]]}),
+    _collection(*[{'type': 'Polygon', 'coordinates': SQUARE}] * (MAX_GEOFENCE_ZONES + 1)),
+])
+def test_parse_geofence_invalido(data):
+    with pytest.raises(ValueError):
+        parse_geofence(data)
+
+
+def test_parse_geofence_mode():
+    assert parse_geofence_mode({}) == 'ids'
+    assert parse_geofence_mode({'mode': 'count'}) == 'count'
+    with pytest.raises(ValueError):
+        parse_geofence_mode({'mode': 'todos'})
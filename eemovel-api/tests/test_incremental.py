@@ -0,0 +1,60 @@
+import pytest
+from app.services.optimization import reoptimize, snapshot_solution, solve_optimization
+from app.utils.incremental import insert_items, two_opt
+
+
+def _itens(n, inicio=0):
+    return [
+        {'id': i, 'nome': f'P{i}', 'descricao': None, 'latitude': -24.95 + (i % 7) / 500,
+         'longitude': -53.45 + (i // 7) / 500, 'peso': 1.0}
+        for i in range(inicio, inicio + n)
+    ]
+
+
+def _ids(result):
+    return [[item['id'] for item in trip] for trip in result['trips']]
+
+
+def test_insercao_mais_barata_e_2opt():
+    pontos = [0, 10, 20, 15, 100]
+    dist = lambda i, j: abs(pontos[i] - pontos[j])
+    trips = [[0, 1, 2]]
+    leftovers, touched = insert_items(trips, [3, 4], dist, [1] * 5, capacity=4)
+    assert trips == [[0, 1, 3, 2]] and touched == {0}
+    assert leftovers == [4]
+
+    trip = [2, 0, 1]
+    assert two_opt(trip, dist, deadline=float('inf'))
+    assert trip in ([0, 1, 2], [2, 1, 0])
+
+
+@pytest.mark.parametrize('engine', ['kdtree', 'cvrp'])
+def test_reotimizacao_mexe_so_nas_viagens_afetadas(engine):
+    itens = _itens(40)
+    anterior = solve_optimization(itens, engine=engine, capacity=4, time_budget=0.1)
+    solucao = snapshot_solution(itens, anterior)
+
+    novos = [item for item in itens if item['id'] != 5] + _itens(2, inicio=100)
+    resultado = reoptimize(novos, solucao, engine=engine, capacity=4, time_budget=0.1)
+    incremental = resultado['resumo']['incremental']
+    assert incremental['solucao_anterior']
+    assert (incremental['inseridos'], incremental['removidos']) == (2, 1)
+
+    viagens = _ids(resultado)
+    assert sorted(i for trip in viagens for i in trip) == sorted(item['id'] for item in novos)
+    assert all(carga <= 4 for carga in resultado['resumo']['carga_por_viagem'])
+    # As viagens fora da mudança continuam iguais
+    iguais = [trip for trip in solucao['viagens'] if trip in viagens]
+    assert len(iguais) >= len(solucao['viagens']) - incremental['viagens_alteradas']
+    assert incremental['viagens_alteradas'] <= 3
+
+    # Sem mudanças nos itens, a solução se mantém
+    mesma = reoptimize(novos, snapshot_solution(novos, resultado), engine=engine, capacity=4, time_budget=0.1)
+    assert _ids(mesma) == viagens
+    assert mesma['resumo']['incremental']['viagens_alteradas'] == 0
+
+
+def test_reotimizacao_sem_solucao_anterior():
+    resultado = reoptimize(_itens(10), None, capacity=3)
+    assert resultado['resumo']['incremental'] == {'solucao_anterior': False}
+    assert resultado['resumo']['viagens_geradas'] == 4
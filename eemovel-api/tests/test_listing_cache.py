@@ -0,0 +1,52 @@
+import pytest
+from app.models.item import Item
+from app.services.listing_cache import get_listing, listing_cache, make_etag, normalize_listing_args
+from app.services.result_cache import invalidate_item_caches
+
+FIELDS = Item.read_columns()
+
+
+def test_normalize_listing_args():
+    a = normalize_listing_args({'lat': '-24.95540001', 'lng': '-53.4552', 'radius': '500.04'}, FIELDS)
+    b = normalize_listing_args({'lat': '-24.9554', 'lng': '-53.45520003', 'radius': '500'}, FIELDS)
+    assert a == b
+    assert (a['lat'], a['radius'], a['limit']) == (-24.9554, 500.0, None)
+
+    # Raio só com os três parâmetros; valor inválido conta como ausente
+    assert normalize_listing_args({'lat': '1', 'radius': '10'}, FIELDS)['radius'] is None
+    assert normalize_listing_args({'lat': 'x', 'lng': '1', 'radius': '10'}, FIELDS)['radius'] is None
+
+    assert normalize_listing_args({'limit': '10', 'fields': 'id,nome'}, FIELDS)['limit'] == 10
+    for args in ({'limit': '0'}, {'fields': 'senha'}, {'bbox': '1,2'}, {'cursor': '!!'}):
+        with pytest.raises(ValueError):
+            normalize_listing_args(args, FIELDS)
+
+
+def test_get_listing_etag_e_invalidacao():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{'id': 1}], {}
+
+    params = {'teste': 'listagem'}
+    first, hit = get_listing(params, compute)
+    assert not hit and first['etag'].startswith('v')
+    again, hit = get_listing(params, compute)
+    assert hit and again['etag'] == first['etag'] and len(calls) == 1
+
+    invalidate_item_caches()
+    after, hit = get_listing(params, compute)
+    assert not hit and after['etag'] != first['etag'] and len(calls) == 2
+
+    # Respostas grandes ganham ETag mas não ficam no cache
+    get_listing({'teste': 'grande'}, compute, max_rows=0)
+    get_listing({'teste': 'grande'}, compute, max_rows=0)
+    assert len(calls) == 4
+
+    # A ETag não depende do corpo: vem da versão e dos parâmetros
+    assert make_etag(3, {'a': 1, 'b': 2}) == make_etag(3, {'b': 2, 'a': 1})
+    assert make_etag(3, {'a': 1}) != make_etag(4, {'a': 1}) != make_etag(4, {'a': 2})
+    assert after['etag'] == make_etag(listing_cache.version(), params)
+    # Versão da listagem: contador do banco + versão local
+    assert make_etag('3.1', {'a': 1}) != make_etag('3.2', {'a': 1}) != make_etag('4.1', {'a': 1})
@@ -0,0 +1,70 @@
+import threading
+from flask import Flask
+from app.utils.metrics import Counter, Histogram, Metrics, add_timing, timed
+
+
+def test_formato_prometheus():
+    contador = Counter('reqs_total', 'Requisições', ('endpoint',))
+    contador.inc('/items/')
+    contador.inc('/items/', amount=2)
+    assert list(contador.expose())[-1] == 'reqs_total{endpoint="/items/"} 3'
+
+    histograma = Histogram('lat_seconds', 'Latência', ('endpoint',), buckets=(0.1, 1.0))
+    for valor in (0.05, 0.5, 2.0):
+        histograma.observe(valor, '/a"b')
+    linhas = list(histograma.expose())
+    assert 'lat_seconds_bucket{endpoint="/a\\"b",le="0.1"} 1' in linhas
+    assert 'lat_seconds_bucket{endpoint="/a\\"b",le="1.0"} 2' in linhas
+    assert 'lat_seconds_bucket{endpoint="/a\\"b",le="+Inf"} 3' in linhas
+    assert 'lat_seconds_count{endpoint="/a\\"b"} 3' in linhas
+
+
+def test_expose_com_escritas_concorrentes():
+    contador = Counter('reqs_total', 'Requisições', ('endpoint',))
+    histograma = Histogram('lat_seconds', 'Latência', ('endpoint',))
+    parar = threading.Event()
+
+    def escreve():
+        # Rótulos novos até o limite: o dict cresce enquanto expose() itera sobre ele
+        for n in range(2000):
+            if parar.is_set():
+                break
+            contador.inc(f'/e{n % 50}')
+            histograma.observe(0.01, f'/e{n % 50}')
+
+    escritor = threading.Thread(target=escreve)
+    escritor.start()
+    try:
+        for _ in range(50):
+            list(contador.expose())
+            list(histograma.expose())
+    finally:
+        parar.set()
+        escritor.join()
+
+
+def test_endpoint_metrics_e_server_timing():
+    app = Flask(__name__)
+    Metrics(app)
+
+    @app.route('/lento')
+    def lento():
+        with timed('calculo'):
+            pass
+        add_timing('db', 0.002)
+        return 'ok'
+
+    client = app.test_client()
+    resposta = client.get('/lento')
+    timings = resposta.headers['Server-Timing'].split(', ')
+    assert [t.split(';')[0] for t in timings] == ['calculo', 'db', 'total']
+    assert timings[1] == 'db;dur=2.0'
+
+    resposta = client.get('/metrics')
+    assert resposta.status_code == 200 and resposta.mimetype == 'text/plain'
+    linhas = resposta.get_data(as_text=True).splitlines()
+    assert 'http_requests_total{endpoint="/lento",method="GET",status="200"} 1' in linhas
+    assert 'http_request_duration_seconds_count{endpoint="/lento",method="GET"} 1' in linhas
+    # A fase 'db' vai para o histograma de SQL, não para o de fases
+    assert any(l.startswith('app_phase_duration_seconds_count{endpoint="/lento",phase="calculo"}') for l in linhas)
+    assert not any('phase="db"' in l for l in linhas)
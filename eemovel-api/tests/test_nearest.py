@@ -0,0 +1,49 @@
+import pytest
+from app.extensions import db
+from app.services.item_service import DEFAULT_K, parse_nearest_params, parse_point, buscar_mais_proximos
+
+
+def test_parse_nearest_params():
+    assert parse_nearest_params({}) == {'k': DEFAULT_K, 'max_distance': None, 'rerank': True}
+    assert parse_nearest_params({'k': '3', 'max_distance': '500', 'rerank': '0'}) == \
+        {'k': 3, 'max_distance': 500.0, 'rerank': False}
+    assert parse_nearest_params({'k': 10, 'rerank': False})['rerank'] is False
+    for args in ({'k': '0'}, {'k': '101'}, {'k': 'x'}, {'max_distance': '-1'}):
+        with pytest.raises(ValueError):
+            parse_nearest_params(args)
+
+
+def test_parse_point():
+    assert parse_point({'lat': '-24.95', 'lng': '-53.45'}) == (-24.95, -53.45)
+    assert parse_point({'latitude': 1, 'longitude': 2}) == (1.0, 2.0)
+    for data in ({}, {'lat': 1}, {'lat': 'x', 'lng': 1}, {'lat': 91, 'lng': 0}, 'x', None):
+        with pytest.raises(ValueError):
+            parse_point(data)
+
+
+def test_buscar_mais_proximos_sem_pontos():
+    assert buscar_mais_proximos([]) == []
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    # Conecta no banco real do Docker
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://admin:admin_password@db:5432/geodb'
+
+    with app.app_context():
+        yield app
+
+
+@pytest.mark.parametrize('rerank', [True, False])
+def test_vizinhos_em_ordem_de_distancia(app, rerank):
+    pontos = [(-24.9554, -53.4552), (-24.97, -53.43)]
+    resultados = buscar_mais_proximos(pontos, k=10, rerank=rerank)
+    db.session.rollback()
+
+    assert len(resultados) == len(pontos)
+    for itens in resultados:
+        distancias = [item['distancia_m'] for item in itens]
+        assert distancias == sorted(distancias)
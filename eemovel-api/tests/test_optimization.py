@@ -0,0 +1,44 @@
+import pytest
+from app.services.optimization import OverweightItemError, parse_optimize_params, reoptimize, solve_optimization
+
+
+def _itens(n):
+    return [
+        {'id': i, 'nome': f'P{i}', 'descricao': None, 'latitude': -24.95 + (i % 5) / 1000,
+         'longitude': -53.45 + (i // 5) / 1000, 'peso': 1.0}
+        for i in range(n)
+    ]
+
+
+def test_parse_optimize_params():
+    params = parse_optimize_params({'engine': 'cvrp', 'capacity': '2.5', 'depot_lat': '-24.9', 'depot_lng': '-53.4'})
+    assert params == {'engine': 'cvrp', 'capacity': 2.5, 'depot': (-53.4, -24.9), 'time_budget': 2.0,
+                      'distance': 'haversine', 'partitions': 1, 'partition_method': 'sweep'}
+    assert parse_optimize_params({})['engine'] == 'kdtree'
+
+    for args in ({'capacity': 'x'}, {'capacity': '0'}, {'engine': 'cvrp', 'capacity': '-1'},
+                 {'engine': 'cvrp', 'capacity': 'nan'}, {'depot_lat': '1'}, {'time_budget': '999'},
+                 {'engine': 'nenhuma'}, {'distance': 'nenhuma'}):
+        with pytest.raises(ValueError):
+            parse_optimize_params(args)
+
+
+def test_solve_optimization():
+    resultado = solve_optimization(_itens(20), engine='cvrp', capacity=4, time_budget=0.2)
+    resumo = resultado['resumo']
+    assert resumo['total_itens'] == 20
+    assert sorted(item['id'] for trip in resultado['trips'] for item in trip) == list(range(20))
+    assert max(resumo['carga_por_viagem']) <= 4
+    assert resumo['deposito'] is not None
+
+    assert solve_optimization([])['resumo']['viagens_geradas'] == 0
+
+
+def test_item_mais_pesado_que_a_capacidade():
+    itens = _itens(5)
+    itens[3]['peso'] = 5.0
+    for otimiza in (solve_optimization, lambda itens, **kw: reoptimize(itens, None, **kw)):
+        with pytest.raises(OverweightItemError, match='item 3'):
+            otimiza(itens, engine='cvrp', capacity=4, time_budget=0)
+    # Sem depósito a capacidade é em número de itens: o peso não importa
+    assert solve_optimization(itens, engine='kdtree', capacity=4)['resumo']['viagens_geradas'] == 2
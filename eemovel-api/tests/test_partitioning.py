@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from app.services.optimization import parse_optimize_params, solve_optimization
+from app.services.partitioning import partition_pool, solve_partitioned
+from app.utils.partition import PARTITIONERS, partition
+
+
+def _pontos(n, seed=0):
+    return np.random.default_rng(seed).uniform(0, 10000, (n, 2))
+
+
+def _itens(n):
+    pontos = _pontos(n) / 100000
+    return [
+        {'id': i, 'nome': f'P{i}', 'descricao': None, 'latitude': -24.95 + lat, 'longitude': -53.45 + lng, 'peso': 1.0}
+        for i, (lng, lat) in enumerate(pontos)
+    ]
+
+
+@pytest.mark.parametrize('method', sorted(PARTITIONERS))
+def test_particoes_cobrem_todos_os_pontos(method):
+    pontos = _pontos(1000)
+    regioes = partition(pontos, 5, method)
+    assert 1 < len(regioes) <= 5
+    assert sorted(np.concatenate(regioes).tolist()) == list(range(1000))
+    if method != 'kmeans':
+        # Varredura e grade dividem a carga por igual
+        assert {len(r) for r in regioes} == {200}
+
+    assert len(partition(pontos[:3], 10, method)) <= 3
+    with pytest.raises(ValueError):
+        partition(pontos, 2, 'nenhum')
+
+
+def test_kmeans_com_pesos_desiguais_nao_perde_regioes():
+    # A varredura deixa setores vazios aqui (rótulos [2 0 0 0 0]); o k-means precisa devolver os 4
+    pontos = np.array([[0, 0], [0, 1], [1, 0], [1, 1], [2, 2]], dtype=np.float64)
+    regioes = partition(pontos, 4, 'kmeans', weights=[100, 1, 1, 1, 1])
+    assert len(regioes) == 4
+    assert sorted(np.concatenate(regioes).tolist()) == list(range(5))
+
+    # Pontos repetidos também não esvaziam grupos
+    repetidos = np.vstack([np.zeros((6, 2)), [[5, 5]]])
+    assert len(partition(repetidos, 3, 'kmeans', weights=[50, 1, 1, 1, 1, 1, 1])) == 3
+
+
+def test_solve_particionado_costura_as_bordas():
+    pontos = _pontos(500)
+    trips, info = solve_partitioned('kdtree', pontos, 3, partitions=4)
+    assert sorted(i for trip in trips for i in trip) == list(range(500))
+    assert max(len(trip) for trip in trips) <= 3
+    # As sobras de cada região são refeitas juntas: no máximo uma viagem incompleta
+    assert sum(len(trip) < 3 for trip in trips) <= 1
+    assert info['regioes'] == 4 and info['metodo'] == 'sweep'
+
+    deposito = tuple(pontos.mean(axis=0))
+    trips, _ = solve_partitioned('cvrp', pontos, 10, demands=[2.0] * 500, depot=deposito, time_budget=0.2,
+                                 partitions=3, method='kmeans')
+    assert sorted(i for trip in trips for i in trip) == list(range(500))
+    assert max(len(trip) for trip in trips) <= 5
+
+
+def test_solve_particionado_em_processos():
+    try:
+        partition_pool.configure({'OPTIMIZE_PARTITION_WORKERS': 1})
+        sequencial = solve_optimization(_itens(300), engine='cvrp', capacity=10, time_budget=0, partitions=3)
+        partition_pool.configure({'OPTIMIZE_PARTITION_WORKERS': 2})
+        resultado = solve_optimization(_itens(300), engine='cvrp', capacity=10, time_budget=0, partitions=3)
+    finally:
+        partition_pool.configure({})
+    resumo = resultado['resumo']
+    assert resumo['particionamento']['workers'] == 2
+    assert sorted(item['id'] for trip in resultado['trips'] for item in trip) == list(range(300))
+    assert max(resumo['carga_por_viagem']) <= 10
+    # Sem tempo de melhoria, o resultado não depende de onde as regiões rodaram
+    assert sequencial['resumo']['particionamento']['workers'] == 1
+    assert resultado['trips'] == sequencial['trips']
+
+    params = parse_optimize_params({'partitions': '4', 'partition_method': 'grid'})
+    assert (params['partitions'], params['partition_method']) == (4, 'grid')
+    for args in ({'partitions': '0'}, {'partitions': '999'}, {'partition_method': 'nenhum'}):
+        with pytest.raises(ValueError):
+            parse_optimize_params(args)
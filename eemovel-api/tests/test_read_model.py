@@ -0,0 +1,219 @@
+import numpy as np
+import pytest
+from app.services import read_model as read_model_module
+from app.services.listing_cache import listing_cache
+from app.services.read_model import ItemReadModel, ItemSnapshot, StringPool
+from app.utils.distance import haversine
+from app.utils.spatial_index import GridIndex
+
+
+def _rows(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    lngs = -53.45 + rng.normal(0, 0.05, n)
+    lats = -24.95 + rng.normal(0, 0.05, n)
+    return [
+        (i + 1, f'Item {i + 1}', None if i % 7 == 0 else f'Bairro {i % 13}', float(lat), float(lng), float(i % 3 + 1))
+        for i, (lat, lng) in enumerate(zip(lats, lngs))
+    ]
+
+
+def _params(**kwargs):
+    params = {'lat': None, 'lng': None, 'radius': None, 'bbox': None, 'fields': None, 'cursor': None, 'limit': None}
+    params.update(kwargs)
+    return params
+
+
+def test_grid_index_igual_a_forca_bruta():
+    rng = np.random.default_rng(1)
+    xs, ys = rng.uniform(-10, 10, 5000), rng.uniform(-5, 5, 5000)
+    xs[::50] = np.nan
+    index = GridIndex(xs, ys)
+    for bbox in ((-1, -1, 1, 1), (-20, -20, 20, 20), (3, 2, 3.5, 4), (11, 0, 12, 1), (1, 1, 0, 0)):
+        expected = np.flatnonzero((xs >= bbox[0]) & (xs <= bbox[2]) & (ys >= bbox[1]) & (ys <= bbox[3]))
+        assert index.query_bbox(*bbox).tolist() == expected.tolist()
+    assert GridIndex([], []).query_bbox(-1, -1, 1, 1).tolist() == []
+
+
+def test_string_pool():
+    pool = StringPool()
+    codes = pool.intern(['a', None, 'ção', 'a', ''])
+    assert codes[0] == codes[3] and codes[1] == -1
+    assert [pool.get(int(c)) for c in codes] == ['a', None, 'ção', 'a', '']
+    assert len(pool) == 3
+
+
+def test_raio_bbox_e_paginacao():
+    rows = _rows()
+    snapshot = ItemSnapshot.from_rows(reversed(rows))
+    lats = np.array([r[3] for r in rows])
+    lngs = np.array([r[4] for r in rows])
+
+    found = snapshot.filter(_params(lat=-24.95, lng=-53.45, radius=3000.0))
+    expected = np.flatnonzero(haversine(-53.45, -24.95, lngs, lats) <= 3000) + 1
+    assert snapshot.ids[found].tolist() == expected.tolist()
+
+    bbox = [-53.47, -24.97, -53.43, -24.94]
+    found = snapshot.filter(_params(bbox=bbox))
+    inside = (lngs >= bbox[0]) & (lngs <= bbox[2]) & (lats >= bbox[1]) & (lats <= bbox[3])
+    assert snapshot.ids[found].tolist() == (np.flatnonzero(inside) + 1).tolist()
+
+    # Páginas pelo cursor cobrem a listagem inteira, sem repetir
+    seen, cursor = [], None
+    while True:
+        itens, next_id = snapshot.listing(_params(bbox=bbox, limit=100, cursor=cursor, fields=['id', 'nome']))
+        seen.extend(item['id'] for item in itens)
+        assert all(set(item) == {'id', 'nome'} for item in itens)
+        if next_id is None:
+            break
+        cursor = next_id
+    assert seen == (np.flatnonzero(inside) + 1).tolist()
+
+    item = snapshot.records(snapshot.filter(_params(bbox=bbox))[:1])[0]
+    assert item == dict(zip(('id', 'nome', 'descricao', 'latitude', 'longitude', 'peso'), rows[item['id'] - 1]))
+
+
+def test_vizinhos_mais_proximos():
+    rows = _rows()
+    snapshot = ItemSnapshot.from_rows(rows)
+    lats = np.array([r[3] for r in rows])
+    lngs = np.array([r[4] for r in rows])
+    distances = haversine(-53.3, -24.9, lngs, lats)
+
+    found, dist = snapshot.nearest(-24.9, -53.3, 10)
+    assert snapshot.ids[found].tolist() == (np.argsort(distances, kind='stable')[:10] + 1).tolist()
+    assert dist.tolist() == sorted(dist.tolist())
+
+    found, _ = snapshot.nearest(-24.9, -53.3, 10, max_distance=float(np.sort(distances)[2]))
+    assert len(found) == 3
+
+
+def test_atualizacao_incremental():
+    rows = _rows(200)
+    snapshot = ItemSnapshot.from_rows(rows)
+    moved = (5, 'Movido', 'Longe', -10.0, -40.0, 2.0)
+    new = (500, 'Novo', None, -24.95, -53.45, 1.0)
+    # Id 7 sem linha: foi removido
+    updated = snapshot.apply([moved, new], {5, 7, 500}, version=3)
+
+    assert updated.version == 3 and len(updated) == len(snapshot)
+    ids = updated.ids[updated.all_rows()].tolist()
+    assert 7 not in ids and ids == sorted(ids) and ids[-1] == 500
+    near = updated.ids[updated.filter(_params(lat=-10.0, lng=-40.0, radius=10.0))].tolist()
+    assert near == [5]
+    assert 5 not in updated.ids[updated.filter(_params(lat=rows[4][3], lng=rows[4][4], radius=1.0))].tolist()
+    # A fotografia anterior não muda
+    assert 7 in snapshot.ids[snapshot.all_rows()].tolist()
+
+    # Muitas linhas fora da grade: compacta e remonta o índice
+    many = [(1000 + i, 'x', None, -24.9, -53.4, 1.0) for i in range(2000)]
+    compacted = updated.apply(many, {r[0] for r in many}, version=4)
+    assert compacted.indexed == len(compacted.ids) == len(updated) + 2000
+
+
+def test_compactacao_descarta_textos_antigos(monkeypatch):
+    # Compacta a cada atualização
+    monkeypatch.setattr(read_model_module, 'REINDEX_MIN_ROWS', 0)
+    snapshot = ItemSnapshot.from_rows(_rows(100))
+    # Edições repetidas dos mesmos itens acrescentam textos novos ao pool
+    for version in range(1, 40):
+        edits = [(i, f'Nome {i} v{version}', f'Descrição v{version}', -24.9, -53.4, 1.0) for i in range(1, 51)]
+        snapshot = snapshot.apply(edits, {i for i in range(1, 51)}, version)
+
+    assert snapshot.indexed == len(snapshot.ids) == 100
+    assert len(snapshot.pool) <= 200
+    records = {item['id']: item for item in snapshot.records(snapshot.all_rows())}
+    assert records[1]['nome'] == 'Nome 1 v39' and records[1]['descricao'] == 'Descrição v39'
+    assert records[100]['nome'] == 'Item 100' and records[99]['descricao'] is None
+
+
+def test_falha_na_atualizacao_volta_ao_banco(monkeypatch):
+    class Query:
+        def all(self):
+            raise RuntimeError('banco fora')
+
+    class Session:
+        rolled_back = False
+
+        def rollback(self):
+            Session.rolled_back = True
+
+    class FakeDb:
+        session = Session()
+
+    class FakeItem:
+        id = read_model_module.Item.id
+        query = type('FakeQuery', (), {'filter': lambda self, *args: self})()
+
+        @classmethod
+        def read_query(cls, *args):
+            return Query()
+
+    monkeypatch.setattr(read_model_module, 'db', FakeDb)
+    monkeypatch.setattr(read_model_module, 'Item', FakeItem)
+
+    model = ItemReadModel()
+    model.enabled = True
+    model._snapshot = ItemSnapshot.from_rows(_rows(10))
+    model._reload = False
+    model.invalidate([3])
+
+    assert model.snapshot() is None and model.fallbacks == 1
+    assert model._pending == {3} and Session.rolled_back
+
+
+def test_recarga_em_andamento_volta_ao_banco(monkeypatch):
+    model = ItemReadModel()
+    model.enabled = True
+    model._snapshot = ItemSnapshot.from_rows(_rows(10))
+    model._reload = False
+    # Carga em massa (ids desconhecidos) pede a recarga completa
+    model.invalidate()
+    durante = []
+
+    def linhas():
+        # Leitura concorrente enquanto a carga ainda varre a tabela
+        durante.append(model.snapshot())
+        yield from _rows(20)
+
+    class Query:
+        def order_by(self, *args):
+            return self
+
+        def yield_per(self, n):
+            return linhas()
+
+    class FakeItem:
+        id = read_model_module.Item.id
+
+        @classmethod
+        def read_query(cls, *args, **kwargs):
+            return Query()
+
+    monkeypatch.setattr(read_model_module, 'Item', FakeItem)
+    model.load()
+
+    assert durante == [None] and not model._loading
+    snapshot = model.snapshot()
+    assert snapshot.version == model.version() == 1 and len(snapshot) == 20
+
+
+def test_modelo_desligado_e_versao():
+    model = ItemReadModel()
+    assert model.snapshot() is None
+
+    model._snapshot = ItemSnapshot.from_rows(_rows(10))
+    model.enabled = True
+    assert model.snapshot() is model._snapshot and model.hits == 1
+
+    # Escrita sem ids conhecidos: a fotografia fica velha e a leitura vai ao banco
+    model.handle_notification('reload')
+    assert model.version() == 1 and model.snapshot() is None and model.fallbacks == 1
+
+    # Escritas de outros processos também invalidam os caches de resultados
+    before = listing_cache.version()
+    model.handle_notification('1,2,3')
+    assert model.version() == 2 and {1, 2, 3} <= model._pending
+    assert listing_cache.version() > before
+
+    with pytest.raises(ValueError):
+        model.handle_notification('1,x')
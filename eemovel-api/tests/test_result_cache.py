@@ -0,0 +1,51 @@
+import multiprocessing
+import pytest
+from app.services.result_cache import ITEM_CACHES, MemoryCacheBackend, ResultCache, invalidate_item_caches, shared_versions
+
+
+def test_cache_invalida_por_versao():
+    cache = ResultCache('teste')
+    chamadas = []
+
+    def calcula():
+        chamadas.append(1)
+        return {'viagens': len(chamadas)}
+
+    params = {'engine': 'kdtree', 'capacity': 3}
+    assert cache.get_or_compute(params, calcula) == ({'viagens': 1}, False)
+    assert cache.get_or_compute(dict(params), calcula) == ({'viagens': 1}, True)
+    assert cache.get_or_compute({'engine': 'kdtree', 'capacity': 4}, calcula)[1] is False
+
+    # Um incremento por escrita, qualquer que seja o número de caches
+    before = cache.version()
+    invalidate_item_caches()
+    assert cache.version() == before + 1
+    assert cache.get_or_compute(params, calcula) == ({'viagens': 3}, False)
+    assert (cache.hits, cache.misses) == (1, 3)
+    ITEM_CACHES.remove(cache)
+
+
+def test_memory_backend_lru_e_ttl():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+    assert backend.get('b') is None
+    assert (backend.get('a'), backend.get('c')) == (1, 3)
+
+    backend.set('d', 4, ttl=-1)
+    assert backend.get('d') is None
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='requer fork')
+def test_versao_compartilhada_entre_processos():
+    # Como os workers do gunicorn: um processo filho por fork escreve e o pai vê a nova versão
+    cache = ResultCache('teste')
+    before = cache.version()
+    child = multiprocessing.get_context('fork').Process(target=invalidate_item_caches)
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+    assert cache.version() > before and cache.version() == shared_versions.get_counter(None)
+    ITEM_CACHES.remove(cache)
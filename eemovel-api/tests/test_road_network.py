@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from app.utils.distance import haversine
+from app.utils.distance_providers import RoadNetworkProvider
+from app.utils.matrix_cache import DistanceMatrixCache
+from app.utils.road_network import build_graph_from_osm
+from app.utils.route_engines import get_engine
+
+# Quadrado A-B-C-D com a rua A-B em mão única (A -> B) e uma calçada ignorada
+OSM = """<?xml version="1.0"?>
+<osm>
+  <node id="1" lon="-53.4600" lat="-24.9600"/>
+  <node id="2" lon="-53.4500" lat="-24.9600"/>
+  <node id="3" lon="-53.4500" lat="-24.9500"/>
+  <node id="4" lon="-53.4600" lat="-24.9500"><tag k="name" v="Praça"/></node>
+  <way id="10"><nd ref="1"/><nd ref="2"/><tag k="highway" v="primary"/><tag k="oneway" v="yes"/></way>
+  <way id="11"><nd ref="2"/><nd ref="3"/><nd ref="4"/><nd ref="1"/><tag k="highway" v="residential"/></way>
+  <way id="12"><nd ref="1"/><nd ref="3"/><tag k="highway" v="footway"/></way>
+</osm>
+"""
+A, B = (-53.46, -24.96), (-53.45, -24.96)
+
+
+@pytest.fixture
+def graph_path(tmp_path):
+    osm = tmp_path / 'vias.osm'
+    osm.write_text(OSM)
+    graph = build_graph_from_osm(str(osm))
+    path = tmp_path / 'grafo.npz'
+    with open(path, 'wb') as f:
+        graph.save(f)
+    return str(path)
+
+
+def test_grafo_respeita_mao_unica(graph_path):
+    provider = RoadNetworkProvider()
+    provider.configure({'ROAD_GRAPH_PATH': graph_path})
+    graph = provider.graph()
+    assert len(graph) == 4
+    assert len(graph.weights) == 7
+
+    m = provider.matrix([A, B])
+    lado = haversine(*A, *B)
+    assert m[0, 1] == pytest.approx(lado)
+    # De B para A só dando a volta pelos outros três lados
+    assert m[1, 0] > 2.5 * lado
+    assert m[0, 0] == m[1, 1] == 0
+
+    with pytest.raises(ValueError):
+        RoadNetworkProvider().check()
+
+
+def test_cache_de_matriz_por_id(tmp_path):
+    calls = []
+
+    def compute(points):
+        def run(rows):
+            calls.append(list(rows))
+            return np.array([[haversine(*points[r], *p) for p in points] for r in rows])
+        return run
+
+    points = np.array([A, B, (-53.45, -24.95)])
+    cache = DistanceMatrixCache(str(tmp_path / 'cache'), 'grafo-v1')
+    first = cache.lookup([7, 8, 9], points, compute(points))
+    assert calls == [[0, 1, 2]]
+
+    # Reaberto (outro processo): nada a calcular, mesmo com outra ordem de ids
+    again = DistanceMatrixCache(str(tmp_path / 'cache'), 'grafo-v1').lookup([9, 7], points[[2, 0]], compute(points[[2, 0]]))
+    assert calls == [[0, 1, 2]]
+    np.testing.assert_allclose(again, first[np.ix_([2, 0], [2, 0])])
+
+    # Item movido: os pares com ele voltam a ser calculados
+    moved = points.copy()
+    moved[1] = (-53.44, -24.96)
+    cache.lookup([7, 8, 9], moved, compute(moved))
+    assert calls[-1] == [0, 1, 2] and len(calls) == 2
+
+    # Outro grafo invalida tudo
+    DistanceMatrixCache(str(tmp_path / 'cache'), 'grafo-v2').lookup([7, 9], points[[0, 2]], compute(points[[0, 2]]))
+    assert calls[-1] == [0, 1]
+
+
+def test_engines_com_matriz():
+    coords = [(0, 0), (10, 0), (20, 0), (30, 0)]
+    # Pela matriz, o ponto 3 fica ao lado do 0
+    distances = np.array([
+        [0, 50, 60, 1],
+        [50, 0, 1, 60],
+        [60, 1, 0, 50],
+        [1, 60, 50, 0]
+    ], dtype=float)
+    assert get_engine('linear').build_trips(coords, 2, distances=distances) == [[0, 3], [1, 2]]
+    assert get_engine('kdtree').build_trips(coords, 2, distances=distances) == [[0, 3], [1, 2]]
+    assert get_engine('kdtree').build_trips(coords, 2) == [[0, 1], [2, 3]]
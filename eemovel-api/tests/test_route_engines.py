@@ -0,0 +1,97 @@
+import random
+import pytest
+from shapely.geometry import Point
+from app.utils.cvrp import CVRPSolver
+from app.utils.distance import project_local
+from app.utils.route_engines import ENGINES, get_engine
+from app.utils.spatial_index import KDTree
+
+
+def _pontos_cascavel(n, seed=42):
+    rng = random.Random(seed)
+    return [(-53.455 + rng.uniform(-0.05, 0.05), -24.955 + rng.uniform(-0.05, 0.05)) for _ in range(n)]
+
+
+@pytest.mark.parametrize('capacity', [1, 3, 7])
+def test_kdtree_reproduz_heuristica_linear(capacity):
+    coords = _pontos_cascavel(400)
+    # Pontos repetidos e em grade forçam empates de distância
+    coords += [coords[0], coords[5], coords[5]]
+    coords += [(-53.40 + i * 0.001, -24.90) for i in range(20)]
+
+    linear = get_engine('linear').build_trips(coords, capacity)
+    kdtree = get_engine('kdtree').build_trips(coords, capacity)
+
+    assert kdtree == linear
+    assert sorted(i for trip in kdtree for i in trip) == list(range(len(coords)))
+
+
+def _heuristica_original(coords, capacity):
+    # O /items/optimize anterior às engines: Shapely sobre lon/lat, distância em graus
+    unvisited = [{'idx': i, 'geom': Point(c)} for i, c in enumerate(coords)]
+    trips = []
+    while unvisited:
+        current = unvisited.pop(0)
+        trip = [current['idx']]
+        while len(trip) < capacity and unvisited:
+            closest = min(unvisited, key=lambda x: current['geom'].distance(x['geom']))
+            unvisited.remove(closest)
+            trip.append(closest['idx'])
+            current = closest
+        trips.append(trip)
+    return trips
+
+
+@pytest.mark.parametrize('capacity', [1, 3, 7])
+def test_engines_reproduzem_heuristica_original_em_graus(capacity):
+    coords = _pontos_cascavel(300, seed=11)
+    original = _heuristica_original(coords, capacity)
+    assert get_engine('linear').build_trips(coords, capacity) == original
+    assert get_engine('kdtree').build_trips(coords, capacity) == original
+
+
+def test_metrica_em_metros_muda_o_vizinho_da_heuristica_original():
+    # Em Cascavel um grau de longitude vale ~0,91 do de latitude: B está mais longe em graus, mais perto em metros
+    origem, leste, norte = (-53.455, -24.955), (-53.454, -24.955), (-53.455, -24.95405)
+    coords = [origem, leste, norte]
+    assert _heuristica_original(coords, 2)[0] == [0, 2]
+    assert get_engine('kdtree').build_trips(project_local(coords).tolist(), 2)[0] == [0, 1]
+
+
+def test_kdtree_nearest_com_remocao():
+    coords = _pontos_cascavel(200, seed=7)
+    tree = KDTree(coords)
+    removidos = set(range(0, 200, 3))
+    for idx in removidos:
+        tree.remove(idx)
+
+    assert len(tree) == 200 - len(removidos)
+    for qx, qy in _pontos_cascavel(30, seed=99):
+        idx, _ = tree.nearest(qx, qy)
+        esperado = min(
+            (i for i in range(200) if i not in removidos),
+            key=lambda i: ((coords[i][0] - qx) ** 2 + (coords[i][1] - qy) ** 2) ** 0.5
+        )
+        assert idx == esperado
+
+
+def test_engine_desconhecida():
+    with pytest.raises(ValueError):
+        get_engine('inexistente')
+    assert {'linear', 'kdtree', 'cvrp'} <= set(ENGINES)
+
+
+def test_cvrp_respeita_capacidade_e_melhora_economias():
+    rng = random.Random(3)
+    coords = [(rng.uniform(0, 8000), rng.uniform(0, 8000)) for _ in range(300)]
+    demands = [rng.choice([1, 2, 3]) for _ in coords]
+    depot = (4000, 4000)
+
+    trips = get_engine('cvrp').build_trips(coords, 12, demands=demands, depot=depot, time_budget=1)
+
+    assert sorted(i for trip in trips for i in trip) == list(range(len(coords)))
+    assert all(sum(demands[i] for i in trip) <= 12 for trip in trips)
+
+    solver = CVRPSolver(coords, demands, 12, depot)
+    construcao = sum(solver.route_cost(trip) for trip in solver.savings())
+    assert sum(solver.route_cost(trip) for trip in trips) <= construcao
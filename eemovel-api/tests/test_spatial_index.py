@@ -0,0 +1,43 @@
+import json
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from app.extensions import db
+
+@pytest.fixture
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    # Conecta no banco real do Docker
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://admin:admin_password@db:5432/geodb'
+
+    with app.app_context():
+        yield app
+
+def _plano(query):
+    """Executa EXPLAIN (FORMAT JSON) da consulta e devolve o plano como texto."""
+    sql = query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+    # Com poucos registros o planner prefere Seq Scan; desligamos para ver se o índice é elegível
+    db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    resultado = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+    db.session.rollback()
+    return json.dumps(resultado)
+
+def test_busca_por_raio_usa_indice_geography(app):
+    from app.models.item import Item
+    from app.services.item_service import radius_filter
+
+    plano = _plano(Item.query.filter(radius_filter(-24.9554, -53.4552, 5000)))
+
+    assert 'idx_items_localizacao_geog' in plano, f"A busca por raio deveria usar o índice geography: {plano}"
+    assert 'Seq Scan' not in plano
+
+def test_filtro_bbox_usa_indice_geometry(app):
+    from app.models.item import Item
+
+    envelope = db.func.ST_MakeEnvelope(-53.47, -24.97, -53.43, -24.94, 4326)
+    plano = _plano(Item.query.filter(Item.localizacao.op('&&')(envelope)))
+
+    assert 'idx_items_localizacao' in plano
+    assert 'Seq Scan' not in plano
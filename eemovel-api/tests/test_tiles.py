@@ -0,0 +1,10 @@
+import pytest
+from app.services.tile_service import validate_tile
+
+
+def test_validate_tile():
+    validate_tile(0, 0, 0)
+    validate_tile(22, 2 ** 22 - 1, 0)
+    for z, x, y in ((23, 0, 0), (-1, 0, 0), (3, 8, 0), (3, 0, -1)):
+        with pytest.raises(ValueError):
+            validate_tile(z, x, y)
@@ -1,8 +1,20 @@
+import argparse
+import json
+import os
 import time
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 from app import create_app, db
+from app.config import Config
 from app.models import User, Item
+from app.services.result_cache import invalidate_item_caches
+from app.services.bulk_loader import (
+    FORMATS as BULK_FORMATS, METHODS as BULK_METHODS, DEFAULT_CHUNK_SIZE, detect_format, load_items
+)
+from app.services.export_service import EXPORT_FORMATS, EXPORT_BATCH_ROWS, detect_export_format, iter_export
+from app.services.listing_cache import install_version_trigger, normalize_listing_args
+from app.services.read_model import install_notify_triggers
+from app.utils.road_network import build_graph_from_osm
 
 app = create_app()
 
@@ -19,7 +31,25 @@ def initialize_database():
                 db.session.commit()
                 
                 db.create_all()
+
+                # Colunas adicionadas depois da criação inicial da tabela
+                db.session.execute(text('ALTER TABLE items ADD COLUMN IF NOT EXISTS peso DOUBLE PRECISION NOT NULL DEFAULT 1;'))
+                db.session.commit()
+
+                # create_all não cria índices novos em tabelas que já existem
+                for index in Item.__table__.indexes:
+                    index.create(bind=db.engine, checkfirst=True)
+
+                # Versão do conjunto de itens no banco (ETag das listagens), incrementada por trigger
+                install_version_trigger()
+
+                # Avisos de escrita (LISTEN/NOTIFY) que mantêm o modelo de leitura de cada processo em dia
+                if app.config['READ_MODEL_ENABLED'] and app.config['READ_MODEL_CHANNEL']:
+                    install_notify_triggers(app.config['READ_MODEL_CHANNEL'])
                 
+                # Fecha as conexões usadas aqui: os workers do gunicorn são forks deste processo
+                db.engine.dispose()
+
                 print("Banco de dados e extensões inicializados com sucesso!")
                 return True
             except OperationalError as e:
@@ -30,10 +60,141 @@ def initialize_database():
         print("Erro: Não foi possível conectar ao banco após várias tentativas.")
         return False
 
+def load_items_command(args):
+    """Carga em massa a partir de um arquivo (GeoJSON, CSV ou NDJSON)"""
+    with app.app_context():
+        fmt = detect_format(args.format, filename=args.arquivo)
+        with open(args.arquivo, encoding='utf-8', newline='') as stream:
+            report = load_items(
+                stream, fmt,
+                chunk_size=args.chunk_size,
+                method=args.method,
+                defer_index=args.defer_index
+            )
+        if report['inseridos']:
+            # O contador deste processo não é o dos workers do servidor: sem CACHE_REDIS_URL os
+            # caches de otimização, tiles e clusters do servidor só veem a carga após o TTL, o
+            # aviso do modelo de leitura (LISTEN) ou um restart. A listagem usa a versão do banco
+            invalidate_item_caches()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 'erro_arquivo' not in report and report['rejeitados'] == 0
+
+def export_items_command(args):
+    """Exporta os itens (Arrow IPC, GeoParquet ou FlatGeobuf) com os mesmos filtros do GET /items/"""
+    filters = {name: value for name, value in (
+        ('lat', args.lat), ('lng', args.lng), ('radius', args.radius), ('bbox', args.bbox), ('fields', args.fields)
+    ) if value is not None}
+    try:
+        fmt = detect_export_format(args.format, filename=args.arquivo)
+        params = normalize_listing_args(filters, Item.read_columns())
+    except ValueError as e:
+        print(e)
+        return False
+
+    inicio = time.perf_counter()
+    with app.app_context(), open(args.arquivo, 'wb') as f:
+        for chunk in iter_export(params, fmt, batch_rows=args.batch_rows):
+            f.write(chunk)
+        size = f.tell()
+    print(f"Itens exportados para {args.arquivo} ({fmt}, {size / 1e6:.1f} MB) em {time.perf_counter() - inicio:.1f}s.")
+    return True
+
+def build_road_graph_command(args):
+    """Gera o grafo viário usado por distance=road a partir de um extrato OSM (.osm)"""
+    output = args.output or Config.ROAD_GRAPH_PATH
+    graph = build_graph_from_osm(args.arquivo)
+    if not len(graph):
+        print("Nenhuma via encontrada no arquivo.")
+        return False
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'wb') as f:
+        graph.save(f)
+    print(f"Grafo salvo em {output}: {len(graph)} nós, {len(graph.weights)} arestas.")
+    return True
+
+def serve():
+    """Servidor de produção: gunicorn com workers multi-thread (gthread)"""
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        'bind': Config.WEB_BIND,
+        'workers': Config.WEB_WORKERS,
+        'threads': Config.WEB_THREADS,
+        'worker_class': 'gthread',
+        'timeout': Config.WEB_TIMEOUT,
+        'graceful_timeout': Config.WEB_GRACEFUL_TIMEOUT,
+        'keepalive': Config.WEB_KEEPALIVE,
+        'max_requests': Config.WEB_MAX_REQUESTS,
+        'max_requests_jitter': Config.WEB_MAX_REQUESTS_JITTER,
+        'accesslog': '-'
+    }
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Cada worker monta a própria aplicação e o próprio pool de conexões
+            return create_app()
+
+    ProductionServer().run()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Gerenciamento da API Eemovel')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run = subparsers.add_parser('run', help='Inicializa o banco e sobe o servidor de desenvolvimento (padrão)')
+    serve_parser = subparsers.add_parser('serve', help='Inicializa o banco uma vez e sobe o servidor de produção (gunicorn)')
+    subparsers.add_parser('init_db', help='Só inicializa o banco (extensão, tabelas e índices)')
+    for sub in (run, serve_parser):
+        sub.add_argument('--skip-init', action='store_true', help='Não inicializa o banco (já feito por init_db)')
+
+    load = subparsers.add_parser('load_items', help='Carga em massa de itens')
+    load.add_argument('arquivo', help='Arquivo GeoJSON FeatureCollection, CSV ou NDJSON')
+    load.add_argument('--format', choices=BULK_FORMATS, help='Formato do arquivo (padrão: pela extensão)')
+    load.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Itens por lote/transação')
+    load.add_argument('--method', choices=BULK_METHODS, default='copy', help='COPY ou executemany')
+    load.add_argument('--defer-index', action='store_true', help='Recria os índices espaciais só ao final da carga')
+
+    export = subparsers.add_parser('export_items', help='Exporta os itens em formato colunar binário')
+    export.add_argument('arquivo', help='Arquivo de saída (.arrows, .parquet ou .fgb)')
+    export.add_argument('--format', choices=EXPORT_FORMATS, help='Formato do arquivo (padrão: pela extensão)')
+    export.add_argument('--bbox', help='Filtro por retângulo: minx,miny,maxx,maxy (lon/lat)')
+    export.add_argument('--lat', type=float, help='Latitude central do filtro por raio')
+    export.add_argument('--lng', type=float, help='Longitude central do filtro por raio')
+    export.add_argument('--radius', type=float, help='Raio do filtro em metros')
+    export.add_argument('--fields', help='Colunas exportadas além da geometria, separadas por vírgula')
+    export.add_argument('--batch-rows', type=int, default=EXPORT_BATCH_ROWS, help='Linhas lidas por lote')
+
+    graph = subparsers.add_parser('build_road_graph', help='Gera o grafo viário (distance=road) a partir de um extrato OSM')
+    graph.add_argument('arquivo', help='Extrato OSM em XML (.osm), ex.: exportado do openstreetmap.org ou via osmium')
+    graph.add_argument('--output', help='Arquivo do grafo (padrão: ROAD_GRAPH_PATH)')
+
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    # Só inicia o servidor se o banco inicializar corretamente
-    if initialize_database():
+    args = parse_args()
+
+    if args.command == 'build_road_graph':
+        exit(0 if build_road_graph_command(args) else 1)
+
+    if args.command == 'export_items':
+        exit(0 if export_items_command(args) else 1)
+
+    if args.command == 'init_db':
+        exit(0 if initialize_database() else 1)
+
+    # Só inicia o servidor (ou a carga) se o banco inicializar corretamente.
+    # A inicialização roda aqui, uma vez, e não a cada worker
+    if not getattr(args, 'skip_init', False) and not initialize_database():
+        exit(1)
+
+    if args.command == 'load_items':
+        exit(0 if load_items_command(args) else 1)
+
+    if args.command == 'serve':
+        serve()
+        exit(0)
 
-        app.run(host='0.0.0.0', port=5000, debug=True)
-    else:
-        exit(1)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True)